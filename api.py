@@ -0,0 +1,247 @@
+"""
+Headless HTTP/JSON API over the search pipeline, for services that want
+ranked results rather than HTML.
+
+    uvicorn api:api --port 8000        # API only
+    python api.py --ui                 # API plus the Gradio UI at /ui
+
+    GET /search?q=...&max_items=12&web=1&videos=1&section=...&offset=0&local_first=1
+    GET /search/stream?q=...           NDJSON, one line per progressive update
+    GET /healthz, GET /metrics
+
+Admission: each client gets a token bucket (429 when empty), keyed on its
+X-API-Key when that key is in API_KEYS, else on its IP. At most API_MAX_CONCURRENCY searches run at once; a request that
+can't get a slot within API_QUEUE_TIMEOUT_S is answered from the caches
+alone when they have anything (X-Degraded: cache-only), else shed with 503,
+long before the upstream budgets would have run out.
+"""
+from utils import startup  # first, so startup times are measured from here
+import os
+import json
+import math
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional
+
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+
+from search import SECTION_KINDS, SearchResult, aggregated_search, aggregated_search_iter, cached_search, warm_start
+from utils import governor, latency, metrics
+from utils.parsing import Record
+from utils.ratelimit import TokenBuckets
+
+MAX_ITEMS = 100
+
+@dataclass
+class ApiConfig:
+    max_concurrency: int = 16    # searches running at once
+    queue_timeout: float = 0.5   # seconds to wait for a slot before degrading / shedding
+    rate: float = 1.0            # per-client requests per second ...
+    burst: float = 10.0          # ... with bursts up to this many
+    retry_after: int = 2         # seconds suggested on 503
+    api_keys: FrozenSet[str] = field(default_factory=frozenset)  # keys that get their own bucket
+
+    @classmethod
+    def from_env(cls) -> "ApiConfig":
+        return cls(
+            max_concurrency=int(os.getenv("API_MAX_CONCURRENCY") or 16),
+            queue_timeout=float(os.getenv("API_QUEUE_TIMEOUT_S") or 0.5),
+            rate=float(os.getenv("API_RATE_PER_S") or 1.0),
+            burst=float(os.getenv("API_BURST") or 10.0),
+            retry_after=int(os.getenv("API_RETRY_AFTER_S") or 2),
+            api_keys=frozenset(k.strip() for k in (os.getenv("API_KEYS") or "").split(",") if k.strip()),
+        )
+
+config = ApiConfig.from_env()
+_buckets = TokenBuckets(config.rate, config.burst)
+_slots = asyncio.Semaphore(config.max_concurrency)
+_in_flight = 0
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    startup.mark("ready")
+    warm_start()
+    yield
+
+api = FastAPI(title="Trustworthy Study Search API", lifespan=_lifespan)
+
+
+def _client_key(request: Request) -> str:
+    # Only known keys: an unchecked header would let a client mint a fresh bucket per request.
+    key = request.headers.get("x-api-key")
+    if key and key in config.api_keys:
+        return f"key:{key}"
+    return request.client.host if request.client else "anonymous"
+
+def _rate_limited(request: Request, endpoint: str) -> Optional[JSONResponse]:
+    wait = _buckets.take(_client_key(request))
+    if not wait:
+        return None
+    metrics.inc("api_requests_total", endpoint=endpoint, outcome="rate_limited")
+    return JSONResponse({"error": "rate limited"}, status_code=429, headers={"Retry-After": str(math.ceil(wait))})
+
+async def _acquire() -> bool:
+    global _in_flight
+    try:
+        await asyncio.wait_for(_slots.acquire(), timeout=config.queue_timeout)
+    except asyncio.TimeoutError:
+        return False
+    _in_flight += 1
+    return True
+
+def _release() -> None:
+    global _in_flight
+    _in_flight -= 1
+    _slots.release()
+
+def _section_page(items: List[Record], offset: int, limit: int) -> Dict:
+    # Sections are fetched one item deeper than the page (see _depth), so any
+    # item past it means there is a next page.
+    return {
+        "offset": offset,
+        "has_more": len(items) > offset + limit,
+        "items": [it.to_item().model_dump(exclude_none=True) for it in items[offset:offset + limit]],
+    }
+
+def _payload(query: str, result: SearchResult, section: Optional[str], offset: int, limit: int, **extra) -> Dict:
+    titles = [section] if section else list(SECTION_KINDS)
+    return {
+        "query": query,
+        "sections": {t: _section_page(result.sections.get(t, []), offset, limit) for t in titles},
+        "timed_out": result.timed_out,
+        "pending": result.pending,
+        **extra,
+    }
+
+async def _overloaded(endpoint: str, q: str, fetch: int, web: bool, videos: bool, section, offset, limit) -> JSONResponse:
+    # Cache-only answer if the caches have anything for this query; else shed.
+    result = await run_in_threadpool(cached_search, q, fetch, web, videos)
+    if any(result.sections.values()):
+        metrics.inc("api_requests_total", endpoint=endpoint, outcome="degraded")
+        return JSONResponse(
+            _payload(q, result, section, offset, limit, degraded=True),
+            headers={"X-Degraded": "cache-only"},
+        )
+    metrics.inc("api_requests_total", endpoint=endpoint, outcome="shed")
+    return JSONResponse({"error": "overloaded"}, status_code=503, headers={"Retry-After": str(config.retry_after)})
+
+def _depth(offset: int, limit: int) -> int:
+    """Items to fetch per section: down to the end of the page, plus one to tell whether more follow."""
+    return min(MAX_ITEMS, offset + limit) + 1
+
+def _check(q: str, section: Optional[str]) -> Optional[JSONResponse]:
+    if len(q) < 3:
+        return JSONResponse({"error": "q must be at least 3 characters"}, status_code=400)
+    if section and section not in SECTION_KINDS:
+        return JSONResponse({"error": f"unknown section; one of {list(SECTION_KINDS)}"}, status_code=400)
+    return None
+
+
+@api.get("/search")
+async def search_endpoint(
+    request: Request,
+    q: str = Query(..., description="Topic"),
+    max_items: int = Query(12, ge=1, le=MAX_ITEMS, description="Items per section page"),
+    web: bool = True,
+    videos: bool = True,
+    section: Optional[str] = None,
+    offset: int = Query(0, ge=0, lt=MAX_ITEMS),
+    local_first: Optional[bool] = Query(None, description="Answer from the local index where it can (default LOCAL_FIRST)"),
+):
+    q = q.strip()
+    error = _check(q, section) or _rate_limited(request, "search")
+    if error:
+        return error
+    fetch = _depth(offset, max_items)
+    if not await _acquire():
+        return await _overloaded("search", q, fetch, web, videos, section, offset, max_items)
+    try:
+        result = await run_in_threadpool(aggregated_search, q, fetch, web, videos, local_first)
+    finally:
+        _release()
+    metrics.inc("api_requests_total", endpoint="search", outcome="ok")
+    return JSONResponse(_payload(q, result, section, offset, max_items))
+
+@api.get("/search/stream")
+async def search_stream_endpoint(
+    request: Request,
+    q: str = Query(..., description="Topic"),
+    max_items: int = Query(12, ge=1, le=MAX_ITEMS),
+    web: bool = True,
+    videos: bool = True,
+    section: Optional[str] = None,
+    local_first: Optional[bool] = None,
+):
+    q = q.strip()
+    error = _check(q, section) or _rate_limited(request, "stream")
+    if error:
+        return error
+    if not await _acquire():
+        return await _overloaded("stream", q, _depth(0, max_items), web, videos, section, 0, max_items)
+
+    # The body generator may never run (client gone before streaming starts),
+    # so the slot is also released by a background task, whichever comes first.
+    released = False
+
+    def release_once() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            _release()
+
+    async def lines():
+        it = aggregated_search_iter(q, _depth(0, max_items), web, videos, local_first)
+        try:
+            while True:
+                result = await run_in_threadpool(next, it, None)
+                if result is None:
+                    break
+                yield json.dumps(_payload(q, result, section, 0, max_items, done=result.done), separators=(",", ":")) + "\n"
+        finally:
+            release_once()
+        metrics.inc("api_requests_total", endpoint="stream", outcome="ok")
+
+    try:
+        return StreamingResponse(lines(), media_type="application/x-ndjson", background=BackgroundTask(release_once))
+    except BaseException:
+        release_once()
+        raise
+
+@api.get("/healthz")
+async def healthz():
+    return {
+        "ok": True,
+        "in_flight": _in_flight,
+        "max_concurrency": config.max_concurrency,
+        "breakers": governor.states(),
+        "latency": latency.snapshot(),
+        "startup": startup.phases(),
+    }
+
+@api.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def main() -> None:
+    import argparse
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description="Trustworthy Study Search HTTP API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=int(os.getenv("API_PORT") or 8000))
+    ap.add_argument("--ui", action="store_true", help="also serve the Gradio UI at /ui")
+    args = ap.parse_args()
+    app = api
+    if args.ui:
+        import gradio as gr
+        from app import demo
+        app = gr.mount_gradio_app(api, demo, path="/ui")
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+"""
+Batch search over a topic list, one JSON line per topic.
+
+    python batch.py topics.txt -o results.jsonl [--max-items 12] [--no-web] [--no-videos]
+
+Topics go through one pipeline instead of one search after another. Every
+source has its own worker pool (BATCH_WORKERS), and all topics queue on it,
+so each upstream stays busy up to its rate limit. The governor paces every
+request, and batch workers wait out throttling instead of giving up. PubMed
+summaries and the DOI/PMID/arXiv enrichment are fetched in bulk across
+topics. At most `window` topics are in flight, which bounds memory.
+
+The output file is also the checkpoint. Lines are written as topics finish,
+in completion order, and a rerun skips topics already in the file. Progress
+(topics/min, ETA) goes to stderr.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+import search as pipeline
+from utils import enrich, governor, httpclient, localindex
+from utils.cache import SourceEntry, get_cache
+from utils.parsing import Record, normalize_query
+from sources import pubmed
+
+# Concurrent calls per source. Roughly rate limit x latency: enough to keep
+# the upstream busy without queueing on the governor.
+WORKERS: Dict[str, int] = {"Wikipedia": 6, "arXiv": 2, "PubMed": 3, "Crossref": 8, "Web": 3, "YouTube": 4}
+WORKERS.update(json.loads(os.getenv("BATCH_WORKERS") or "{}"))
+WINDOW = 128            # topics in flight
+ENRICH_GROUP = 32       # finished topics enriched together
+ENRICH_DEADLINE = 30.0
+MAX_THROTTLE_WAIT = 60.0  # give up on a source for a topic if it is unavailable for longer
+
+
+@dataclass
+class BatchStats:
+    total: Optional[int] = None   # topics to run, when known
+    done: int = 0
+    skipped: int = 0              # already in the output (resumed run)
+    unavailable: int = 0          # source results missing from written topics
+    failed: int = 0               # topics written as error lines (retried on the next run)
+    started: float = field(default_factory=time.monotonic)
+
+    def per_minute(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.done / elapsed * 60 if elapsed > 0 else 0.0
+
+    def line(self) -> str:
+        rate = self.per_minute()
+        s = f"{self.done}" + (f"/{self.total}" if self.total is not None else "") + f" topics · {rate:.1f}/min"
+        if self.total is not None and rate > 0:
+            left = max(0, self.total - self.skipped - self.done) / rate * 60
+            s += f" · ETA {int(left // 3600)}h{int(left % 3600 // 60):02d}m"
+        if self.unavailable:
+            s += f" · {self.unavailable} source results missing"
+        if self.failed:
+            s += f" · {self.failed} failed"
+        return s
+
+
+@dataclass
+class _Topic:
+    topic: str
+    results: Dict[str, List[Record]] = field(default_factory=dict)
+    pending: Set[str] = field(default_factory=set)
+    unavailable: List[str] = field(default_factory=list)
+    started: float = field(default_factory=time.monotonic)
+
+
+def _patient(fn: Callable[[], List[Record]]) -> List[Record]:
+    """Call `fn`, sleeping through the governor's throttling / open breakers up to MAX_THROTTLE_WAIT."""
+    waited = 0.0
+    while True:
+        try:
+            return fn()
+        except governor.UpstreamUnavailable as e:
+            if waited + e.retry_after > MAX_THROTTLE_WAIT:
+                raise
+            time.sleep(e.retry_after)
+            waited += e.retry_after
+
+
+class _PubMedBatcher:
+    """
+    esearch per topic, but esummary for many topics at once: ids are pooled
+    until PUBMED_BATCH are waiting or no esearch is outstanding.
+    """
+
+    def __init__(self, deliver: Callable[[_Topic, str, Optional[List[Record]]], None]):
+        self.deliver = deliver
+        self._waiting: List[tuple] = []  # (topic, limit, ids)
+        self._outstanding = 0
+        self._lock = threading.Lock()
+
+    def submit(self, pool: ThreadPoolExecutor, t: _Topic, limit: int) -> None:
+        cached = pipeline.search_pubmed.cached(t.topic, limit)
+        if cached is not None:
+            self.deliver(t, "PubMed", cached)
+            return
+        with self._lock:
+            self._outstanding += 1
+        pool.submit(self._search, t, limit)
+
+    def _search(self, t: _Topic, limit: int) -> None:
+        ids: Optional[List[str]] = None
+        try:
+            params = pubmed._esearch_params(t.topic, limit)
+            ids = _patient(lambda: pubmed._ids(httpclient.get(f"{pubmed.BASE}/esearch.fcgi", params=params, timeout=pubmed.TIMEOUT).json()))
+        except Exception:
+            pass
+        with self._lock:
+            self._outstanding -= 1
+            if ids:
+                self._waiting.append((t, limit, ids))
+            flush = sum(len(w[2]) for w in self._waiting) >= enrich.PUBMED_BATCH or not self._outstanding
+            batch, self._waiting = (self._waiting, []) if flush else ([], self._waiting)
+        if ids is None:
+            self.deliver(t, "PubMed", None)
+        elif not ids:
+            self.deliver(t, "PubMed", [])
+        if batch:
+            self._summarize(batch)
+
+    def _summarize(self, batch: List[tuple]) -> None:
+        all_ids = list(dict.fromkeys(i for _, _, ids in batch for i in ids))
+        result: Dict = {}
+        try:
+            for n in range(0, len(all_ids), enrich.PUBMED_BATCH):
+                chunk = all_ids[n:n + enrich.PUBMED_BATCH]
+                summ = _patient(lambda: httpclient.get(
+                    f"{pubmed.BASE}/esummary.fcgi", params=pubmed._esummary_params(chunk), timeout=pubmed.TIMEOUT
+                ).json())
+                result.update(summ.get("result", {}))
+        except Exception:
+            for t, _, _ in batch:
+                self.deliver(t, "PubMed", None)
+            return
+        for t, limit, ids in batch:
+            items: Optional[List[Record]] = None
+            try:
+                items = pubmed._parse(ids, {"result": result})
+                get_cache().set("pubmed", normalize_query(t.topic), SourceEntry(limit, items))
+            except Exception:
+                pass
+            finally:
+                self.deliver(t, "PubMed", items)
+
+
+class _Pipeline:
+    def __init__(self, out: IO[str], max_items: int, use_web: bool, use_videos: bool, window: int, stats: BatchStats):
+        self.out = out
+        self.window = window
+        self.max_items = max_items
+        self.plan = pipeline.source_plan(max_items, use_web, use_videos)
+        self.order = list(self.plan)
+        self.stats = stats
+        self.pools = {
+            name: ThreadPoolExecutor(max_workers=WORKERS.get(name, 4), thread_name_prefix=f"batch-{name.lower()}")
+            for name in self.plan
+        }
+        self.pubmed = _PubMedBatcher(self._deliver)
+        self.index = localindex.get_index()
+        self._window = threading.BoundedSemaphore(window)
+        self._ready: "queue.Queue[Optional[_Topic]]" = queue.Queue()
+        self._lock = threading.Lock()
+
+    def submit(self, topic: str) -> None:
+        self._window.acquire()  # blocks while `window` topics are in flight
+        t = _Topic(topic, pending=set(self.plan))
+        for name, (fn, limit, kw) in self.plan.items():
+            if name == "PubMed":
+                self.pubmed.submit(self.pools[name], t, limit)
+            else:
+                self.pools[name].submit(self._fetch, t, name, fn, limit, kw)
+
+    def _fetch(self, t: _Topic, name: str, fn: Callable, limit: int, kw: dict) -> None:
+        items: Optional[List[Record]] = None
+        try:
+            items = _patient(lambda: fn(t.topic, limit, **kw))
+        except Exception:
+            try:
+                items = fn.peek(t.topic, limit)  # unavailable: use whatever is cached
+            except Exception:
+                pass
+        finally:
+            # Always, or the topic never finishes and its window slot is never freed.
+            self._deliver(t, name, items)
+
+    def _deliver(self, t: _Topic, name: str, items: Optional[List[Record]]) -> None:
+        if items is None:
+            t.unavailable.append(name)
+        elif self.index is not None:
+            try:
+                self.index.ingest(items)
+            except Exception:
+                pass  # the index is a side effect; the topic still gets written
+        with self._lock:
+            t.results[name] = items or []
+            t.pending.discard(name)
+            finished = not t.pending
+        if finished:
+            self._ready.put(t)
+
+    def finish(self) -> None:
+        """Write finished topics in groups, enriching each group in one bulk round."""
+        while True:
+            t = self._ready.get()
+            if t is None:
+                return
+            group = [t]
+            while len(group) < ENRICH_GROUP:
+                try:
+                    nxt = self._ready.get(timeout=0.2)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._write(group)
+                    return
+                group.append(nxt)
+            self._write(group)
+
+    def _write(self, group: List[_Topic]) -> None:
+        try:
+            enrich.resolve([i for t in group for items in t.results.values() for i in items], deadline=ENRICH_DEADLINE)
+        except Exception as e:
+            print(f"[batch] enrichment failed, writing without it: {e!r}", file=sys.stderr)
+        for t in group:
+            try:
+                self.out.write(self._line(t))
+                self.stats.done += 1
+                self.stats.unavailable += len(t.unavailable)
+            except Exception as e:
+                self._failed(t, e)
+            finally:
+                self._window.release()
+        try:
+            self.out.flush()
+        except OSError as e:
+            print(f"[batch] flushing {getattr(self.out, 'name', 'output')} failed: {e!r}", file=sys.stderr)
+
+    def _line(self, t: _Topic) -> str:
+        sections = pipeline.build_sections(t.results, self.order, self.max_items)
+        line = {
+            "topic": t.topic,
+            "sections": {
+                title: [it.to_item().model_dump(exclude_none=True) for it in items]
+                for title, items in sections.items()
+            },
+            "unavailable": t.unavailable,
+            "seconds": round(time.monotonic() - t.started, 2),
+        }
+        return json.dumps(line, ensure_ascii=False) + "\n"
+
+    def _failed(self, t: _Topic, error: Exception) -> None:
+        """Write an error line for `t` (retried on the next run) and say so on stderr."""
+        self.stats.failed += 1
+        print(f"[batch] {t.topic!r} failed: {error!r}", file=sys.stderr)
+        try:
+            self.out.write(json.dumps({"topic": t.topic, "error": repr(error)}, ensure_ascii=False) + "\n")
+        except Exception:
+            pass
+
+    def drain(self) -> None:
+        """Block until every submitted topic is written, then stop the finisher."""
+        for _ in range(self.window):
+            self._window.acquire()
+        self._ready.put(None)
+
+    def close(self) -> None:
+        for pool in self.pools.values():
+            pool.shutdown(wait=False)
+
+
+def completed_topics(path: str) -> Set[str]:
+    """
+    Normalized topics already written to the output file, error lines
+    excepted so a rerun retries them. A torn last line (no newline: the run
+    was interrupted mid-write) is cut off; an unreadable line elsewhere is
+    skipped, so its topic runs again, and reported on stderr.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    size, torn, bad = 0, None, 0
+    raw = b""
+    with open(path, "rb") as f:
+        for raw in f:
+            try:
+                line = json.loads(raw)
+                topic = normalize_query(line["topic"])
+            except (ValueError, KeyError, TypeError):
+                if raw.endswith(b"\n"):
+                    bad += 1
+                else:
+                    torn = size
+            else:
+                if "error" not in line:
+                    done.add(topic)
+            size += len(raw)
+    if torn is not None:
+        with open(path, "r+b") as f:
+            f.truncate(torn)
+    elif raw and not raw.endswith(b"\n"):
+        # Complete but unterminated: end it so the next line starts on its own.
+        with open(path, "ab") as f:
+            f.write(b"\n")
+    if bad:
+        print(f"[batch] skipped {bad} unreadable line(s) in {path}; their topics run again", file=sys.stderr)
+    return done
+
+def read_topics(path: str) -> Iterator[str]:
+    """One topic per line; blank lines and #-comments skipped. "-" reads stdin."""
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in f:
+            topic = line.strip()
+            if topic and not topic.startswith("#"):
+                yield topic
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def run_batch(
+    topics: Iterable[str],
+    out_path: str,
+    max_items: int = 12,
+    use_web: bool = True,
+    use_videos: bool = True,
+    window: int = WINDOW,
+    total: Optional[int] = None,
+    progress: Optional[Callable[[BatchStats], None]] = None,
+    progress_every: float = 10.0,
+) -> BatchStats:
+    """
+    Search every topic and append one JSON line per topic to `out_path`,
+    skipping topics it already holds. `progress(stats)` is called every
+    `progress_every` seconds and at the end.
+    """
+    done = completed_topics(out_path)
+    stats = BatchStats(total=total)
+    stopped = threading.Event()
+
+    def report():
+        while not stopped.wait(progress_every):
+            progress(stats)
+
+    with open(out_path, "a", encoding="utf-8") as out:
+        p = _Pipeline(out, max_items, use_web, use_videos, window, stats)
+        finisher = threading.Thread(target=p.finish, name="batch-finish", daemon=True)
+        finisher.start()
+        if progress:
+            threading.Thread(target=report, name="batch-progress", daemon=True).start()
+        try:
+            seen: Set[str] = set()
+            for topic in topics:
+                key = normalize_query(topic)
+                if key in done or key in seen:
+                    stats.skipped += 1
+                    continue
+                seen.add(key)
+                p.submit(topic)
+            p.drain()
+            finisher.join()
+        finally:
+            stopped.set()
+            p.close()
+    if progress:
+        progress(stats)
+    return stats
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("topics", help="file with one topic per line, or - for stdin")
+    ap.add_argument("-o", "--out", required=True, help="JSONL output; rerunning resumes from it")
+    ap.add_argument("--max-items", type=int, default=12)
+    ap.add_argument("--no-web", action="store_true")
+    ap.add_argument("--no-videos", action="store_true")
+    ap.add_argument("--window", type=int, default=WINDOW, help="topics in flight at once")
+    ap.add_argument("--progress-every", type=float, default=10.0, help="seconds between progress lines")
+    args = ap.parse_args(argv)
+
+    total = None
+    if args.topics != "-":
+        total = sum(1 for _ in read_topics(args.topics))
+    stats = run_batch(
+        read_topics(args.topics), args.out, max(3, min(args.max_items, 100)),
+        use_web=not args.no_web, use_videos=not args.no_videos, window=args.window, total=total,
+        progress=lambda s: print(f"[batch] {s.line()}", file=sys.stderr, flush=True),
+        progress_every=args.progress_every,
+    )
+    print(f"[batch] done: {stats.done} written, {stats.skipped} already in {args.out}, {stats.failed} failed", file=sys.stderr)
+    return 1 if stats.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
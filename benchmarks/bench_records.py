@@ -0,0 +1,49 @@
+"""
+Construction time and memory: slotted Record vs pydantic ResultItem.
+
+    python -m benchmarks.bench_records [N]
+
+N defaults to 600 * 128: 100 hits from each of six sources, for every entry
+of a 128-aggregate cache.
+"""
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+from utils.parsing import Kind, Record, ResultItem
+
+def _record(i: int) -> Record:
+    return Record(
+        title=f"Paper {i}", url=f"https://example.org/{i}", snippet="An abstract " * 20,
+        source="Crossref", kind=Kind.JOURNAL, year=2020, citations=i % 500,
+    )
+
+def _item(i: int) -> ResultItem:
+    return ResultItem(
+        title=f"Paper {i}", url=f"https://example.org/{i}", snippet="An abstract " * 20,
+        source="Crossref", meta={"kind": "journal", "year": 2020, "citations": i % 500},
+    )
+
+def _measure(make: Callable[[int], object], n: int):
+    # Time and memory in separate passes; tracing slows allocation down.
+    t0 = time.perf_counter()
+    objs: List[object] = [make(i) for i in range(n)]
+    elapsed = time.perf_counter() - t0
+    del objs
+    tracemalloc.start()
+    objs = [make(i) for i in range(n)]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objs
+    return elapsed, peak
+
+def main(n: int) -> None:
+    print(f"{n} objects")
+    rows = [("Record", _measure(_record, n)), ("ResultItem", _measure(_item, n))]
+    for name, (elapsed, peak) in rows:
+        print(f"  {name:<11} {elapsed * 1000:8.1f} ms  {elapsed / n * 1e6:6.2f} us/obj  {peak / 1e6:8.1f} MB  {peak / n:6.0f} B/obj")
+    (_, (t_rec, m_rec)), (_, (t_item, m_item)) = rows
+    print(f"  Record is {t_item / t_rec:.1f}x faster to build and uses {m_item / m_rec:.1f}x less memory")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 600 * 128)
@@ -0,0 +1,165 @@
+"""
+Local stand-in for every upstream, replaying recorded responses from
+benchmarks/fixtures with configurable latency and jitter.
+
+    python -m benchmarks.fixture_server --port 8765 --latency arxiv=400,crossref=350 --jitter 0.5
+
+Point the app at it with HTTP_UPSTREAM_OVERRIDES='<json from overrides(base)>'.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Upstream origin -> path prefix on the fixture server.
+UPSTREAMS = {
+    "http://export.arxiv.org": "/arxiv",
+    "https://export.arxiv.org": "/arxiv",
+    "https://eutils.ncbi.nlm.nih.gov": "/pubmed",
+    "https://api.crossref.org": "/crossref",
+    "https://en.wikipedia.org": "/wikipedia",
+    "https://serpapi.com": "/serpapi",
+    "https://www.googleapis.com": "/google",
+    "https://www.youtube.com": "/youtube",
+}
+
+# Rough real-world medians (ms); override with --latency.
+DEFAULT_LATENCY_MS = {
+    "arxiv": 400, "pubmed": 150, "crossref": 350, "wikipedia": 80,
+    "serpapi": 600, "google": 300, "youtube": 200, "page": 150,
+}
+
+# (upstream, path regex, query match) -> (fixture file, content type)
+ROUTES = [
+    ("arxiv", r"^/api/query$", None, "arxiv_query.xml", "application/atom+xml"),
+    ("pubmed", r"/esearch\.fcgi$", None, "pubmed_esearch.json", "application/json"),
+    ("pubmed", r"/esummary\.fcgi$", None, "pubmed_esummary.json", "application/json"),
+    ("crossref", r"^/works", None, "crossref_works.json", "application/json"),
+    ("wikipedia", r"^/w/api\.php$", ("action", "opensearch"), "wikipedia_opensearch.json", "application/json"),
+    ("wikipedia", r"^/w/api\.php$", ("generator", "search"), "wikipedia_generator.json", "application/json"),
+    ("wikipedia", r"^/w/api\.php$", None, "wikipedia_search.json", "application/json"),
+    ("wikipedia", r"^/api/rest_v1/page/summary/", None, "wikipedia_summary.json", "application/json"),
+    ("serpapi", r"^/search\.json$", None, "serpapi_search.json", "application/json"),
+    ("google", r"^/customsearch/v1$", None, "google_cse.json", "application/json"),
+    ("google", r"^/youtube/v3/search$", None, "youtube_search.json", "application/json"),
+    ("youtube", r"^/feeds/videos\.xml$", None, "youtube_feed.xml", "application/atom+xml"),
+    ("page", r".*", None, "page.html", "text/html; charset=utf-8"),
+]
+
+def overrides(base: str) -> Dict[str, str]:
+    """HTTP_UPSTREAM_OVERRIDES mapping that sends every upstream to a server at `base`."""
+    out = {origin: base + prefix for origin, prefix in UPSTREAMS.items()}
+    out["*"] = base + "/page"  # og:image fetches for web results
+    return out
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, addr: Tuple[str, int], latency_ms: Dict[str, float], jitter: float, seed: Optional[int] = None):
+        super().__init__(addr, _Handler)
+        self.latency_ms = dict(DEFAULT_LATENCY_MS, **latency_ms)
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.hits: Dict[str, int] = {}
+        self._cache: Dict[str, bytes] = {}
+
+    def delay(self, upstream: str) -> float:
+        base = self.latency_ms.get(upstream, 0.0) / 1000.0
+        with self.rng_lock:
+            # Uniform +-jitter around the base, never negative.
+            return max(0.0, base * (1 + self.rng.uniform(-self.jitter, self.jitter)))
+
+    def body(self, name: str) -> bytes:
+        if name not in self._cache:
+            with open(os.path.join(FIXTURES, name), "rb") as f:
+                self._cache[name] = f.read()
+        return self._cache[name]
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients hang up mid-response all the time (hedges, abandoned fetches); only report real errors.
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError, ConnectionAbortedError)):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def base(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real upstreams
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        upstream, _, rest = parts.path.lstrip("/").partition("/")
+        rest = "/" + rest
+        if upstream == "page":
+            rest = "/"
+        query = parse_qs(parts.query)
+        for name, pattern, match, fixture, ctype in ROUTES:
+            if name != upstream or not re.search(pattern, rest):
+                continue
+            if match and match[1] not in query.get(match[0], []):
+                continue
+            srv: FixtureServer = self.server  # type: ignore[assignment]
+            time.sleep(srv.delay(upstream))
+            body = srv.body(fixture)
+            srv.hits[upstream] = srv.hits.get(upstream, 0) + 1
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # e.g. the og:image reader stopping at </head>
+            return
+        self.send_error(404)
+
+
+def start(port: int = 0, latency_ms: Optional[Dict[str, float]] = None, jitter: float = 0.3, seed: Optional[int] = 0) -> FixtureServer:
+    """Serve fixtures on a background thread; port 0 picks a free port."""
+    srv = FixtureServer(("127.0.0.1", port), latency_ms or {}, jitter, seed)
+    threading.Thread(target=srv.serve_forever, name="fixture-server", daemon=True).start()
+    return srv
+
+def parse_latency(spec: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for part in filter(None, (spec or "").split(",")):
+        k, _, v = part.partition("=")
+        out[k.strip()] = float(v)
+    return out
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", default="", help="per-upstream ms, e.g. arxiv=400,crossref=350")
+    ap.add_argument("--jitter", type=float, default=0.3, help="+- fraction of the base latency")
+    args = ap.parse_args()
+    srv = start(args.port, parse_latency(args.latency), args.jitter, seed=None)
+    print(f"Serving fixtures on {srv.base}")
+    print("HTTP_UPSTREAM_OVERRIDES='" + json.dumps(overrides(srv.base)) + "'")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Offline benchmark suite. Starts the fixture server, points every upstream at
+it and measures:
+
+  * end-to-end search latency, cold (cache misses) and warm (cache hits)
+  * per-source fetch latency and per-stage CPU time (normalize, score,
+    sectioning, rendering)
+  * throughput with N concurrent users
+  * peak traced memory over a batch of cold searches
+
+and compares the run against a stored baseline, flagging regressions.
+
+    python -m benchmarks.run                     # run and compare with benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline     # run and store as the new baseline
+    python -m benchmarks.run --users 16 --duration 20 --latency arxiv=800 --jitter 0.5
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks import fixture_server
+from utils import governor, httpclient, localindex, render
+from utils.cache import MemoryBackend, ResultCache, set_cache
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+QUERY = "transformer models"
+
+def percentiles(samples_s: List[float], prefix: str) -> Dict[str, float]:
+    xs = sorted(samples_s)
+    if not xs:
+        return {}
+
+    def pct(p: float) -> float:
+        return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))] * 1000
+
+    return {
+        f"{prefix}_p50_ms": pct(50),
+        f"{prefix}_p95_ms": pct(95),
+        f"{prefix}_p99_ms": pct(99),
+        f"{prefix}_mean_ms": statistics.fmean(xs) * 1000,
+    }
+
+def _timed(fn: Callable[[], object], rounds: int) -> List[float]:
+    out = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+def _fresh_cache() -> None:
+    set_cache(ResultCache(MemoryBackend(max_entries=100_000)))
+
+def _isolate(tmp: str) -> None:
+    """Keep the run out of the developer's stores: memory result cache, throwaway local index."""
+    _fresh_cache()
+    try:
+        localindex.set_index(localindex.LocalIndex(os.path.join(tmp, "index.sqlite")))
+    except sqlite3.OperationalError:
+        localindex.set_index(None)  # no FTS5 here; the pipeline runs without an index anyway
+
+def _cold_query() -> str:
+    # Unique text: misses every cache and single-flight key; the fixtures ignore it.
+    return f"{QUERY} {uuid.uuid4().hex[:8]}"
+
+
+def bench_end_to_end(pipeline, iterations: int, max_items: int) -> Dict[str, float]:
+    _fresh_cache()
+    cold = _timed(lambda: pipeline.aggregated_search(_cold_query(), max_items, True, True), iterations)
+    pipeline.aggregated_search(QUERY, max_items, True, True)
+    warm = _timed(lambda: pipeline.aggregated_search(QUERY, max_items, True, True), iterations)
+    return {**percentiles(cold, "e2e_cold"), **percentiles(warm, "e2e_warm")}
+
+def bench_sources(pipeline, iterations: int) -> Tuple[Dict[str, float], list]:
+    sources = {
+        "wikipedia": lambda q: pipeline.search_wikipedia.uncached(q, 20),
+        "arxiv": lambda q: pipeline.search_arxiv.uncached(q, 30),
+        "pubmed": lambda q: pipeline.search_pubmed.uncached(q, 30),
+        "crossref": lambda q: pipeline.search_crossref.uncached(q, 30),
+        "web": lambda q: pipeline.search_web.uncached(q, 36, pipeline.cfg),
+        "youtube": lambda q: pipeline.search_youtube.uncached(q, 36, pipeline.cfg),
+    }
+    out: Dict[str, float] = {}
+    items: list = []
+    for name, fn in sources.items():
+        items += fn(QUERY)
+        out.update(percentiles(_timed(lambda: fn(QUERY), iterations), f"source_{name}"))
+    return out, items
+
+def bench_stages(pipeline, items: list, rounds: int, max_items: int) -> Dict[str, float]:
+    by_source: Dict[str, list] = {}
+    for it in items:
+        by_source.setdefault(it.source, []).append(it)
+    normalized = pipeline.normalize_items(list(items))
+    scored = pipeline.score_items(list(normalized))
+    sections = pipeline.build_sections(by_source, list(by_source), max_items)
+    out: Dict[str, float] = {"stage_input_items": float(len(items))}
+    out.update(percentiles(_timed(lambda: pipeline.normalize_items(list(items)), rounds), "stage_normalize"))
+    out.update(percentiles(_timed(lambda: pipeline.score_items(list(normalized)), rounds), "stage_score"))
+    out.update(percentiles(_timed(lambda: pipeline.sort_and_trim(scored, max_items), rounds), "stage_trim"))
+    out.update(percentiles(_timed(lambda: pipeline.build_sections(by_source, list(by_source), max_items), rounds), "stage_sections"))
+    out.update(percentiles(_timed(lambda: [render.section_html(t, s) for t, s in sections.items()], rounds), "stage_render"))
+    out.update(percentiles(_timed(lambda: render.sections_json(sections), rounds), "stage_render_json"))
+    return out
+
+def bench_throughput(pipeline, users: int, duration: float, hot_ratio: float, max_items: int) -> Dict[str, float]:
+    _fresh_cache()
+    pipeline.aggregated_search(QUERY, max_items, True, True)
+    latencies: List[float] = []
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def user(n: int):
+        i = 0
+        while time.monotonic() < stop:
+            # Deterministic mix of popular (cached) and cold queries per user.
+            q = QUERY if (i * 7 + n) % 100 < hot_ratio * 100 else _cold_query()
+            t0 = time.perf_counter()
+            pipeline.aggregated_search(q, max_items, True, True)
+            with lock:
+                latencies.append(time.perf_counter() - t0)
+            i += 1
+
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - t0
+    out = {"throughput_rps": len(latencies) / elapsed, "throughput_users": float(users)}
+    out.update(percentiles(latencies, "throughput"))
+    return out
+
+def bench_memory(pipeline, iterations: int, max_items: int) -> Dict[str, float]:
+    _fresh_cache()
+    tracemalloc.start()
+    for _ in range(iterations):
+        pipeline.aggregated_search(_cold_query(), max_items, True, True)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"peak_traced_mb": peak / 1e6}
+
+
+def compare(report: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Latency/memory metrics regress when higher, throughput when lower."""
+    regressions = []
+    for name, base in baseline.items():
+        cur = report.get(name)
+        if cur is None or not base or not name.endswith(("_ms", "_mb", "_rps")):
+            continue
+        if name.endswith("_rps"):
+            if cur < base * (1 - tolerance):
+                regressions.append(f"{name}: {cur:.2f} < baseline {base:.2f}")
+        elif cur > base * (1 + tolerance):
+            regressions.append(f"{name}: {cur:.2f} > baseline {base:.2f}")
+    return regressions
+
+def _print(report: Dict[str, float], baseline: Dict[str, float]) -> None:
+    for name in sorted(report):
+        cur = report[name]
+        base = baseline.get(name)
+        delta = f"  ({(cur - base) / base * 100:+.1f}%)" if base else ""
+        print(f"  {name:<32} {cur:10.2f}{delta}")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--iterations", type=int, default=20)
+    ap.add_argument("--stage-rounds", type=int, default=50)
+    ap.add_argument("--max-items", type=int, default=12)
+    ap.add_argument("--users", type=int, default=8)
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--hot-ratio", type=float, default=0.5, help="share of throughput queries that repeat a cached topic")
+    ap.add_argument("--latency", default="", help="per-upstream ms, e.g. arxiv=400,crossref=350")
+    ap.add_argument("--jitter", type=float, default=0.3)
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown before flagging")
+    ap.add_argument("--out", help="also write the report as JSON here")
+    args = ap.parse_args(argv)
+
+    tmp = tempfile.TemporaryDirectory(prefix="bench-")
+    _isolate(tmp.name)  # before anything can touch the real .cache/
+    srv = fixture_server.start(latency_ms=fixture_server.parse_latency(args.latency), jitter=args.jitter)
+    httpclient.set_upstream_overrides(fixture_server.overrides(srv.base))
+    # The fixtures are local; pacing them would measure the rate limits, not the code.
+    governor.set_enabled(False)
+    httpclient.config.adaptive = False  # hedges would make runs depend on the latency seen so far
+    import search as pipeline  # after the overrides, in case anything fetches at import time
+    pipeline.warmer.top_k = 0  # no background fetches skewing the numbers
+    pipeline.cfg.serpapi_key = pipeline.cfg.serpapi_key or "bench"
+    pipeline.cfg.youtube_api_key = pipeline.cfg.youtube_api_key or "bench"
+
+    report: Dict[str, float] = {}
+    print("sources / stages ...")
+    src, items = bench_sources(pipeline, args.iterations)
+    report.update(src)
+    report.update(bench_stages(pipeline, items, args.stage_rounds, args.max_items))
+    print("end to end ...")
+    report.update(bench_end_to_end(pipeline, args.iterations, args.max_items))
+    print(f"throughput ({args.users} users, {args.duration:.0f}s) ...")
+    report.update(bench_throughput(pipeline, args.users, args.duration, args.hot_ratio, args.max_items))
+    print("memory ...")
+    report.update(bench_memory(pipeline, max(3, args.iterations // 4), args.max_items))
+    srv.shutdown()
+    index = localindex.get_index()
+    if index is not None:
+        index.flush()
+    localindex.set_index(None)
+    tmp.cleanup()
+
+    baseline: Dict[str, float] = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print("\nResults" + (" (vs baseline)" if baseline else ""))
+    _print(report, baseline)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.baseline}")
+        return 0
+    regressions = compare(report, baseline, args.tolerance)
+    if regressions:
+        print(f"\nREGRESSIONS (> {args.tolerance:.0%}):")
+        for r in regressions:
+            print("  " + r)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+The search pipeline: fan out to every source, merge, enrich, score and
+split into sections. No UI here; app.py (Gradio) and api.py (HTTP/JSON)
+both call into it.
+"""
+import time
+import threading
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+from typing import Callable, Dict, Iterator, List, Tuple
+from utils.config import AppConfig
+from utils.scoring import score_items, sort_and_trim
+from utils.parsing import Kind, Record, normalize_items, normalize_query
+from utils import httpclient, metrics, singleflight, startup, trust
+from utils.cache import get_cache
+from utils.fanout import iter_fan_out
+from utils.warmer import Warmer
+from utils.preview import start_thumbnails, wait_thumbnails
+from utils import enrich, localindex
+from sources import arxiv, crossref, pubmed, websearch, wikipedia, youtube
+from sources.wikipedia import search_wikipedia, suggest, suggest_age
+from sources.arxiv import search_arxiv
+from sources.pubmed import search_pubmed
+from sources.crossref import search_crossref
+from sources.youtube import search_youtube
+from sources.websearch import search_web
+
+load_dotenv()
+cfg = AppConfig.from_env()
+
+# NOTE: Videos first per your request.
+SECTION_KINDS = {
+    "Videos / Lectures":        {Kind.VIDEO, Kind.LECTURE},
+    "Overview / Encyclopedic":  {Kind.ENCYCLOPEDIA, Kind.REFERENCE},
+    "Peer-reviewed / Research": {Kind.JOURNAL, Kind.PREPRINT, Kind.RESEARCH},
+    "Articles / Web":           {Kind.ARTICLE, Kind.NEWS, Kind.BLOG},
+}
+# Which sources can still add to a section; used to show it as loading.
+SECTION_SOURCES = {
+    "Videos / Lectures":        ["YouTube"],
+    "Overview / Encyclopedic":  ["Wikipedia", "Web"],
+    "Peer-reviewed / Research": ["arXiv", "PubMed", "Crossref"],
+    "Articles / Web":           ["Web"],
+}
+LOCAL = "Local"   # results key for local index hits; merged after the live sources
+CITATIONS = "Citations"    # pending while the bulk identifier lookups run
+THUMBNAILS = "Thumbnails"  # pending while background thumbnails are still loading
+LOCAL_FETCH = 2   # local hits pulled per section, as a multiple of max_items
+WARM_AHEAD = 0.8  # re-fetch popular queries once this share of their TTL has passed
+
+@dataclass
+class SearchResult:
+    sections: Dict[str, List[Record]]
+    timed_out: List[str] = field(default_factory=list)  # sources cut off by the deadline/budget
+    pending: List[str] = field(default_factory=list)    # sources still running (streaming only)
+
+    @property
+    def done(self) -> bool:
+        return not self.pending
+
+def build_sections(results: Dict[str, List[Record]], order: List[str], max_items: int) -> Dict[str, List[Record]]:
+    # Keep the original source order so de-dup stays deterministic.
+    items: List[Record] = []
+    for name in order:
+        items += results.get(name) or []
+
+    with metrics.timer("normalize"):
+        items = normalize_items(items)
+        items = enrich.apply_cached(items)
+    with metrics.timer("score"):
+        items = score_items(items)
+    with metrics.timer("trim"):
+        return {
+            title: sort_and_trim([i for i in items if i.kind in kinds], max_items)
+            for title, kinds in SECTION_KINDS.items()
+        }
+
+def aggregated_search_iter(
+    query: str,
+    max_items: int,
+    use_web: bool,
+    use_videos: bool,
+    local_first: bool | None = None,
+) -> Iterator[SearchResult]:
+    """
+    Like aggregated_search, but yields a re-scored SearchResult each time a
+    source finishes. The last one yielded is final (thumbnails included).
+    Identical concurrent searches share one run.
+    """
+    local_first = cfg.local_first if local_first is None else local_first
+    key = (normalize_query(query), max_items, use_web, use_videos, local_first)
+    warmer.record(key[0], (max_items, use_web, use_videos))
+    return singleflight.group("aggregate").do_iter(key, lambda: _tracked(_search_iter(query, max_items, use_web, use_videos, local_first)))
+
+_active = 0  # searches running now (coalesced followers not counted)
+_active_lock = threading.Lock()
+
+def _tracked(it: Iterator[SearchResult]) -> Iterator[SearchResult]:
+    global _active
+    with _active_lock:
+        _active += 1
+    try:
+        yield from it
+    finally:
+        with _active_lock:
+            _active -= 1
+
+def source_plan(max_items: int, use_web: bool, use_videos: bool) -> Dict[str, Tuple[Callable, int, dict]]:
+    """Source name -> (cached search function, limit, extra kwargs), in display order."""
+    # To get enough good items per section, pull more than we plan to show.
+    # Cap the total fetch to keep things snappy.
+    fetch_n_core = min(60, max(12, max_items * 2))
+    fetch_n_web  = min(100, max(15, max_items * 3))
+    fetch_n_vid  = min(100, max(15, max_items * 3))
+
+    n_wiki, n_acad = min(20, fetch_n_core), min(30, fetch_n_core)
+    plan = {
+        "Wikipedia": (search_wikipedia, n_wiki, {}),
+        "arXiv":     (search_arxiv,     n_acad, {}),
+        "PubMed":    (search_pubmed,    n_acad, {}),
+        "Crossref":  (search_crossref,  n_acad, {}),
+    }
+    if use_web:
+        plan["Web"] = (search_web, fetch_n_web, {"cfg": cfg})
+    if use_videos:
+        plan["YouTube"] = (search_youtube, fetch_n_vid, {"cfg": cfg})
+    return plan
+
+def _local_hits(index: localindex.LocalIndex, query: str, max_items: int) -> Tuple[List[Record], List[str]]:
+    """Local index hits for every section, and the sections that are under-filled or stale."""
+    hits: List[Record] = []
+    needed: List[str] = []
+    now = time.time()
+    with metrics.timer("local"):
+        for title, kinds in SECTION_KINDS.items():
+            recs, seen_at = index.search(query, kinds, LOCAL_FETCH * max_items)
+            hits += recs
+            if len(recs) < max_items or now - seen_at > cfg.local_max_age:
+                needed.append(title)
+    return hits, needed
+
+def cached_search(query: str, max_items: int, use_web: bool, use_videos: bool) -> SearchResult:
+    """
+    Sections built only from what the source caches and the local index
+    already hold, stale or not; no upstream calls. Used to degrade gracefully
+    under overload. Sources with nothing cached are reported as timed out.
+    """
+    plan = source_plan(max_items, use_web, use_videos)
+    results: Dict[str, List[Record]] = {}
+    missing: List[str] = []
+    for name, (fn, limit, _) in plan.items():
+        items = fn.peek(query, limit)
+        if items is None:
+            missing.append(name)
+        else:
+            results[name] = items
+    index = localindex.get_index()
+    if index is not None:
+        results[LOCAL], _ = _local_hits(index, query, max_items)
+    return SearchResult(sections=build_sections(results, list(plan) + [LOCAL], max_items), timed_out=missing)
+
+def _warm(query: str, params: Tuple[int, bool, bool]) -> int:
+    """Re-fetch the sources whose entries for `query` are missing or nearly stale; returns fetches made."""
+    cache, index = get_cache(), localindex.get_index()
+    fetched = 0
+    for fn, limit, kw in source_plan(*params).values():
+        age = fn.age(query)
+        if age is not None and age < cache.ttl_for(fn.namespace) * WARM_AHEAD:
+            continue
+        try:
+            items = fn.refresh(query, limit, **kw)
+        except Exception:
+            continue  # skipped by the governor; next pass
+        fetched += 1
+        if index is not None:
+            index.ingest(items)
+    return fetched
+
+def _followups(query: str) -> Tuple[List[str], int]:
+    """Wikipedia completions of `query`, and the upstream fetches getting them takes (1 unless cached and fresh)."""
+    age = suggest_age(query)
+    fetched = 0 if age is not None and age < get_cache().ttl_for("wiki_suggest") * WARM_AHEAD else 1
+    return suggest(query), fetched
+
+warmer = Warmer(
+    _warm,
+    followups=_followups,
+    busy=lambda: _active > cfg.warm_max_active,
+    top_k=cfg.warm_top_k,
+    interval=cfg.warm_interval,
+    budget=cfg.warm_budget,
+)
+
+def _search_iter(query: str, max_items: int, use_web: bool, use_videos: bool, local_first: bool) -> Iterator[SearchResult]:
+    plan = source_plan(max_items, use_web, use_videos)
+    results: Dict[str, List[Record]] = {}
+    index = localindex.get_index()
+    if local_first and index is not None:
+        # Only the sources feeding thin or stale sections go upstream.
+        results[LOCAL], needed = _local_hits(index, query, max_items)
+        wanted = {src for title in needed for src in SECTION_SOURCES[title]}
+        plan = {name: p for name, p in plan.items() if name in wanted}
+    tasks = {name: (lambda fn=fn, n=n, kw=kw: fn(query, n, **kw)) for name, (fn, n, kw) in plan.items()}
+
+    live = list(tasks)
+    order = live + [LOCAL]  # live copies win de-dup over local ones
+    timed_out: List[str] = []
+    pending = list(live)
+    enriching = cfg.enrich_deadline > 0
+    sections: Dict[str, List[Record]] = {}
+    if LOCAL in results:
+        sections = build_sections(results, order, max_items)
+        yield SearchResult(sections=sections, pending=list(pending))
+    t0 = time.perf_counter()
+    for name, status, value in iter_fan_out(tasks, deadline=cfg.query_deadline, budget=cfg.source_budget):
+        pending.remove(name)
+        if status == "ok":
+            results[name] = value
+            if index is not None:
+                index.ingest(value)
+        elif status == "failed":
+            # Skipped by its circuit breaker / rate limit: show what's cached, if anything.
+            fn, n, _ = plan[name]
+            results[name] = fn.peek(query, n) or []
+        elif status == "timed_out":
+            timed_out.append(name)
+            metrics.inc("fanout_timeouts_total", source=name.lower())
+        sections = build_sections(results, order, max_items)
+        # The fanned-out result goes out before enrichment; its citations follow as an update.
+        follow = [CITATIONS] if not pending and enriching and any(results.get(src) for src in live) else []
+        yield SearchResult(sections=sections, timed_out=list(timed_out), pending=pending + follow)
+    if not tasks:
+        return  # answered entirely from the local index
+    metrics.observe("stage_seconds", time.perf_counter() - t0, stage="fanout")
+
+    # Bulk-resolve DOIs/PMIDs/arXiv ids so research hits carry citations, then re-score.
+    enriched = enriching and any(results.get(name) for name in live)
+    if enriched:
+        enrich.resolve([i for name in live for i in results.get(name) or []], deadline=cfg.enrich_deadline)
+        sections = build_sections(results, order, max_items)
+
+    # Thumbnails only for web hits that will actually be shown.
+    futures = {}
+    if cfg.thumbnails != "off":
+        web = [i for sec in sections.values() for i in sec if (i.source or "").startswith("Web")]
+        futures = start_thumbnails(web) if web else {}
+    background = cfg.thumbnails == "background" and bool(futures)
+    if enriched or background:
+        # In background mode this shows the cards now; a follow-up result carries the images.
+        yield SearchResult(sections=sections, timed_out=list(timed_out), pending=[THUMBNAILS] if background else [])
+    if futures:
+        wait_thumbnails(futures, deadline=cfg.thumbnail_deadline)
+        if index is not None:
+            index.ingest(web)  # so local answers carry the thumbnails too
+        yield SearchResult(sections=sections, timed_out=timed_out)
+
+def _origins() -> List[str]:
+    """Upstream endpoints a default search will call, given the configured keys."""
+    urls = [wikipedia.WIKI_API, arxiv.API, pubmed.BASE, crossref.API, youtube.RSS]
+    if cfg.youtube_api_key:
+        urls.append(youtube.API)
+    if cfg.serpapi_key:
+        urls.append(websearch.SERPAPI)
+    elif cfg.google_cse_id and cfg.google_cse_key:
+        urls.append(websearch.GOOGLE_CSE)
+    return urls
+
+def warm_start() -> None:
+    """
+    Call once the server is up: loads what the first search would otherwise
+    pay for (numpy, the HTTP session, trust rules, local index) on a
+    background thread and, with PREWARM_CONNECTIONS, opens the upstream
+    connections.
+    """
+    tasks: Dict[str, Callable[[], object]] = {
+        "numpy": lambda: score_items([Record(title="warm", url="https://example.org", year=2000)]),
+        "trust": trust.get_index,
+        "session": httpclient.session,
+        "local_index": localindex.get_index,
+    }
+    if cfg.prewarm_connections:
+        tasks["connections"] = lambda: httpclient.prewarm(_origins())
+    startup.in_background(tasks)
+
+def aggregated_search(
+    query: str,
+    max_items: int,
+    use_web: bool,
+    use_videos: bool,
+    local_first: bool | None = None,
+) -> SearchResult:
+    """
+    Aggregate sources -> normalize -> score -> split into sections.
+    Sources are queried concurrently; whatever finishes before the deadline is used.
+    Each source caches its own results per normalized query, so changing the
+    display options only re-slices cached hits. With `local_first` (default
+    LOCAL_FIRST), sections the local index can fill with recent hits are
+    answered from it and only the others go upstream. With
+    THUMBNAILS=background it returns before the thumbnails; use
+    aggregated_search_iter to get them as a follow-up result.
+    """
+    result = SearchResult(sections={title: [] for title in SECTION_KINDS})
+    for result in aggregated_search_iter(query, max_items, use_web, use_videos, local_first):
+        if result.pending == [THUMBNAILS]:
+            break
+    return result
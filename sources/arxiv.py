@@ -1,30 +1,47 @@
-import requests, feedparser
-from typing import List
-from utils.parsing import ResultItem
+from typing import Iterable, List, Optional
+from utils import feeds, httpclient, metrics
+from utils.cache import cached_source
+from utils.parsing import Kind, Record
 
-def search_arxiv(query: str, limit: int = 8) -> List[ResultItem]:
+API = "http://export.arxiv.org/api/query"
+TIMEOUT = 15
+
+def _params(query: str, limit: int) -> dict:
     # Use arXiv API via Atom feed
-    api = "http://export.arxiv.org/api/query"
-    params = {"search_query": f"all:{query}", "start": 0, "max_results": limit}
-    try:
-        r = requests.get(api, params=params, timeout=15)
+    return {"search_query": f"all:{query}", "start": 0, "max_results": limit}
+
+FIELDS = {
+    "title": feeds.ATOM + "title",
+    "summary": feeds.ATOM + "summary",
+    "published": feeds.ATOM + "published",
+    # Journal DOI, when the authors linked the published version.
+    "doi": "{http://arxiv.org/schemas/atom}doi",
+}
+
+def _parse(chunks: Iterable[bytes], limit: Optional[int] = None) -> List[Record]:
+    """Records from the Atom body as it streams in; stops reading after `limit` entries."""
+    out: List[Record] = []
+    for e in feeds.iter_entries(chunks, FIELDS, timeout=TIMEOUT):
+        if not e.get("title"):
+            continue
+        published = e.get("published", "")
+        doi = e.get("doi")
+        out.append(Record(
+            title=e["title"],
+            url=e.get("link"),
+            snippet=feeds.snippet(e.get("summary", "")),
+            source="arXiv",
+            kind=Kind.PREPRINT,
+            year=int(published[:4]) if published[:4].isdigit() else None,
+            extra={"doi": doi} if doi else None
+        ))
+        if limit and len(out) >= limit:
+            break
+    return out
+
+@cached_source("arxiv")
+@metrics.instrument_source("arxiv")
+def search_arxiv(query: str, limit: int = 8) -> List[Record]:
+    with httpclient.get(API, params=_params(query, limit), timeout=TIMEOUT, stream=True) as r:
         r.raise_for_status()
-        feed = feedparser.parse(r.text)
-        out: List[ResultItem] = []
-        for e in feed.entries:
-            title = e.title
-            url = e.link
-            summary = e.summary if hasattr(e, "summary") else ""
-            year = None
-            if hasattr(e, "published"):
-                year = int(e.published[:4])
-            out.append(ResultItem(
-                title=title,
-                url=url,
-                snippet=summary[:300] + ("..." if len(summary) > 300 else ""),
-                source="arXiv",
-                meta={"kind": "preprint", "year": year}
-            ))
-        return out
-    except Exception:
-        return []
\ No newline at end of file
+        return _parse(r.iter_content(feeds.CHUNK), limit)
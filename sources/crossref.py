@@ -1,34 +1,41 @@
-import requests
 from typing import List
-from utils.parsing import ResultItem
+from utils import httpclient, metrics
+from utils.cache import cached_source
+from utils.parsing import Kind, Record
 
-def search_crossref(query: str, limit: int = 8) -> List[ResultItem]:
-    url = "https://api.crossref.org/works"
-    try:
-        r = requests.get(url, params={"query": query, "rows": limit}, timeout=15)
-        r.raise_for_status()
-        data = r.json()
-        out: List[ResultItem] = []
-        for it in data.get("message", {}).get("items", []):
-            title_list = it.get("title") or []
-            title = title_list[0] if title_list else "(untitled)"
-            link = None
-            for l in it.get("link", []) or []:
-                if l.get("URL"):
-                    link = l["URL"]; break
-            link = link or it.get("URL")
-            year = None
-            if it.get("issued", {}).get("date-parts"):
-                year = it["issued"]["date-parts"][0][0]
-            citations = it.get("is-referenced-by-count", 0)
-            snippet = (it.get("container-title", [""])[0] or "") + (f" · DOI: {it.get('DOI')}" if it.get("DOI") else "")
-            out.append(ResultItem(
-                title=title,
-                url=link,
-                snippet=snippet.strip(),
-                source="Crossref",
-                meta={"kind": "journal", "year": year, "citations": citations}
-            ))
-        return out
-    except Exception:
-        return []
\ No newline at end of file
+API = "https://api.crossref.org/works"
+TIMEOUT = 15
+
+def _parse(data: dict) -> List[Record]:
+    out: List[Record] = []
+    for it in data.get("message", {}).get("items", []):
+        title_list = it.get("title") or []
+        title = title_list[0] if title_list else "(untitled)"
+        link = None
+        for l in it.get("link", []) or []:
+            if l.get("URL"):
+                link = l["URL"]; break
+        link = link or it.get("URL")
+        year = None
+        if it.get("issued", {}).get("date-parts"):
+            year = it["issued"]["date-parts"][0][0]
+        citations = it.get("is-referenced-by-count", 0)
+        snippet = (it.get("container-title", [""])[0] or "") + (f" · DOI: {it.get('DOI')}" if it.get("DOI") else "")
+        out.append(Record(
+            title=title,
+            url=link,
+            snippet=snippet.strip(),
+            source="Crossref",
+            kind=Kind.JOURNAL,
+            year=year,
+            citations=citations,
+            extra={"doi": it["DOI"]} if it.get("DOI") else None
+        ))
+    return out
+
+@cached_source("crossref")
+@metrics.instrument_source("crossref")
+def search_crossref(query: str, limit: int = 8) -> List[Record]:
+    r = httpclient.get(API, params={"query": query, "rows": limit}, timeout=TIMEOUT)
+    r.raise_for_status()
+    return _parse(r.json())
@@ -1,37 +1,53 @@
-import requests
 from typing import List
-from utils.parsing import ResultItem
+from utils import httpclient, metrics
+from utils.cache import cached_source
+from utils.parsing import Kind, Record
 
-def search_pubmed(query: str, limit: int = 8) -> List[ResultItem]:
-    # E-Utilities esearch + esummary
-    base = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
-    try:
-        es = requests.get(f"{base}/esearch.fcgi", params={
-            "db": "pubmed", "term": query, "retmode": "json", "retmax": limit
-        }, timeout=10).json()
-        ids = es.get("esearchresult", {}).get("idlist", [])
-        if not ids:
-            return []
-        summ = requests.get(f"{base}/esummary.fcgi", params={
-            "db": "pubmed", "id": ",".join(ids), "retmode": "json"
-        }, timeout=10).json()
-        result = summ.get("result", {})
-        out: List[ResultItem] = []
-        for pid in ids:
-            rec = result.get(pid, {})
-            title = rec.get("title")
-            url = f"https://pubmed.ncbi.nlm.nih.gov/{pid}/"
-            year = None
-            if "pubdate" in rec and rec["pubdate"][:4].isdigit():
-                year = int(rec["pubdate"][:4])
-            snippet = (rec.get("source") or "") + " · " + (rec.get("pubtype", [""])[0] or "")
-            out.append(ResultItem(
-                title=title or "(untitled)",
-                url=url,
-                snippet=snippet.strip(),
-                source="PubMed",
-                meta={"kind": "journal", "year": year}
-            ))
-        return out
-    except Exception:
-        return []
\ No newline at end of file
+# E-Utilities esearch + esummary
+BASE = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+TIMEOUT = 10
+
+def _esearch_params(query: str, limit: int) -> dict:
+    return {"db": "pubmed", "term": query, "retmode": "json", "retmax": limit}
+
+def _esummary_params(ids: List[str]) -> dict:
+    return {"db": "pubmed", "id": ",".join(ids), "retmode": "json"}
+
+def _ids(es: dict) -> List[str]:
+    return es.get("esearchresult", {}).get("idlist", [])
+
+def _parse(ids: List[str], summ: dict) -> List[Record]:
+    result = summ.get("result", {})
+    out: List[Record] = []
+    for pid in ids:
+        rec = result.get(pid, {})
+        title = rec.get("title")
+        url = f"https://pubmed.ncbi.nlm.nih.gov/{pid}/"
+        year = None
+        if "pubdate" in rec and rec["pubdate"][:4].isdigit():
+            year = int(rec["pubdate"][:4])
+        snippet = (rec.get("source") or "") + " · " + (rec.get("pubtype", [""])[0] or "")
+        extra = {"pmid": pid}
+        for aid in rec.get("articleids") or []:
+            if aid.get("idtype") == "doi" and aid.get("value"):
+                extra["doi"] = aid["value"]
+        out.append(Record(
+            title=title or "(untitled)",
+            url=url,
+            snippet=snippet.strip(),
+            source="PubMed",
+            kind=Kind.JOURNAL,
+            year=year,
+            extra=extra
+        ))
+    return out
+
+@cached_source("pubmed")
+@metrics.instrument_source("pubmed")
+def search_pubmed(query: str, limit: int = 8) -> List[Record]:
+    es = httpclient.get(f"{BASE}/esearch.fcgi", params=_esearch_params(query, limit), timeout=TIMEOUT).json()
+    ids = _ids(es)
+    if not ids:
+        return []
+    summ = httpclient.get(f"{BASE}/esummary.fcgi", params=_esummary_params(ids), timeout=TIMEOUT).json()
+    return _parse(ids, summ)
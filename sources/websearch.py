@@ -1,106 +1,201 @@
+import os
 import math
-import requests
-from typing import List
-from utils.parsing import ResultItem
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Set, Tuple
+from utils import governor, httpclient, metrics, trust
+from utils.cache import cached_source, get_cache
+from utils.parsing import Kind, Record, normalize_query
 from utils.config import AppConfig
-from utils.preview import fetch_og_image
-
-# Expanded trusted hints
-WHITELIST_HINTS = [
-    ".edu", ".gov", "britannica.com", "reuters.com", "apnews.com",
-    "nature.com", "science.org", "sciencedirect.com", "springer.com", "nih.gov", "who.int",
-    "developer.mozilla.org", "docs.python.org", "nodejs.org", "go.dev", "rust-lang.org",
-    "kubernetes.io", "docker.com", "react.dev", "vuejs.org", "angular.io",
-    "pytorch.org", "tensorflow.org", "scikit-learn.org", "numpy.org", "pandas.pydata.org",
-    "cloud.google.com", "aws.amazon.com", "azure.microsoft.com", "learn.microsoft.com",
-    "oracle.com", "ibm.com/docs", "vercel.com/docs", "postgresql.org", "mysql.com", "mariadb.org",
-    "khanacademy.org", "freecodecamp.org", "digitalocean.com", "wikipedia.org"
-]
+
+SERPAPI = "https://serpapi.com/search.json"
+GOOGLE_CSE = "https://www.googleapis.com/customsearch/v1"
+PAGE_SIZE = 10
+MAX_PAGES = 10          # both APIs stop at 100 results
+TIMEOUT = 15
+PAGE_CONCURRENCY = int(os.getenv("WEB_PAGE_CONCURRENCY") or 3)  # pages in flight per query
+DEFAULT_PASS_RATE = 0.3  # share of hits passing the trust filter, before we've seen any
+MIN_PASS_RATE = 0.05     # floor when planning, so a bad page doesn't fan out to every page
+
+# Page requests run here, not on the fan-out pool the search itself runs on.
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("WEB_PAGE_WORKERS") or 16), thread_name_prefix="web-pages")
+_global_pass_rate = DEFAULT_PASS_RATE
 
 def _looks_trustworthy(url: str) -> bool:
-    u = (url or "").lower()
-    return any(h in u for h in WHITELIST_HINTS)
+    return trust.classify(url).allowed
 
-def _kind_for_domain(url: str) -> str:
-    u = (url or "").lower()
-    if "wikipedia.org" in u or "britannica.com" in u:
-        return "encyclopedia"  # promote to Overview
-    return "article"
+def _kind_for_domain(url: str) -> Kind:
+    # e.g. Wikipedia / Britannica are promoted to Overview.
+    return trust.classify(url).kind or Kind.ARTICLE
 
-def _serpapi(query: str, limit: int, key: str) -> List[ResultItem]:
-    out: List[ResultItem] = []
-    try:
-        page_size = 10
-        pages = math.ceil(min(limit, 100) / page_size)
-        for page in range(pages):
-            r = requests.get(
-                "https://serpapi.com/search.json",
-                params={"engine": "google", "q": query, "num": page_size, "start": page * page_size, "api_key": key},
-                timeout=15,
-            )
-            r.raise_for_status()
-            data = r.json()
-            for it in (data.get("organic_results") or []):
-                link = it.get("link")
-                if not link or not _looks_trustworthy(link):
-                    continue
-                title = it.get("title")
-                snippet = it.get("snippet") or ""
-                thumb = fetch_og_image(link)
-                out.append(ResultItem(
-                    title=title or "(untitled)",
-                    url=link,
-                    snippet=snippet,
-                    source="Web (SerpAPI)",
-                    meta={"kind": _kind_for_domain(link)},
-                    image=thumb
-                ))
-                if len(out) >= limit:
-                    return out
-    except Exception:
-        pass
+def _serpapi_request(query: str, page: int, key: str) -> Tuple[str, dict]:
+    return SERPAPI, {"engine": "google", "q": query, "num": PAGE_SIZE, "start": page * PAGE_SIZE, "api_key": key}
+
+def _serpapi_items(data: dict) -> List[Record]:
+    out: List[Record] = []
+    for it in (data.get("organic_results") or []):
+        link = it.get("link")
+        if not link:
+            continue
+        title = it.get("title")
+        snippet = it.get("snippet") or ""
+        out.append(Record(
+            title=title or "(untitled)",
+            url=link,
+            snippet=snippet,
+            source="Web (SerpAPI)",
+            kind=_kind_for_domain(link),
+        ))
     return out
 
-def _google_cse(query: str, limit: int, cx: str, key: str) -> List[ResultItem]:
-    out: List[ResultItem] = []
-    try:
-        page_size = 10
-        pages = math.ceil(min(limit, 100) / page_size)
-        for page in range(pages):
-            start = page * page_size + 1
-            r = requests.get(
-                "https://www.googleapis.com/customsearch/v1",
-                params={"q": query, "cx": cx, "key": key, "num": page_size, "start": start},
-                timeout=15,
-            )
-            r.raise_for_status()
-            data = r.json()
-            for it in data.get("items", []) or []:
-                link = it.get("link")
-                if not link or not _looks_trustworthy(link):
-                    continue
-                title = it.get("title")
-                snippet = it.get("snippet") or ""
-                pagemap = it.get("pagemap", {})
-                thumb = None
-                if "cse_image" in pagemap and pagemap["cse_image"]:
-                    thumb = pagemap["cse_image"][0].get("src")
-                thumb = thumb or fetch_og_image(link)
-                out.append(ResultItem(
-                    title=title or "(untitled)",
-                    url=link,
-                    snippet=snippet,
-                    source="Web (Google CSE)",
-                    meta={"kind": _kind_for_domain(link)},
-                    image=thumb
-                ))
-                if len(out) >= limit:
-                    return out
-    except Exception:
-        pass
+def _cse_request(query: str, page: int, cx: str, key: str) -> Tuple[str, dict]:
+    start = page * PAGE_SIZE + 1
+    return GOOGLE_CSE, {"q": query, "cx": cx, "key": key, "num": PAGE_SIZE, "start": start}
+
+def _cse_items(data: dict) -> List[Record]:
+    out: List[Record] = []
+    for it in data.get("items", []) or []:
+        link = it.get("link")
+        if not link:
+            continue
+        title = it.get("title")
+        snippet = it.get("snippet") or ""
+        pagemap = it.get("pagemap", {})
+        thumb = None
+        if "cse_image" in pagemap and pagemap["cse_image"]:
+            thumb = pagemap["cse_image"][0].get("src")
+        out.append(Record(
+            title=title or "(untitled)",
+            url=link,
+            snippet=snippet,
+            source="Web (Google CSE)",
+            kind=_kind_for_domain(link),
+            image=thumb
+        ))
     return out
 
-def search_web(query: str, limit: int, cfg: AppConfig) -> List[ResultItem]:
+class _Pager:
+    """
+    Plans which result pages to request next. Pages go out in parallel
+    (up to PAGE_CONCURRENCY); how many are asked for depends on how many
+    trustworthy hits a page has been yielding for this query. Results are
+    kept in page order, and the search counts as done once the pages
+    finished so far, with no gaps, hold `limit` trustworthy hits.
+    """
+
+    def __init__(self, limit: int, prior_rate: float):
+        self.limit = limit
+        self.prior = prior_rate
+        self.end = MAX_PAGES     # first page known to be past the last result
+        self.next_page = 0
+        self.in_flight: Set[int] = set()
+        self.kept: Dict[int, List[Record]] = {}
+        self.raw = 0
+
+    def rate(self) -> float:
+        # The prior counts as one page's worth of evidence.
+        kept = sum(len(v) for v in self.kept.values())
+        return (kept + self.prior * PAGE_SIZE) / (self.raw + PAGE_SIZE)
+
+    def _prefix(self) -> List[Record]:
+        out: List[Record] = []
+        for page in range(self.end):
+            if page not in self.kept:
+                break
+            out += self.kept[page]
+        return out
+
+    def _pending(self) -> List[int]:
+        return [p for p in self.in_flight if p < self.end]
+
+    def launch(self) -> List[int]:
+        """Pages to request now."""
+        if self.done():
+            return []
+        per_page = max(self.rate(), MIN_PASS_RATE) * PAGE_SIZE
+        expected = sum(len(v) for p, v in self.kept.items() if p < self.end) + len(self._pending()) * per_page
+        want = math.ceil(max(0.0, self.limit - expected) / per_page)
+        n = min(want, PAGE_CONCURRENCY - len(self._pending()), self.end - self.next_page)
+        pages = list(range(self.next_page, self.next_page + max(0, n)))
+        self.next_page += len(pages)
+        self.in_flight.update(pages)
+        return pages
+
+    def add(self, page: int, records: List[Record]) -> None:
+        self.in_flight.discard(page)
+        if not records:
+            self.end = min(self.end, page)  # past the last result
+        self.raw += len(records)
+        self.kept[page] = [r for r in records if _looks_trustworthy(r.url)]
+
+    def fail(self, page: int) -> None:
+        # Keep what ranks above the failed page, like a sequential walk would.
+        self.in_flight.discard(page)
+        self.end = min(self.end, page)
+
+    def done(self) -> bool:
+        if len(self._prefix()) >= self.limit:
+            return True
+        return not self._pending() and self.next_page >= self.end
+
+    def items(self) -> List[Record]:
+        return self._prefix()[:self.limit]
+
+def _prior_rate(query: str) -> float:
+    rate, _ = get_cache().peek("web_pass_rate", normalize_query(query))
+    return rate if rate is not None else _global_pass_rate
+
+def _remember_rate(query: str, pager: _Pager) -> None:
+    global _global_pass_rate
+    if not pager.raw:
+        return
+    rate = pager.rate()
+    get_cache().set("web_pass_rate", normalize_query(query), rate)
+    _global_pass_rate = 0.9 * _global_pass_rate + 0.1 * rate
+
+def _fetch_page(url: str, params: dict) -> dict:
+    r = httpclient.get(url, params=params, timeout=TIMEOUT)
+    r.raise_for_status()
+    return r.json()
+
+def _collect(query: str, request: Callable[[int], Tuple[str, dict]], parse: Callable[[dict], List[Record]], limit: int) -> List[Record]:
+    pager = _Pager(limit, _prior_rate(query))
+    futures: Dict = {}
+    skipped = None
+    try:
+        while True:
+            for page in pager.launch():
+                futures[_POOL.submit(_fetch_page, *request(page))] = page
+            if pager.done() or not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for f in done:
+                page = futures.pop(f)
+                try:
+                    pager.add(page, parse(f.result()))
+                except governor.UpstreamUnavailable as e:
+                    skipped = e
+                    pager.fail(page)
+                except Exception as e:
+                    metrics.source_error("web", e)
+                    pager.fail(page)
+    finally:
+        # Queued pages never start; running ones finish in the background.
+        for f in futures:
+            f.cancel()
+    if skipped and not pager.items():
+        raise skipped  # nothing fetched: let the cache keep its entry
+    _remember_rate(query, pager)
+    return pager.items()
+
+def _serpapi(query: str, limit: int, key: str) -> List[Record]:
+    return _collect(query, lambda page: _serpapi_request(query, page, key), _serpapi_items, limit)
+
+def _google_cse(query: str, limit: int, cx: str, key: str) -> List[Record]:
+    return _collect(query, lambda page: _cse_request(query, page, cx, key), _cse_items, limit)
+
+@cached_source("web", complete_when_short=False)
+@metrics.instrument_source("web")
+def search_web(query: str, limit: int, cfg: AppConfig) -> List[Record]:
     if cfg.serpapi_key:
         return _serpapi(query, limit, cfg.serpapi_key)
     if cfg.google_cse_id and cfg.google_cse_key:
@@ -1,65 +1,96 @@
-import requests
-from typing import List
-from utils.parsing import ResultItem
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+from utils import httpclient, metrics
+from utils.cache import cached_source, get_cache
+from utils.parsing import Kind, Record, normalize_query
 
 WIKI_API = "https://en.wikipedia.org/w/api.php"
 WIKI_SUMMARY = "https://en.wikipedia.org/api/rest_v1/page/summary/{title}"
+TIMEOUT = 10
+MAX_EXTRACTS = 20  # prop=extracts returns at most 20 intros per request
+THUMB_SIZE = 320
 
 HEADERS = {
     "User-Agent": "TrustworthyStudySearch/1.0 (https://github.com/; contact: example@example.com)"
 }
 
-def _search_api(query: str, limit: int) -> List[ResultItem]:
+# A lookup step: (url, params, parser). The parser gets the response and
+# returns items; an empty list moves on to the next fallback.
+Step = Tuple[str, Optional[dict], Callable[..., List[Record]]]
+
+# The fallback requests run here, side by side, once the main one came up empty.
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("WIKI_WORKERS") or 8), thread_name_prefix="wikipedia")
+
+def _generator_api(query: str, limit: int) -> Step:
+    # Ranked hits with plain-text intro, thumbnail and canonical URL in one request.
+    n = min(limit, MAX_EXTRACTS)
     params = {
         "action": "query",
-        "list": "search",
-        "srsearch": query,
         "format": "json",
-        "srlimit": limit,
+        "formatversion": 2,
+        "generator": "search",
+        "gsrsearch": query,
+        "gsrlimit": n,
+        "gsrnamespace": 0,
+        "prop": "extracts|pageimages|info",
+        "exintro": 1,
+        "explaintext": 1,
+        "exlimit": n,
+        "piprop": "thumbnail",
+        "pithumbsize": THUMB_SIZE,
+        "pilimit": n,
+        "inprop": "url",
+        "redirects": 1,
         "utf8": 1,
     }
-    r = requests.get(WIKI_API, params=params, timeout=10, headers=HEADERS)
-    r.raise_for_status()
-    data = r.json()
-    out: List[ResultItem] = []
-    for hit in data.get("query", {}).get("search", []):
-        title = hit.get("title", "")
-        page_url = f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"
-        snippet = (hit.get("snippet", "") or "").replace('<span class="searchmatch">', "").replace("</span>", "")
-        out.append(ResultItem(
-            title=title or "(untitled)",
-            url=page_url,
-            snippet=snippet,
-            source="Wikipedia",
-            meta={"kind": "encyclopedia"}
-        ))
-    return out
 
-def _summary_api(query: str) -> List[ResultItem]:
+    def parse(r) -> List[Record]:
+        r.raise_for_status()
+        pages = r.json().get("query", {}).get("pages", [])
+        out: List[Record] = []
+        # Pages come back keyed by id; "index" is the search rank.
+        for p in sorted(pages, key=lambda p: p.get("index", 0)):
+            title = p.get("title", "")
+            extract = p.get("extract") or ""
+            out.append(Record(
+                title=title or "(untitled)",
+                url=p.get("fullurl") or f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}",
+                snippet=extract[:300] + ("..." if len(extract) > 300 else ""),
+                source="Wikipedia",
+                kind=Kind.ENCYCLOPEDIA,
+                image=(p.get("thumbnail") or {}).get("source"),
+            ))
+        return out
+    return WIKI_API, params, parse
+
+def _summary_api(query: str) -> Step:
     # Try the summary endpoint with the query as title
     title = query.strip().replace(" ", "_")
-    r = requests.get(WIKI_SUMMARY.format(title=title), timeout=10, headers=HEADERS)
-    if r.status_code != 200:
-        return []
-    js = r.json()
-    if not js or "content_urls" not in js:
-        return []
-    url = js["content_urls"]["desktop"]["page"] if "desktop" in js.get("content_urls", {}) else js.get("content_urls", {}).get("page")
-    if not url:
-        url = f"https://en.wikipedia.org/wiki/{title}"
-    snippet = js.get("extract") or ""
-    display_title = js.get("title") or query
-    thumb = (js.get("thumbnail") or {}).get("source")
-    return [ResultItem(
-        title=display_title,
-        url=url,
-        snippet=snippet[:300] + ("..." if len(snippet) > 300 else ""),
-        source="Wikipedia",
-        meta={"kind": "encyclopedia"},
-        image=thumb
-    )]
-
-def _opensearch(query: str, limit: int) -> List[ResultItem]:
+
+    def parse(r) -> List[Record]:
+        if r.status_code != 200:
+            return []
+        js = r.json()
+        if not js or "content_urls" not in js:
+            return []
+        url = js["content_urls"]["desktop"]["page"] if "desktop" in js.get("content_urls", {}) else js.get("content_urls", {}).get("page")
+        if not url:
+            url = f"https://en.wikipedia.org/wiki/{title}"
+        snippet = js.get("extract") or ""
+        display_title = js.get("title") or query
+        thumb = (js.get("thumbnail") or {}).get("source")
+        return [Record(
+            title=display_title,
+            url=url,
+            snippet=snippet[:300] + ("..." if len(snippet) > 300 else ""),
+            source="Wikipedia",
+            kind=Kind.ENCYCLOPEDIA,
+            image=thumb
+        )]
+    return WIKI_SUMMARY.format(title=title), None, parse
+
+def _opensearch(query: str, limit: int) -> Step:
     params = {
         "action": "opensearch",
         "search": query,
@@ -67,34 +98,80 @@ def _opensearch(query: str, limit: int) -> List[ResultItem]:
         "namespace": 0,
         "format": "json"
     }
-    r = requests.get(WIKI_API, params=params, timeout=10, headers=HEADERS)
-    r.raise_for_status()
-    data = r.json()  # [query, titles[], descriptions[], urls[]]
-    out: List[ResultItem] = []
-    titles = data[1] if len(data) > 1 else []
-    descs  = data[2] if len(data) > 2 else []
-    urls   = data[3] if len(data) > 3 else []
-    for t, d, u in zip(titles, descs, urls):
-        out.append(ResultItem(
-            title=t or "(untitled)",
-            url=u,
-            snippet=(d or "")[:300],
-            source="Wikipedia",
-            meta={"kind": "encyclopedia"}
-        ))
-    return out
 
-def search_wikipedia(query: str, limit: int = 8) -> List[ResultItem]:
-    try:
-        items = _search_api(query, limit)
-        if items:
-            return items
-        # fallback 1: summary (direct page title)
-        items = _summary_api(query)
-        if items:
+    def parse(r) -> List[Record]:
+        r.raise_for_status()
+        data = r.json()  # [query, titles[], descriptions[], urls[]]
+        out: List[Record] = []
+        titles = data[1] if len(data) > 1 else []
+        descs  = data[2] if len(data) > 2 else []
+        urls   = data[3] if len(data) > 3 else []
+        for t, d, u in zip(titles, descs, urls):
+            out.append(Record(
+                title=t or "(untitled)",
+                url=u,
+                snippet=(d or "")[:300],
+                source="Wikipedia",
+                kind=Kind.ENCYCLOPEDIA
+            ))
+        return out
+    return WIKI_API, params, parse
+
+def _steps(query: str, limit: int) -> List[Step]:
+    # search, then fallback 1: summary (direct page title), then fallback 2: opensearch
+    return [_generator_api(query, limit), _summary_api(query), _opensearch(query, limit)]
+
+def _first(outcomes: List) -> List[Record]:
+    """The first non-empty result in step order; if every step failed, the first error."""
+    for items in outcomes:
+        if isinstance(items, list) and items:
             return items
-        # fallback 2: opensearch
-        items = _opensearch(query, limit)
-        return items
-    except Exception:
+    errors = [o for o in outcomes if isinstance(o, BaseException)]
+    if errors and len(errors) == len(outcomes):
+        raise errors[0]
+    return []
+
+def _run(url: str, params: Optional[dict], parse: Callable[..., List[Record]]) -> List[Record]:
+    return parse(httpclient.get(url, params=params, timeout=TIMEOUT, headers=HEADERS))
+
+def suggest_age(query: str, limit: int = 5) -> Optional[float]:
+    """Seconds since the completions for `query` were fetched, or None if they aren't cached."""
+    _, age = get_cache().peek("wiki_suggest", (normalize_query(query), limit))
+    return age
+
+def suggest(query: str, limit: int = 5) -> List[str]:
+    """Wikipedia title completions for `query` (opensearch), cached; [] on any error."""
+    def fetch() -> List[str]:
+        r = httpclient.get(WIKI_API, params=_opensearch(query, limit)[1], timeout=TIMEOUT, headers=HEADERS)
+        r.raise_for_status()
+        data = r.json()
+        return [t for t in (data[1] if len(data) > 1 else []) if normalize_query(t) != normalize_query(query)]
+    try:
+        return get_cache().get_or_compute("wiki_suggest", (normalize_query(query), limit), fetch)
+    except Exception as e:
+        metrics.source_error("wikipedia", e)
         return []
+
+@cached_source("wikipedia")
+@metrics.instrument_source("wikipedia")
+def search_wikipedia(query: str, limit: int = 8) -> List[Record]:
+    """
+    One generator=search request does the work. Only when it fails or finds
+    nothing are the fallbacks sent, together, so a miss costs two round
+    trips rather than three and a hit costs one request.
+    """
+    main, *fallbacks = _steps(query, limit)
+    try:
+        items = _run(*main)
+    except Exception as e:
+        items = e
+    if isinstance(items, list) and items:
+        return items
+    futures = [_POOL.submit(_run, *step) for step in fallbacks]
+    outcomes = [items]
+    for f in futures:
+        try:
+            outcomes.append(f.result())
+        except Exception as e:
+            outcomes.append(e)
+    return _first(outcomes)
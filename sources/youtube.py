@@ -1,64 +1,90 @@
-import requests, feedparser, urllib.parse
-from typing import List
-from utils.parsing import ResultItem
+import urllib.parse
+from typing import Iterable, List
+from utils import feeds, httpclient, metrics
+from utils.cache import cached_source
+from utils.parsing import Kind, Record
 from utils.config import AppConfig
 
+API = "https://www.googleapis.com/youtube/v3/search"
+RSS = "https://www.youtube.com/feeds/videos.xml"
+TIMEOUT = 10
+
 def _thumb_from_id(vid: str) -> str:
     # High-quality default thumbnail
     return f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg"
 
-def search_youtube(query: str, limit: int = 10, cfg: AppConfig | None = None) -> List[ResultItem]:
+def _api_params(query: str, limit: int, key: str) -> dict:
+    return {
+        "key": key,
+        "q": query,
+        "part": "snippet",
+        "type": "video",
+        "maxResults": min(25, limit),
+        "safeSearch": "strict",
+    }
+
+def _parse_api(data: dict) -> List[Record]:
+    out: List[Record] = []
+    for item in data.get("items", []):
+        vid = item["id"]["videoId"]
+        sn = item.get("snippet", {})
+        title = sn.get("title")
+        desc = sn.get("description") or ""
+        url = f"https://www.youtube.com/watch?v={vid}"
+        thumb = (sn.get("thumbnails", {}).get("high", {}) or {}).get("url") or _thumb_from_id(vid)
+        out.append(Record(
+            title=title,
+            url=url,
+            snippet=desc[:300] + ("..." if len(desc) > 300 else ""),
+            source="YouTube",
+            kind=Kind.VIDEO,
+            extra={"video_id": vid},
+            image=thumb
+        ))
+    return out
+
+def _rss_url(query: str) -> str:
+    # Fallback: YouTube RSS search (no API key)
+    return f"{RSS}?search_query={urllib.parse.quote_plus(query)}"
+
+RSS_FIELDS = {
+    "title": feeds.ATOM + "title",
+    "video_id": "{http://www.youtube.com/xml/schemas/2015}videoId",
+    "summary": "{http://search.yahoo.com/mrss/}description",
+}
+
+def _parse_rss(chunks: Iterable[bytes], limit: int) -> List[Record]:
+    """Records from the feed as it streams in; stops reading after `limit` entries."""
+    out: List[Record] = []
+    for e in feeds.iter_entries(chunks, RSS_FIELDS, timeout=TIMEOUT):
+        link = e.get("link", "")
+        if not e.get("title") or not link:
+            continue
+        vid = e.get("video_id") or (link.split("v=")[-1] if "v=" in link else "")
+        out.append(Record(
+            title=e["title"],
+            url=link,
+            snippet=feeds.snippet(e.get("summary", "")),
+            source="YouTube (RSS)",
+            kind=Kind.VIDEO,
+            extra={"video_id": vid},
+            image=_thumb_from_id(vid) if vid else None
+        ))
+        if len(out) >= limit:
+            break
+    return out
+
+@cached_source("youtube")
+@metrics.instrument_source("youtube")
+def search_youtube(query: str, limit: int = 10, cfg: AppConfig | None = None) -> List[Record]:
     key = (cfg.youtube_api_key if cfg else None)
     if key:
         try:
-            r = requests.get("https://www.googleapis.com/youtube/v3/search", params={
-                "key": key,
-                "q": query,
-                "part": "snippet",
-                "type": "video",
-                "maxResults": min(25, limit),
-                "safeSearch": "strict",
-            }, timeout=10)
+            r = httpclient.get(API, params=_api_params(query, limit, key), timeout=TIMEOUT)
             r.raise_for_status()
-            data = r.json()
-            out: List[ResultItem] = []
-            for item in data.get("items", []):
-                vid = item["id"]["videoId"]
-                sn = item.get("snippet", {})
-                title = sn.get("title")
-                desc = sn.get("description") or ""
-                url = f"https://www.youtube.com/watch?v={vid}"
-                thumb = (sn.get("thumbnails", {}).get("high", {}) or {}).get("url") or _thumb_from_id(vid)
-                out.append(ResultItem(
-                    title=title,
-                    url=url,
-                    snippet=desc[:300] + ("..." if len(desc) > 300 else ""),
-                    source="YouTube",
-                    meta={"kind": "video", "video_id": vid},
-                    image=thumb
-                ))
-            return out
-        except Exception:
-            pass
-    # Fallback: YouTube RSS search (no API key)
-    try:
-        q = urllib.parse.quote_plus(query)
-        feed_url = f"https://www.youtube.com/feeds/videos.xml?search_query={q}"
-        feed = feedparser.parse(feed_url)
-        out: List[ResultItem] = []
-        for e in feed.entries[:limit]:
-            title = e.title
-            link = e.link
-            vid = getattr(e, "yt_videoid", None) or (link.split("v=")[-1] if "v=" in link else "")
-            summary = getattr(e, "summary", "")
-            out.append(ResultItem(
-                title=title,
-                url=link,
-                snippet=summary[:300] + ("..." if len(summary) > 300 else ""),
-                source="YouTube (RSS)",
-                meta={"kind": "video", "video_id": vid},
-                image=_thumb_from_id(vid) if vid else None
-            ))
-        return out
-    except Exception:
-        return []
+            return _parse_api(r.json())
+        except Exception as e:
+            metrics.source_error("youtube", e)  # fall back to RSS
+    with httpclient.get(_rss_url(query), timeout=TIMEOUT, stream=True) as r:
+        r.raise_for_status()
+        return _parse_rss(r.iter_content(feeds.CHUNK), limit)
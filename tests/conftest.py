@@ -0,0 +1,20 @@
+import os
+import sys
+
+# Never touch the developer's .cache/: in-memory results, no local index.
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["LOCAL_INDEX"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from utils.cache import MemoryBackend, ResultCache, get_cache, set_cache  # noqa: E402
+
+
+@pytest.fixture
+def cache():
+    """A fresh in-memory ResultCache, installed as the process-wide one for the test."""
+    previous = get_cache()
+    fresh = ResultCache(MemoryBackend())
+    set_cache(fresh)
+    yield fresh
+    set_cache(previous)
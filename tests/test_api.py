@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from search import SearchResult
+from utils.parsing import Kind, Record
+from utils.ratelimit import TokenBuckets
+
+SECTION = "Peer-reviewed / Research"
+
+
+def _result(n):
+    return SearchResult(sections={SECTION: [Record(title=f"Paper {i}", url=f"https://example.org/{i}", kind=Kind.JOURNAL) for i in range(n)]})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, "_buckets", TokenBuckets(api.config.rate, api.config.burst))
+    monkeypatch.setattr(api, "warm_start", lambda: None)
+    with TestClient(api.api) as c:
+        yield c
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    """Makes every search return as many items as it asked for, capped at `available`."""
+    calls = []
+
+    def search(q, max_items, *args):
+        calls.append(max_items)
+        return _result(min(max_items, search.available))
+
+    search.available = 30
+    monkeypatch.setattr(api, "aggregated_search", search)
+    search.calls = calls
+    return search
+
+
+def test_page_reports_whether_more_follow(client, fetched):
+    page = client.get("/search", params={"q": "CRISPR", "section": SECTION, "max_items": 10, "offset": 10}).json()
+    assert fetched.calls == [21]  # down to the end of the page, plus one
+    section = page["sections"][SECTION]
+    assert [it["title"] for it in section["items"]] == [f"Paper {i}" for i in range(10, 20)]
+    assert section["has_more"] is True
+
+    last = client.get("/search", params={"q": "CRISPR", "section": SECTION, "max_items": 10, "offset": 20}).json()
+    assert len(last["sections"][SECTION]["items"]) == 10
+    assert last["sections"][SECTION]["has_more"] is False
+
+
+def test_rate_limited_after_burst(client, fetched, monkeypatch):
+    monkeypatch.setattr(api, "_buckets", TokenBuckets(0.01, 2))
+    codes = [client.get("/search", params={"q": "CRISPR"}).status_code for _ in range(3)]
+    assert codes == [200, 200, 429]
+
+
+def test_listed_api_key_gets_its_own_bucket(client, fetched, monkeypatch):
+    monkeypatch.setattr(api, "_buckets", TokenBuckets(0.01, 1))
+    monkeypatch.setattr(api.config, "api_keys", frozenset({"known"}))
+    assert client.get("/search", params={"q": "CRISPR"}).status_code == 200
+    assert client.get("/search", params={"q": "CRISPR"}, headers={"X-API-Key": "random"}).status_code == 429
+    assert client.get("/search", params={"q": "CRISPR"}, headers={"X-API-Key": "known"}).status_code == 200
+
+
+@pytest.fixture
+def saturated(monkeypatch):
+    """No free search slot, and a short queue timeout."""
+    monkeypatch.setattr(api, "_slots", asyncio.Semaphore(0))
+    monkeypatch.setattr(api.config, "queue_timeout", 0.05)
+    monkeypatch.setattr(api, "aggregated_search", lambda *a: pytest.fail("search ran without a slot"))
+
+
+def test_queue_timeout_answers_from_cache(client, saturated, monkeypatch):
+    monkeypatch.setattr(api, "cached_search", lambda q, n, *a: _result(min(n, 5)))
+    r = client.get("/search", params={"q": "CRISPR", "section": SECTION})
+    assert r.status_code == 200
+    assert r.headers["X-Degraded"] == "cache-only"
+    assert r.json()["degraded"] is True
+    assert len(r.json()["sections"][SECTION]["items"]) == 5
+
+
+def test_queue_timeout_without_cache_is_shed(client, saturated, monkeypatch):
+    monkeypatch.setattr(api, "cached_search", lambda *a: SearchResult(sections={}))
+    r = client.get("/search/stream", params={"q": "CRISPR"})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == str(api.config.retry_after)
+
+
+def test_stream_releases_its_slot(client, monkeypatch):
+    monkeypatch.setattr(api, "aggregated_search_iter", lambda q, n, *a: iter([_result(3)]))
+    before = client.get("/healthz").json()["in_flight"]
+    lines = client.get("/search/stream", params={"q": "CRISPR"}).text.splitlines()
+    assert len(lines) == 1
+    assert client.get("/healthz").json()["in_flight"] == before
@@ -0,0 +1,67 @@
+import json
+
+from batch import completed_topics
+
+
+def _write(path, lines, tail=""):
+    path.write_text("".join(json.dumps(line) + "\n" for line in lines) + tail, encoding="utf-8")
+
+
+def test_missing_file_means_nothing_done(tmp_path):
+    assert completed_topics(str(tmp_path / "out.jsonl")) == set()
+
+
+def test_torn_last_line_is_truncated(tmp_path):
+    out = tmp_path / "out.jsonl"
+    _write(out, [{"topic": "Black holes", "sections": {}}, {"topic": "CRISPR", "sections": {}}], tail='{"topic": "Enzy')
+    assert completed_topics(str(out)) == {"black holes", "crispr"}
+    assert out.read_text(encoding="utf-8").endswith('"sections": {}}\n')
+    assert completed_topics(str(out)) == {"black holes", "crispr"}
+
+
+def test_error_lines_are_retried(tmp_path):
+    out = tmp_path / "out.jsonl"
+    _write(out, [{"topic": "a b c", "sections": {}}, {"topic": "d e f", "error": "ValueError()"}])
+    assert completed_topics(str(out)) == {"a b c"}
+    assert len(out.read_text(encoding="utf-8").splitlines()) == 2  # kept, not truncated
+
+
+def test_corrupt_middle_line_is_skipped_not_truncated(tmp_path, capsys):
+    out = tmp_path / "out.jsonl"
+    out.write_text(
+        json.dumps({"topic": "a b c", "sections": {}}) + "\n"
+        + '{"topic": "garbled\n'
+        + json.dumps({"topic": "d e f", "sections": {}}) + "\n",
+        encoding="utf-8",
+    )
+    before = out.read_text(encoding="utf-8")
+    assert completed_topics(str(out)) == {"a b c", "d e f"}
+    assert out.read_text(encoding="utf-8") == before
+    assert "skipped 1 unreadable line" in capsys.readouterr().err
+
+
+def test_unterminated_last_line_is_kept_and_ended(tmp_path):
+    out = tmp_path / "out.jsonl"
+    _write(out, [{"topic": "a b c", "sections": {}}], tail=json.dumps({"topic": "d e f", "sections": {}}))
+    assert completed_topics(str(out)) == {"a b c", "d e f"}
+    assert out.read_text(encoding="utf-8").endswith("}\n")
+
+
+def test_pubmed_cache_hit_must_cover_the_limit(cache, monkeypatch):
+    import batch
+    from utils.cache import SourceEntry
+    from utils.parsing import Record
+
+    cache.set("pubmed", "black holes", SourceEntry(4, [Record(title=f"p{i}") for i in range(4)]))
+    delivered, searched = [], []
+    batcher = batch._PubMedBatcher(lambda t, name, items: delivered.append(items))
+    monkeypatch.setattr(batcher, "_search", lambda t, limit: searched.append(limit))
+
+    class Pool:
+        def submit(self, fn, *args):
+            fn(*args)
+
+    batcher.submit(Pool(), batch._Topic("Black holes"), 3)
+    assert [len(items) for items in delivered] == [3]
+    batcher.submit(Pool(), batch._Topic("Black holes"), 8)
+    assert searched == [8]  # four cached items don't answer a request for eight
@@ -0,0 +1,95 @@
+import sqlite3
+import time
+
+from utils.cache import SQLiteBackend, SourceEntry, cached_source, dumps, loads
+from utils.parsing import Kind, Record
+
+
+def _source(n_available=100):
+    calls = []
+
+    @cached_source("test_source")
+    def search(query: str, limit: int = 10):
+        calls.append(limit)
+        return [Record(title=f"{query} {i}", url=f"https://example.org/{i}") for i in range(min(limit, n_available))]
+
+    return search, calls
+
+
+def test_smaller_limit_is_sliced_from_the_cached_entry(cache):
+    search, calls = _source()
+    assert len(search("Topic", 10)) == 10
+    five = search("topic ", 5)  # same normalized query
+    assert [r.title for r in five] == [f"Topic {i}" for i in range(5)]
+    assert calls == [10]
+
+
+def test_larger_limit_tops_up_and_never_shrinks(cache):
+    search, calls = _source()
+    search("topic", 5)
+    assert len(search("topic", 20)) == 20
+    assert calls == [5, 20]
+    search("topic", 8)
+    assert calls == [5, 20]
+    entry, _ = cache.peek("test_source", "topic")
+    assert entry.limit == 20
+
+
+def test_short_result_serves_any_limit(cache):
+    search, calls = _source(n_available=3)
+    assert len(search("topic", 10)) == 3
+    assert len(search("topic", 50)) == 3
+    assert calls == [10]
+
+
+def test_peek_and_age_never_fetch(cache):
+    search, calls = _source()
+    assert search.peek("topic") is None
+    assert search.age("topic") is None
+    search("topic", 10)
+    assert len(search.peek("topic", 4)) == 4
+    assert search.age("topic") >= 0
+    assert calls == [10]
+
+
+def test_values_round_trip_as_json():
+    rec = Record(title="A", url="https://x.org", kind=Kind.JOURNAL, year=2020, extra={"doi": "10.1/x"})
+    stored_at, fresh_for, entry = loads(dumps((1.0, 2.0, SourceEntry(5, [rec]))))
+    assert (stored_at, fresh_for) == (1.0, 2.0)
+    assert entry == SourceEntry(5, [rec])
+    assert entry.items[0].kind is Kind.JOURNAL
+
+
+def test_undecodable_entries_are_misses(cache):
+    import pickle
+
+    cache.backend.set(cache._key("ns", "k"), pickle.dumps((0.0, 60.0, "x")))
+    assert cache.peek("ns", "k") == (None, None)
+
+
+def test_sqlite_hits_do_not_write(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "c.sqlite"))
+    backend.set("k", b"v", ex=60)
+    statements = []
+    backend._conn().set_trace_callback(statements.append)
+    for _ in range(5):
+        assert backend.get("k") == b"v"
+    backend.expire("k", 600)
+    assert not [s for s in statements if not s.lstrip().upper().startswith("SELECT")]
+    backend.flush()
+    hits, expires_at = backend._conn().execute("SELECT hits, expires_at FROM cache WHERE key = 'k'").fetchone()
+    assert hits == 5
+    assert expires_at > time.time() + 300
+
+
+def test_sqlite_errors_read_as_misses(tmp_path, monkeypatch):
+    backend = SQLiteBackend(str(tmp_path / "c.sqlite"))
+    backend.set("k", b"v", ex=60)
+
+    class Locked:
+        def execute(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(backend, "_conn", Locked)
+    assert backend.get("k") is None
+    backend.set("k", b"w", ex=60)  # dropped, not raised
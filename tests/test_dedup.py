@@ -0,0 +1,53 @@
+from utils.dedup import canonical_url, dedupe, identifiers
+from utils.parsing import Kind, Record
+
+TITLE = "Attention is all you need for sequence transduction"
+
+
+def test_canonical_url_drops_tracking_and_noise():
+    assert canonical_url("http://www.Example.org/a/?utm_source=x&b=2&a=1#top") == "https://example.org/a?a=1&b=2"
+
+
+def test_identifiers_share_one_space():
+    arxiv = Record(title="t", url="https://arxiv.org/abs/1706.03762v5")
+    doi = Record(title="t", url="https://doi.org/10.48550/arXiv.1706.03762")
+    assert identifiers(arxiv) == identifiers(doi) == {"arxiv:1706.03762"}
+    pm = Record(title="t", url="https://pubmed.ncbi.nlm.nih.gov/123/", extra={"doi": "10.1000/XYZ."})
+    assert identifiers(pm) == {"pmid:123", "doi:10.1000/xyz"}
+
+
+def test_same_url_merges_and_keeps_the_first_as_primary():
+    a = Record(title="A", url="https://example.org/x?utm_medium=y", source="Web")
+    b = Record(title="A copy", url="https://www.example.org/x/", source="Crossref", citations=5, image="i.png")
+    (merged,) = dedupe([a, b])
+    assert merged.title == "A" and merged.citations == 5 and merged.image == "i.png"
+    assert merged.extra["sources"] == ["Web", "Crossref"]
+    assert a.extra is None  # inputs (possibly cached) are not mutated
+
+
+def test_transitive_clusters_merge_through_union_find():
+    # a~b by DOI, b~c by URL: all three are one work.
+    a = Record(title="x", url="https://a.org/1", extra={"doi": "10.1/abc"}, kind=Kind.PREPRINT)
+    b = Record(title="y", url="https://b.org/2", extra={"doi": "10.1/ABC"}, kind=Kind.JOURNAL)
+    c = Record(title="z", url="https://b.org/2/", citations=9)
+    (merged,) = dedupe([a, b, c])
+    assert merged.kind is Kind.JOURNAL and merged.citations == 9
+
+
+def test_near_duplicate_research_titles_merge():
+    a = Record(title=TITLE, url="https://a.org/1", kind=Kind.PREPRINT)
+    b = Record(title=TITLE.upper() + ".", url="https://b.org/2", kind=Kind.JOURNAL)
+    c = Record(title="Attention is all you need for sequence transduction tasks", url="https://c.org/3", kind=Kind.JOURNAL)
+    assert len(dedupe([a, b, c])) == 1
+
+
+def test_titles_do_not_merge_outside_research_or_when_short():
+    web = [Record(title=TITLE, url=f"https://{n}.org/", kind=Kind.ARTICLE) for n in "ab"]
+    assert len(dedupe(web)) == 2
+    short = [Record(title="Deep learning", url=f"https://{n}.org/", kind=Kind.JOURNAL) for n in "ab"]
+    assert len(dedupe(short)) == 2
+
+
+def test_distinct_results_survive_in_order():
+    items = [Record(title=f"Result number {i} about topic", url=f"https://e.org/{i}", kind=Kind.JOURNAL) for i in range(50)]
+    assert [r.url for r in dedupe(items)] == [r.url for r in items]
@@ -0,0 +1,61 @@
+import pytest
+
+from utils import enrich
+from utils.parsing import Kind, Record
+
+
+@pytest.fixture
+def services(monkeypatch, cache):
+    """Stub upstream lookups; records which service was asked about what."""
+    asked = []
+
+    def stub(name, answer):
+        def lookup(ids):
+            asked.append((name, sorted(ids)))
+            return answer(ids)
+        monkeypatch.setattr(enrich, name, lookup)
+
+    stub("_crossref_by_doi", lambda ids: [Record(title="J", source="Crossref", kind=Kind.JOURNAL, citations=42, year=2020, extra={"doi": d}) for d in ids])
+    stub("_pubmed_by_doi", lambda ids: [])
+    stub("_pubmed_by_pmid", lambda ids: [])
+    stub("_arxiv_by_id", lambda ids: [])
+    return asked
+
+
+def test_results_of_one_query_enrich_each_other(services):
+    pubmed = Record(title="P", source="PubMed", kind=Kind.JOURNAL, extra={"pmid": "111", "doi": "10.1/abc"})
+    crossref = Record(title="C", source="Crossref", kind=Kind.JOURNAL, citations=7, extra={"doi": "10.1/ABC"})
+    out = enrich.enrich([pubmed, crossref])
+    assert services == []  # each service already described the DOI
+    assert out[0].citations == 7
+    assert out[1].extra["pmid"] == "111"
+    # The inputs are untouched; the merged fields live on copies.
+    assert pubmed.citations is None and "pmid" not in crossref.extra
+
+
+def test_preprint_follows_its_journal_doi(services, monkeypatch):
+    monkeypatch.setattr(enrich, "_arxiv_by_id", lambda ids: [
+        Record(title="A", source="arXiv", kind=Kind.PREPRINT, url=f"http://arxiv.org/abs/{ids[0]}v1", extra={"doi": "10.2/journal"})
+    ])
+    # Found by web search: arXiv is asked for the id, and the DOI it reports goes to Crossref.
+    preprint = Record(title="A", source="Web", kind=Kind.PREPRINT, url="https://arxiv.org/abs/2101.00001v2")
+    [out] = enrich.enrich([preprint])
+    assert ("_crossref_by_doi", ["10.2/journal"]) in services  # second round
+    assert out.kind == Kind.JOURNAL
+    assert out.citations == 42
+    assert out.extra["doi"] == "10.2/journal"
+
+
+def test_resolved_ids_are_not_asked_again(services):
+    item = Record(title="P", source="PubMed", kind=Kind.JOURNAL, extra={"pmid": "111", "doi": "10.3/x"})
+    enrich.enrich([item])
+    first = list(services)
+    assert ("_crossref_by_doi", ["10.3/x"]) in first
+    assert enrich.enrich([item])[0].citations == 42
+    assert services == first
+
+
+def test_non_research_items_pass_through(services):
+    video = Record(title="V", source="YouTube", kind=Kind.VIDEO, url="https://doi.org/10.4/v")
+    assert enrich.enrich([video]) == [video]
+    assert services == []
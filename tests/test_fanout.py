@@ -0,0 +1,54 @@
+import threading
+import time
+
+from utils.fanout import fan_out, iter_fan_out
+
+
+def _sleeper(seconds, value=None):
+    def run():
+        time.sleep(seconds)
+        return value
+    return run
+
+
+def test_results_arrive_as_each_task_settles():
+    order = [name for name, _, _ in iter_fan_out({"slow": _sleeper(0.2, 2), "fast": _sleeper(0.01, 1)}, deadline=2)]
+    assert order == ["fast", "slow"]
+
+
+def test_deadline_abandons_stragglers_without_waiting():
+    release = threading.Event()
+    t0 = time.monotonic()
+    res = fan_out({"ok": lambda: "x", "stuck": release.wait}, deadline=0.2)
+    elapsed = time.monotonic() - t0
+    release.set()
+    assert res.results == {"ok": "x"}
+    assert res.timed_out == ["stuck"]
+    assert elapsed < 0.5
+
+
+def test_per_source_budget_cuts_one_task_early():
+    t0 = time.monotonic()
+    events = [(name, status, round(time.monotonic() - t0, 1)) for name, status, _ in iter_fan_out(
+        {"tight": _sleeper(1.0), "roomy": _sleeper(0.3, "y")},
+        deadline=2,
+        budget={"tight": 0.1},
+    )]
+    assert events[0][:2] == ("tight", "timed_out") and events[0][2] < 0.3
+    assert events[1][:2] == ("roomy", "ok")
+
+
+def test_budget_never_exceeds_the_deadline():
+    t0 = time.monotonic()
+    res = fan_out({"a": _sleeper(1.0)}, deadline=0.1, budget=5)
+    assert res.timed_out == ["a"]
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_exceptions_are_reported_not_raised():
+    def boom():
+        raise ValueError("nope")
+
+    res = fan_out({"bad": boom, "good": lambda: 1}, deadline=1)
+    assert res.results == {"good": 1}
+    assert res.failed == {"bad": "ValueError('nope')"}
@@ -0,0 +1,48 @@
+import pytest
+
+from utils import feeds
+
+FIELDS = {"title": feeds.ATOM + "title"}
+
+
+def _feed(n):
+    entries = "".join(
+        f'<entry><title>Paper {i}</title><link rel="alternate" href="https://example.org/{i}"/></entry>' for i in range(n)
+    )
+    return f'<feed xmlns="http://www.w3.org/2005/Atom"><title>Feed</title>{entries}</feed>'.encode()
+
+
+def _chunks(body, size=64):
+    """Split `body` into chunks and remember how many were read."""
+    read = []
+
+    def gen():
+        for i in range(0, len(body), size):
+            read.append(i)
+            yield body[i:i + size]
+    return gen(), read
+
+
+def test_entries_keep_only_the_wanted_fields():
+    entries = list(feeds.iter_entries([_feed(2)], FIELDS))
+    assert entries == [
+        {"title": "Paper 0", "link": "https://example.org/0"},
+        {"title": "Paper 1", "link": "https://example.org/1"},
+    ]
+
+
+def test_stops_reading_once_the_caller_has_enough():
+    body = _feed(50)
+    chunks, read = _chunks(body)
+    it = feeds.iter_entries(chunks, FIELDS)
+    first = [next(it) for _ in range(3)]
+    assert [e["title"] for e in first] == ["Paper 0", "Paper 1", "Paper 2"]
+    assert len(read) * 64 < len(body) / 4  # the rest of the body was never pulled
+
+
+def test_overall_timeout(monkeypatch):
+    clock = iter([0.0, 0.0])  # then 100s later
+    monkeypatch.setattr(feeds.time, "monotonic", lambda: next(clock, 100.0))
+    chunks, _ = _chunks(_feed(50))
+    with pytest.raises(feeds.FeedTimeout):
+        list(feeds.iter_entries(chunks, FIELDS, timeout=5))
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from utils import governor
+from utils.ratelimit import TokenBuckets
+
+
+@pytest.fixture(autouse=True)
+def fresh_governor(monkeypatch, cache):
+    monkeypatch.setattr(governor, "_breakers", {})
+    monkeypatch.setattr(governor, "_enabled", True)
+
+
+def _fail(host, n):
+    for _ in range(n):
+        governor.record(host, ok=False)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    _fail("h", governor.FAILURES - 1)
+    governor.record("h", ok=True)  # a success resets the count
+    _fail("h", governor.FAILURES - 1)
+    governor.acquire("h")
+    _fail("h", 1)
+    with pytest.raises(governor.UpstreamUnavailable) as info:
+        governor.acquire("h")
+    assert info.value.reason == "circuit open"
+    assert 0 < info.value.retry_after <= governor.COOLDOWN
+
+
+def test_half_open_lets_one_probe_through():
+    b = governor.breaker("h")
+    _fail("h", governor.FAILURES)
+    b.open_until = time.time() - 1  # cooldown over
+    assert b.allow() == 0.0 and b.state == governor.HALF_OPEN
+    assert b.allow() > 0  # the probe is still out
+    governor.record("h", ok=True)
+    assert b.state == governor.CLOSED and b.allow() == 0.0
+
+
+def test_failed_probe_doubles_the_cooldown():
+    b = governor.breaker("h")
+    _fail("h", governor.FAILURES)
+    b.open_until = time.time() - 1
+    b.allow()
+    governor.record("h", ok=False)
+    assert b.state == governor.OPEN
+    assert b.cooldown == 2 * governor.COOLDOWN
+
+
+def test_open_breaker_is_shared_through_the_cache(monkeypatch):
+    _fail("h", governor.FAILURES)
+    monkeypatch.setattr(governor, "_breakers", {})  # another worker
+    with pytest.raises(governor.UpstreamUnavailable):
+        governor.acquire("h")
+
+
+def test_bucket_paces_then_refuses(monkeypatch):
+    monkeypatch.setitem(governor._buckets, "slow.example", TokenBuckets(1.0, 1.0, max_keys=1))
+    monkeypatch.setattr(governor, "MAX_WAIT", 1.5)
+    assert governor._admit("slow.example") == 0.0
+    assert governor._admit("slow.example") == pytest.approx(1.0, abs=0.05)  # booked: sleep, then send
+    with pytest.raises(governor.UpstreamUnavailable) as info:
+        governor._admit("slow.example")  # two seconds of queue is over MAX_WAIT
+    assert info.value.reason == "rate limited"
+
+
+def test_try_acquire_never_books_ahead(monkeypatch):
+    monkeypatch.setitem(governor._buckets, "slow.example", TokenBuckets(1.0, 1.0, max_keys=1))
+    assert governor.try_acquire("slow.example")
+    assert not governor.try_acquire("slow.example")
+    assert governor._admit("slow.example") <= 1.0  # the refusal left no debt behind
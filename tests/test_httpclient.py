@@ -0,0 +1,76 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, ReadTimeoutError
+
+from utils import httpclient, latency
+
+
+class _Slow(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.hits += 1
+        time.sleep(self.server.delay)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+
+@pytest.fixture
+def slow_server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Slow)
+    srv.daemon_threads = True
+    srv.hits, srv.delay = 0, 1.0
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_read_timeout_is_not_retried(slow_server):
+    url = f"http://127.0.0.1:{slow_server.server_port}/"
+    t0 = time.perf_counter()
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        httpclient.get(url, timeout=0.3, label="slow")
+    assert time.perf_counter() - t0 < 0.9
+    time.sleep(0.8)  # let a retried copy, if any, reach the server
+    assert slow_server.hits == 1
+
+
+def test_timeout_feeds_the_latency_histogram(slow_server, monkeypatch):
+    monkeypatch.setattr(latency, "_hists", {})
+    url = f"http://127.0.0.1:{slow_server.server_port}/"
+    with pytest.raises(requests.exceptions.Timeout):
+        httpclient.get(url, timeout=0.3, label="slow")
+    assert sum(latency.histogram("slow").merged()) == 1
+    # Recorded when it fired, so a tight timeout pulls the host's p99 up to it.
+    assert latency.BOUNDS[latency.histogram("slow").merged().index(1)] >= 0.3
+
+
+def test_refused_connection_adds_no_sample(monkeypatch):
+    monkeypatch.setattr(latency, "_hists", {})
+    with pytest.raises(requests.exceptions.ConnectionError):
+        httpclient.get("http://127.0.0.1:9/", timeout=0.3, label="refused")
+    assert sum(latency.histogram("refused").merged()) == 0
+
+
+def test_wrapped_timeout_adds_a_sample(monkeypatch):
+    monkeypatch.setattr(latency, "_hists", {})
+
+    class Session:
+        def get(self, *args, **kwargs):
+            try:
+                raise MaxRetryError(None, "/", ReadTimeoutError(None, "/", "Read timed out."))
+            except MaxRetryError as e:
+                raise requests.exceptions.ConnectionError(e)
+
+    monkeypatch.setattr(httpclient, "session", Session)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        httpclient.get("http://wrapped.invalid/", label="wrapped")
+    assert sum(latency.histogram("wrapped").merged()) == 1
@@ -0,0 +1,60 @@
+import pytest
+
+from utils import latency
+
+
+@pytest.fixture(autouse=True)
+def fresh_histograms(monkeypatch):
+    monkeypatch.setattr(latency, "_hists", {})
+
+
+def _fill(host, seconds, n):
+    for _ in range(n):
+        latency.observe(host, seconds)
+
+
+def test_ceiling_until_enough_samples():
+    _fill("h", 3.0, latency.MIN_SAMPLES - 1)
+    assert latency.timeout("h", 15) == 15
+    assert latency.hedge_delay("h") is None
+
+
+def test_timeout_follows_p99_with_margin():
+    _fill("h", 0.5, 99)
+    _fill("h", 3.0, 1)
+    p99 = latency.histogram("h").quantile(0.99)
+    assert 0.5 <= p99 <= 0.5 * 1.25
+    assert latency.timeout("h", 15) == pytest.approx(p99 * latency.TIMEOUT_MARGIN)
+
+
+def test_timeout_is_clamped():
+    _fill("fast", 0.02, 100)
+    assert latency.timeout("fast", 15) == latency.MIN_TIMEOUT
+    _fill("slow", 20.0, 100)
+    assert latency.timeout("slow", 15) == 15
+
+
+def test_hedge_delay_is_p95():
+    _fill("h", 0.1, 95)
+    _fill("h", 5.0, 5)
+    assert 0.1 <= latency.hedge_delay("h") <= 0.125
+
+
+def test_hedges_are_capped_by_ratio(monkeypatch):
+    monkeypatch.setattr(latency, "HEDGE_MAX_RATIO", 0.05)
+    _fill("h", 0.1, 100)
+    sent = 0
+    while latency.hedge_allowed("h"):
+        latency.hedged("h")
+        sent += 1
+    assert sent == 5
+
+
+def test_old_samples_leave_the_window(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(latency.time, "time", lambda: now[0])
+    _fill("h", 2.0, 100)
+    assert latency.timeout("h", 15) > latency.MIN_TIMEOUT
+    now[0] += latency.WINDOW + 1
+    assert latency.histogram("h").merged() == [0] * (len(latency.BOUNDS) + 1)
+    assert latency.timeout("h", 15) == 15
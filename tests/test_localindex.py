@@ -0,0 +1,64 @@
+import sqlite3
+import time
+
+import pytest
+
+from utils import localindex
+from utils.localindex import LocalIndex
+from utils.parsing import Kind, Record
+
+
+@pytest.fixture
+def index(tmp_path):
+    try:
+        return LocalIndex(str(tmp_path / "index.sqlite"))
+    except sqlite3.OperationalError:
+        pytest.skip("sqlite3 built without FTS5")
+
+
+def _ingest(index, *items):
+    index.ingest(items)
+    index.flush()
+
+
+def test_matches_every_term_within_the_kinds(index):
+    _ingest(
+        index,
+        Record(title="CRISPR gene editing", url="https://example.org/a", kind=Kind.JOURNAL),
+        Record(title="Gene therapy overview", url="https://example.org/b", kind=Kind.JOURNAL),
+        Record(title="CRISPR explained", url="https://example.org/c", snippet="gene editing basics", kind=Kind.VIDEO),
+    )
+    hits, seen_at = index.search("crispr gene", {Kind.JOURNAL}, 10)
+    assert [h.title for h in hits] == ["CRISPR gene editing"]
+    assert seen_at == pytest.approx(time.time(), abs=5)
+    assert index.search("crispr gene", {Kind.JOURNAL, Kind.VIDEO}, 10)[0][0].title == "CRISPR gene editing"  # title ranks first
+
+
+def test_upsert_by_canonical_url_keeps_known_fields(index):
+    _ingest(index, Record(title="Old title", url="https://example.org/p?utm_source=x", kind=Kind.JOURNAL, citations=5, extra={"doi": "10.1/x"}))
+    _ingest(index, Record(title="New title", url="https://example.org/p", kind=Kind.JOURNAL))
+    hits, _ = index.search("title", {Kind.JOURNAL}, 10)
+    assert [(h.title, h.citations) for h in hits] == [("New title", 5)]
+
+
+def test_no_terms_no_query(index):
+    assert index.search("  ", {Kind.JOURNAL}, 10) == ([], 0.0)
+
+
+def test_compact_drops_unseen_and_surplus_rows(index, monkeypatch):
+    _ingest(index, *(Record(title=f"topic {i}", url=f"https://example.org/{i}", kind=Kind.JOURNAL) for i in range(5)))
+    monkeypatch.setattr(localindex, "MAX_DOCS", 3)
+    index.compact()
+    assert len(index.search("topic", {Kind.JOURNAL}, 10)[0]) == 3
+    monkeypatch.setattr(localindex, "RETAIN", -1)
+    index.compact()
+    assert index.search("topic", {Kind.JOURNAL}, 10)[0] == []
+
+
+def test_set_index_none_disables(monkeypatch, index):
+    monkeypatch.setattr(localindex, "_index", None)
+    monkeypatch.setattr(localindex, "_disabled", False)
+    localindex.set_index(index)
+    assert localindex.get_index() is index
+    localindex.set_index(None)
+    assert localindex.get_index() is None
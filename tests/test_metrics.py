@@ -0,0 +1,51 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, ReadTimeoutError
+
+from utils import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _outcomes(source):
+    series = metrics._counters.get("source_calls_total", {})
+    return {dict(k)["outcome"]: v for k, v in series.items() if dict(k)["source"] == source}
+
+
+def _wrapped_read_timeout():
+    # What requests raises once urllib3 gives up on a read timeout.
+    try:
+        raise MaxRetryError(None, "/", ReadTimeoutError(None, "/", "Read timed out."))
+    except MaxRetryError as e:
+        raise requests.ConnectionError(e)
+
+
+def test_wrapped_read_timeout_counts_as_timeout():
+    @metrics.instrument_source("t")
+    def search():
+        _wrapped_read_timeout()
+
+    assert search() == []
+    assert _outcomes("t") == {"timeout": 1.0}
+
+
+def test_other_failures_count_as_errors():
+    @metrics.instrument_source("t")
+    def search():
+        raise requests.ConnectionError("connection refused")
+
+    assert search() == []
+    assert _outcomes("t") == {"error": 1.0}
+
+
+def test_timed_out_walks_the_chain():
+    assert metrics.timed_out(requests.ReadTimeout())
+    assert not metrics.timed_out(ValueError())
+    with pytest.raises(requests.ConnectionError) as info:
+        _wrapped_read_timeout()
+    assert metrics.timed_out(info.value)
@@ -0,0 +1,58 @@
+import pytest
+
+from sources import websearch
+from sources.websearch import PAGE_SIZE, _Pager
+from utils.parsing import Record
+
+
+@pytest.fixture(autouse=True)
+def trust_by_url(monkeypatch):
+    monkeypatch.setattr(websearch, "_looks_trustworthy", lambda url: "/good/" in url)
+    monkeypatch.setattr(websearch, "PAGE_CONCURRENCY", 3)
+
+
+def _page(page, good):
+    return [Record(title=f"{page}-{i}", url=f"https://example.org/{'good' if i < good else 'bad'}/{page}/{i}") for i in range(PAGE_SIZE)]
+
+
+def test_low_pass_rate_asks_for_parallel_pages():
+    assert _Pager(limit=10, prior_rate=1.0).launch() == [0]
+    assert _Pager(limit=10, prior_rate=0.3).launch() == [0, 1, 2]  # ~3 good hits a page
+
+
+def test_results_stay_in_page_order():
+    pager = _Pager(limit=8, prior_rate=0.5)
+    assert pager.launch() == [0, 1]
+    pager.add(1, _page(1, 5))
+    assert pager.items() == [] and not pager.done()  # page 0 still missing
+    pager.add(0, _page(0, 5))
+    assert pager.done()
+    assert [r.title for r in pager.items()] == ["0-0", "0-1", "0-2", "0-3", "0-4", "1-0", "1-1", "1-2"]
+
+
+def test_observed_rate_plans_the_next_pages():
+    pager = _Pager(limit=10, prior_rate=1.0)
+    assert pager.launch() == [0]
+    pager.add(0, _page(0, 1))  # far fewer pass than the prior promised
+    # (1 + 10) / 20: the prior weighs as one page, so ~5.5 a page and two more pages.
+    assert pager.launch() == [1, 2]
+
+
+def test_empty_page_ends_the_walk():
+    pager = _Pager(limit=30, prior_rate=0.3)
+    pager.launch()
+    pager.add(0, _page(0, 3))
+    pager.add(1, [])
+    pager.add(2, _page(2, 3))  # past the end: not kept
+    assert pager.done()
+    assert len(pager.items()) == 3
+
+
+def test_failed_page_keeps_what_ranks_above_it():
+    pager = _Pager(limit=30, prior_rate=0.3)
+    pager.launch()
+    pager.add(0, _page(0, 3))
+    pager.fail(1)
+    pager.add(2, _page(2, 3))
+    assert pager.done()
+    assert [r.title for r in pager.items()] == ["0-0", "0-1", "0-2"]
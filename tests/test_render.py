@@ -0,0 +1,36 @@
+import json
+
+from utils import render
+from utils.parsing import Record
+
+
+def test_text_fields_are_escaped():
+    html = render.card_html(Record(
+        title='<script>alert(1)</script>',
+        url='https://example.org/?a=1&b="2"',
+        snippet="<b>bold</b>",
+        source="<i>src</i>",
+    ))
+    assert "<script>" not in html and "&lt;script&gt;" in html
+    assert "&lt;b&gt;bold&lt;/b&gt;" in html and "&lt;i&gt;src&lt;/i&gt;" in html
+    assert 'href="https://example.org/?a=1&amp;b=&quot;2&quot;"' in html
+
+
+def test_unsafe_urls_are_dropped():
+    html = render.card_html(Record(title="t", url="javascript:alert(1)", image="data:image/png;base64,AAAA"))
+    assert "javascript:" not in html and "data:" not in html
+    assert 'href="#"' in html and "<img" not in html
+    card = json.loads(render.sections_json({"S": [Record(title="t", url="JavaScript:alert(1)")]}))["sections"]["S"][0]
+    assert card["u"] == ""
+
+
+def test_section_title_is_escaped():
+    assert "<h3>A &amp; B</h3>" in render.section_html("A & B", [])
+
+
+def test_equal_cards_share_one_fragment():
+    render._card.cache_clear()
+    a = render.card_html(Record(title="Same", url="https://example.org/x"))
+    b = render.card_html(Record(title="Same", url="https://example.org/x"))
+    assert a is b
+    assert render._card.cache_info().hits == 1
@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+def test_do_shares_one_call():
+    sf = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 42
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(sf.do("k", fn)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(sf.do("k", fn)))
+    follower.start()
+    for _ in range(500):
+        if sf.coalesced:
+            break
+        time.sleep(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert results == [42, 42]
+    assert calls == [1]
+
+
+def test_do_shares_the_error():
+    sf = SingleFlight()
+
+    def boom():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        sf.do("k", boom)
+
+
+def test_do_iter_replays_then_follows_live():
+    sf = SingleFlight()
+    gate = threading.Event()
+
+    def gen():
+        yield 1
+        yield 2
+        gate.wait(5)
+        yield 3
+
+    first = sf.do_iter("k", gen)
+    assert [next(first), next(first)] == [1, 2]
+    # A late joiner gets everything produced so far, then the rest.
+    late = sf.do_iter("k", gen)
+    got = []
+    t = threading.Thread(target=lambda: got.extend(late))
+    t.start()
+    gate.set()
+    t.join(5)
+    assert got == [1, 2, 3]
+    assert list(first) == [3]
+    assert sf.calls == 2 and sf.coalesced == 1
+
+
+def test_do_iter_early_stop_does_not_cut_others_short():
+    sf = SingleFlight()
+    gate = threading.Event()
+
+    def gen():
+        yield "a"
+        gate.wait(5)
+        yield "b"
+
+    quitter = sf.do_iter("k", gen)
+    stayer = sf.do_iter("k", gen)
+    assert next(quitter) == "a"
+    quitter.close()
+    gate.set()
+    assert list(stayer) == ["a", "b"]
+
+
+def test_do_iter_raises_for_every_caller():
+    sf = SingleFlight()
+
+    def gen():
+        yield 1
+        raise RuntimeError("upstream")
+
+    it = sf.do_iter("k", gen)
+    with pytest.raises(RuntimeError):
+        list(it)
@@ -0,0 +1,47 @@
+from utils.parsing import Kind
+from utils.trust import Tier, TrustIndex, classify
+
+
+def _index():
+    return TrustIndex().load("""
+        edu             allowed,institutional
+        stanford.edu    allowed,trusted
+        wikipedia.org   allowed,trusted  encyclopedia
+        ibm.com/docs    allowed
+    """)
+
+
+def test_suffix_matches_only_on_label_boundaries():
+    idx = _index()
+    assert idx.classify("https://cs.mit.edu/x").tier == Tier.ALLOWED | Tier.INSTITUTIONAL
+    assert idx.classify("https://x.edu.evil.com/").tier == Tier.NONE
+    assert idx.classify("https://notedu/").tier == Tier.NONE
+    assert idx.classify("https://fakewikipedia.org/").tier == Tier.NONE
+
+
+def test_tiers_from_every_matching_suffix_combine():
+    v = _index().classify("https://cs.stanford.edu/people")
+    assert v.tier == Tier.ALLOWED | Tier.TRUSTED | Tier.INSTITUTIONAL
+
+
+def test_kind_and_case_insensitive_host():
+    v = _index().classify("https://EN.Wikipedia.org/wiki/Entropy")
+    assert v.allowed and v.kind is Kind.ENCYCLOPEDIA
+
+
+def test_path_rules_match_whole_segments():
+    idx = _index()
+    assert idx.classify("https://ibm.com/docs").allowed
+    assert idx.classify("https://www.ibm.com/docs/en/x").allowed
+    assert not idx.classify("https://ibm.com/docsearch").allowed
+    assert not idx.classify("https://ibm.com/blog").allowed
+
+
+def test_unparseable_urls_are_unknown():
+    idx = _index()
+    assert idx.classify(None).tier == Tier.NONE
+    assert idx.classify("not a url").tier == Tier.NONE
+
+
+def test_default_rules_are_loaded():
+    assert classify("https://www.nih.gov/health").allowed
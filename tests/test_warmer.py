@@ -0,0 +1,28 @@
+from utils.warmer import Warmer
+
+
+def _warmer(budget, followups, warmed):
+    w = Warmer(
+        warm=lambda query, params: warmed.append(query) or 1,
+        followups=followups,
+        busy=lambda: False,
+        budget=budget,
+    )
+    for query in ("alpha", "beta"):
+        for _ in range(3):
+            w.popularity.hit(query)
+    return w
+
+
+def test_completion_lookups_count_against_the_budget():
+    warmed = []
+    w = _warmer(3, lambda q: ([q + " x", q + " y"], 1), warmed)
+    assert w.tick() == 3
+    assert len(warmed) == 2  # both refreshes, then the lookup spends the last fetch
+
+
+def test_cached_completions_are_free():
+    warmed = []
+    w = _warmer(4, lambda q: ([q + " x", q + " y"], 0), warmed)
+    assert w.tick() == 4
+    assert len(warmed) == 4
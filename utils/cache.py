@@ -1,16 +1,504 @@
+import os
 import time
-from functools import lru_cache, wraps
+import json
+import inspect
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from utils import metrics, singleflight
+from utils.parsing import Kind, Record, normalize_query
 
-def timed_lru_cache(seconds: int = 300, maxsize: int = 128):
+# Seconds an entry counts as fresh, per namespace. After that it is served
+# stale for up to STALE_FACTOR * ttl while a background refresh runs.
+DEFAULT_TTLS: Dict[str, float] = {
+    "wikipedia": 24 * 3600,
+    "arxiv": 6 * 3600,
+    "pubmed": 6 * 3600,
+    "crossref": 6 * 3600,
+    "web": 3600,
+    "youtube": 3600,
+    "og_image": 7 * 24 * 3600,
+    "enrich": 24 * 3600,   # per-identifier metadata (citations, PMIDs, DOIs)
+    "web_pass_rate": 24 * 3600,  # share of web hits passing the trust filter, per query
+    "wiki_suggest": 24 * 3600,   # Wikipedia title completions, for prefetching follow-ups
+}
+DEFAULT_TTL = 300
+EMPTY_TTL = 60      # empty results are often upstream errors; retry them soon
+STALE_FACTOR = 1.0
+JITTER = 0.1        # +-10% on every TTL so entries don't all expire together
+KEY_PREFIX = "tss:v3:"  # bump when the cached value types change
+
+# Values are stored as JSON, never pickle: a shared backend (Redis, a SQLite
+# file) must not be able to run code in every app instance that reads it.
+# Records and source entries are tagged so they come back as themselves.
+_RECORD_FIELDS = tuple(f.name for f in fields(Record))
+
+def _encode(obj: Any) -> Any:
+    if isinstance(obj, Record):
+        return {"__record__": [getattr(obj, f) for f in _RECORD_FIELDS]}
+    if isinstance(obj, SourceEntry):
+        return {"__entry__": [obj.limit, obj.items]}
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"can't cache {type(obj).__name__}")
+
+def _decode(d: Dict[str, Any]) -> Any:
+    if "__record__" in d:
+        rec = Record(**dict(zip(_RECORD_FIELDS, d["__record__"])))
+        if rec.kind is not None:
+            rec.kind = Kind(rec.kind)
+        return rec
+    if "__entry__" in d:
+        return SourceEntry(*d["__entry__"])
+    return d
+
+def dumps(value: Any) -> bytes:
+    return json.dumps(value, default=_encode, ensure_ascii=False, separators=(",", ":")).encode()
+
+def loads(raw: bytes) -> Any:
+    return json.loads(raw, object_hook=_decode)
+
+
+class CacheBackend:
+    """Byte store with the Redis subset we use: get / set(ex=) / delete / expire."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ex: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def expire(self, key: str, ex: float) -> None:
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """In-process, size-bounded. policy="lru" or "lfu" (sampled, like Redis)."""
+
+    LFU_SAMPLE = 16
+
+    def __init__(self, max_entries: int = 2048, policy: str = "lru"):
+        self.max_entries = max_entries
+        self.policy = policy
+        self._data: "OrderedDict[str, list]" = OrderedDict()  # key -> [value, expires_at, hits]
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            e = self._data.get(key)
+            if e is None:
+                return None
+            if e[1] is not None and e[1] <= time.time():
+                del self._data[key]
+                return None
+            e[2] += 1
+            self._data.move_to_end(key)
+            return e[0]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = [value, time.time() + ex if ex else None, 0]
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        if self.policy == "lfu":
+            # Least-hit among the least recently used few.
+            sample = []
+            for k in self._data:
+                sample.append(k)
+                if len(sample) >= self.LFU_SAMPLE:
+                    break
+            victim = min(sample, key=lambda k: self._data[k][2])
+            del self._data[victim]
+        else:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def expire(self, key, ex):
+        with self._lock:
+            e = self._data.get(key)
+            if e is not None:
+                e[1] = time.time() + ex
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    On-disk store shared by every process that points at the same file.
+    WAL mode lets readers and a writer work at once. Reads don't write: hit
+    counts, access times and sliding expiry are buffered and applied in one
+    transaction every TOUCH_EVERY seconds or TOUCH_BATCH keys, so hits don't
+    queue on the write lock. A locked or broken file reads as a miss and
+    drops the write instead of failing the search.
+    """
+
+    EVICT_EVERY = 64  # sets between eviction passes
+    TOUCH_BATCH = 256
+    TOUCH_EVERY = 5.0
+
+    def __init__(self, path: str, max_entries: int = 50_000, policy: str = "lru"):
+        self.path = path
+        self.max_entries = max_entries
+        self.policy = policy
+        self._local = threading.local()
+        self._sets = 0
+        # key -> [last access, hits, expires_at or None]
+        self._touched: Dict[str, list] = {}
+        self._touch_lock = threading.Lock()
+        self._flushed = time.monotonic()
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with self._conn() as c:
+            c.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL,"
+                " accessed_at REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            c.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = c
+        return c
+
+    def _failed(self, op: str, error: sqlite3.Error) -> None:
+        metrics.inc("cache_errors_total", backend="sqlite", op=op, error=type(error).__name__)
+
+    def _touch(self, key: str, now: float, expires_at: Optional[float] = None) -> None:
+        with self._touch_lock:
+            t = self._touched.setdefault(key, [now, 0, None])
+            if expires_at is None:
+                t[0] = now
+                t[1] += 1
+            else:
+                t[2] = max(t[2] or 0.0, expires_at)
+            due = len(self._touched) >= self.TOUCH_BATCH or time.monotonic() - self._flushed >= self.TOUCH_EVERY
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered access times, hit counts and expiry extensions."""
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+            self._flushed = time.monotonic()
+        if not touched:
+            return
+        c = self._conn()
+        try:
+            c.execute("BEGIN")
+            # MAX(): an extension never shortens an entry, and NULL (no expiry) stays NULL.
+            c.executemany(
+                "UPDATE cache SET accessed_at = MAX(accessed_at, ?), hits = hits + ?,"
+                " expires_at = COALESCE(MAX(expires_at, ?), expires_at) WHERE key = ?",
+                [(at, hits, ex, key) for key, (at, hits, ex) in touched.items()],
+            )
+            c.execute("COMMIT")
+        except sqlite3.Error as e:
+            # Only bookkeeping for eviction and retention; losing a batch is fine.
+            if c.in_transaction:
+                c.execute("ROLLBACK")
+            self._failed("flush", e)
+
+    def get(self, key):
+        now = time.time()
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("get", e)
+            return None
+        if row is None:
+            return None
+        self._touch(key, now)
+        return row[0]
+
+    def set(self, key, value, ex=None):
+        now = time.time()
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at, hits) VALUES (?, ?, ?, ?, 0)",
+                (key, sqlite3.Binary(value), now + ex if ex else None, now),
+            )
+        except sqlite3.Error as e:
+            self._failed("set", e)
+            return
+        self._sets += 1
+        if self._sets % self.EVICT_EVERY == 0:
+            self.flush()
+            self._evict(now)
+
+    def _evict(self, now: float):
+        c = self._conn()
+        try:
+            c.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            (n,) = c.execute("SELECT COUNT(*) FROM cache").fetchone()
+            if n > self.max_entries:
+                order = "hits ASC, accessed_at ASC" if self.policy == "lfu" else "accessed_at ASC"
+                c.execute(
+                    f"DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY {order} LIMIT ?)",
+                    (n - self.max_entries,),
+                )
+        except sqlite3.Error as e:
+            self._failed("evict", e)
+
+    def delete(self, key):
+        with self._touch_lock:
+            self._touched.pop(key, None)
+        try:
+            self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            self._failed("delete", e)
+
+    def expire(self, key, ex):
+        # Only ever called to extend a hit entry (sliding retention), so it can wait for the next flush.
+        self._touch(key, time.time(), expires_at=time.time() + ex)
+
+
+class RedisBackend(CacheBackend):
+    """Wraps a redis-py client, or anything with the same get/set(px=)/delete/pexpire."""
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        import redis  # optional dependency
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ex=None):
+        self.client.set(key, value, px=int(ex * 1000) if ex else None)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def expire(self, key, ex):
+        self.client.pexpire(key, int(ex * 1000))
+
+
+class ResultCache:
+    """
+    Namespaced cache over a backend, with per-namespace TTLs, jittered expiry,
+    sliding retention for entries that keep getting hit, and stale-while-revalidate.
+    """
+
+    def __init__(self, backend: CacheBackend, ttls: Optional[Dict[str, float]] = None, sliding: bool = True):
+        self.backend = backend
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.sliding = sliding
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+    def ttl_for(self, namespace: str) -> float:
+        return self.ttls.get(namespace, DEFAULT_TTL)
+
+    def _key(self, namespace: str, key: Any) -> str:
+        return f"{KEY_PREFIX}{namespace}:{key}"
+
+    def _load(self, raw: Optional[bytes]) -> Optional[Tuple[float, float, Any]]:
+        if raw is None:
+            return None
+        try:
+            stored_at, fresh_for, value = loads(raw)
+        except Exception:
+            # Written by an incompatible version; treat as a miss.
+            return None
+        return stored_at, fresh_for, value
+
+    def peek(self, namespace: str, key: Any) -> Tuple[Any, Optional[float]]:
+        """(value, age in seconds), or (None, None) on a miss. Does not refresh."""
+        entry = self._load(self.backend.get(self._key(namespace, key)))
+        if entry is None:
+            return None, None
+        stored_at, _fresh_for, value = entry
+        return value, time.time() - stored_at
+
+    def set(self, namespace: str, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = ttl if ttl is not None else self.ttl_for(namespace)
+        if not value:
+            ttl = min(ttl, EMPTY_TTL)
+        fresh_for = ttl * random.uniform(1 - JITTER, 1 + JITTER)
+        raw = dumps((time.time(), fresh_for, value))
+        self.backend.set(self._key(namespace, key), raw, ex=fresh_for * (1 + STALE_FACTOR))
+
+    def delete(self, namespace: str, key: Any) -> None:
+        self.backend.delete(self._key(namespace, key))
+
+    def get_or_compute(
+        self,
+        namespace: str,
+        key: Any,
+        compute: Callable[[], Any],
+        ttl: Optional[float] = None,
+        accept: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """`accept(value)` returning False treats a cached value as a miss."""
+        k = self._key(namespace, key)
+        entry = self._load(self.backend.get(k))
+        if entry is not None and (accept is None or accept(entry[2])):
+            stored_at, fresh_for, value = entry
+            age = time.time() - stored_at
+            if age >= fresh_for:
+                metrics.inc("cache_requests_total", namespace=namespace, result="stale")
+                self._revalidate(namespace, key, compute, ttl)
+                return value
+            metrics.inc("cache_requests_total", namespace=namespace, result="hit")
+            if self.sliding:
+                # Keep hot entries around for a full stale window past now.
+                self.backend.expire(k, fresh_for - age + fresh_for * STALE_FACTOR)
+            return value
+        metrics.inc("cache_requests_total", namespace=namespace, result="miss")
+        # Concurrent misses on the same key share one upstream fetch.
+        return singleflight.group(namespace).do(k, lambda: self._load_and_set(namespace, key, compute, ttl))
+
+    def _load_and_set(self, namespace: str, key: Any, compute: Callable[[], Any], ttl: Optional[float]) -> Any:
+        value = compute()
+        self.set(namespace, key, value, ttl)
+        return value
+
+    def _revalidate(self, namespace: str, key: Any, compute: Callable[[], Any], ttl: Optional[float]) -> None:
+        k = self._key(namespace, key)
+        with self._lock:
+            if k in self._refreshing:
+                return
+            self._refreshing.add(k)
+
+        def run():
+            try:
+                singleflight.group(namespace).do(k, lambda: self._load_and_set(namespace, key, compute, ttl))
+            finally:
+                with self._lock:
+                    self._refreshing.discard(k)
+        self._pool.submit(run)
+
+
+@dataclass
+class SourceEntry:
+    limit: int   # the largest limit fetched for this query so far
+    items: List[Any]
+
+    def __bool__(self) -> bool:
+        # Empty entries get the short EMPTY_TTL.
+        return bool(self.items)
+
+def cached_source(namespace: str, complete_when_short: bool = True):
+    """
+    Cache a `search_*(query, limit, ...)` source per normalized query.
+    The entry keeps the largest `limit` fetched so far; smaller limits are
+    served by slicing it and only a larger limit goes back upstream. With
+    `complete_when_short`, getting fewer items than asked for means the
+    upstream has no more, so any limit can be served from that entry.
+    Extra arguments (e.g. `cfg`) are not part of the key.
+    """
     def wrapper(func):
-        @lru_cache(maxsize=maxsize)
-        def cached_func(*args, _ts, **kwargs):
-            return func(*args, **kwargs)
+        default_limit = inspect.signature(func).parameters["limit"].default
+
+        def covers(entry: SourceEntry, limit: int) -> bool:
+            return limit <= entry.limit or (complete_when_short and len(entry.items) < entry.limit)
 
         @wraps(func)
-        def inner(*args, **kwargs):
-            ts = int(time.time() // seconds)
-            return cached_func(*args, _ts=ts, **kwargs)
-        inner.cache_clear = cached_func.cache_clear  # type: ignore[attr-defined]
+        def inner(query: str, limit: int = default_limit, *args, **kwargs):
+            largest = 0
+
+            def accept(entry: SourceEntry) -> bool:
+                nonlocal largest
+                largest = entry.limit
+                return covers(entry, limit)
+
+            def compute() -> SourceEntry:
+                # Refreshes and top-ups never shrink what we already hold.
+                want = max(limit, largest)
+                return SourceEntry(want, func(query, want, *args, **kwargs))
+
+            cache, key = get_cache(), normalize_query(query)
+            entry = cache.get_or_compute(namespace, key, compute, accept=accept)
+            if not accept(entry):
+                # We coalesced onto someone else's smaller fetch; top it up.
+                entry = cache.get_or_compute(namespace, key, compute, accept=accept)
+            return entry.items[:limit]
+
+        def peek(query: str, limit: int = default_limit) -> Optional[List[Any]]:
+            """Whatever is cached for `query` (fresh or stale), or None; never fetches."""
+            entry, _ = get_cache().peek(namespace, normalize_query(query))
+            return entry.items[:limit] if entry is not None else None
+
+        def cached(query: str, limit: int = default_limit) -> Optional[List[Any]]:
+            """What a call with `limit` would return from the cache (fresh or stale), or None; never fetches."""
+            entry, _ = get_cache().peek(namespace, normalize_query(query))
+            return entry.items[:limit] if entry is not None and covers(entry, limit) else None
+
+        def age(query: str) -> Optional[float]:
+            """Seconds since `query` was last fetched, or None if it isn't cached."""
+            _, entry_age = get_cache().peek(namespace, normalize_query(query))
+            return entry_age
+
+        def refresh(query: str, limit: int = default_limit, *args, **kwargs) -> List[Any]:
+            """Fetch now and store, whatever the cache holds (cache warming). An empty fetch doesn't replace items."""
+            cache, key = get_cache(), normalize_query(query)
+            old, _ = cache.peek(namespace, key)
+            want = max(limit, old.limit if old is not None else 0)
+            entry = singleflight.group(namespace).do(
+                cache._key(namespace, key), lambda: SourceEntry(want, func(query, want, *args, **kwargs))
+            )
+            if entry or old is None:
+                cache.set(namespace, key, entry)
+            return entry.items[:limit]
+
+        inner.namespace = namespace  # type: ignore[attr-defined]
+        inner.uncached = func  # type: ignore[attr-defined]
+        inner.peek = peek  # type: ignore[attr-defined]
+        inner.cached = cached  # type: ignore[attr-defined]
+        inner.age = age  # type: ignore[attr-defined]
+        inner.refresh = refresh  # type: ignore[attr-defined]
         return inner
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def _backend_from_env() -> CacheBackend:
+    kind = (os.getenv("CACHE_BACKEND") or "sqlite").lower()
+    max_entries = int(os.getenv("CACHE_MAX_ENTRIES") or 0)
+    policy = (os.getenv("CACHE_POLICY") or "lru").lower()
+    if kind == "redis":
+        return RedisBackend.from_url(os.getenv("REDIS_URL") or "redis://localhost:6379/0")
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv("CACHE_PATH") or ".cache/results.sqlite", max_entries or 50_000, policy)
+    return MemoryBackend(max_entries or 2048, policy)
+
+def _ttls_from_env() -> Dict[str, float]:
+    # e.g. CACHE_TTL_ARXIV=3600
+    return {ns: float(os.environ[f"CACHE_TTL_{ns.upper()}"]) for ns in DEFAULT_TTLS if os.getenv(f"CACHE_TTL_{ns.upper()}")}
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> ResultCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache(_backend_from_env(), _ttls_from_env())
+    return _cache
+
+def set_cache(cache: ResultCache) -> None:
+    global _cache
+    _cache = cache
@@ -8,6 +8,19 @@ class AppConfig:
     google_cse_key: str | None = None
     youtube_api_key: str | None = None
     openai_api_key: str | None = None
+    query_deadline: float = 20.0  # seconds for the whole fan-out
+    source_budget: float = 15.0   # seconds any single source may take
+    thumbnails: str = "sync"      # og:image enrichment: "sync", "background" or "off"
+    thumbnail_deadline: float = 3.0
+    enrich_deadline: float = 0.8  # bulk DOI/PMID/arXiv lookups after the fan-out; 0 disables
+    metrics_port: int | None = None  # serve Prometheus /metrics here when set
+    local_first: bool = False     # answer from the local index, go upstream only for thin/stale sections
+    local_max_age: float = 6 * 3600.0  # a section whose newest local hit is older than this counts as stale
+    warm_top_k: int = 50          # popular queries kept warm in the background; 0 disables the warmer
+    warm_interval: float = 60.0   # seconds between warming passes
+    warm_budget: int = 20         # upstream fetches per pass at most
+    warm_max_active: int = 2      # skip warming while more searches than this are running
+    prewarm_connections: bool = False  # open pooled connections to the enabled upstreams at startup
 
     @classmethod
     def from_env(cls) -> "AppConfig":
@@ -17,4 +30,17 @@ class AppConfig:
             google_cse_key=os.getenv("GOOGLE_CSE_KEY") or None,
             youtube_api_key=os.getenv("YOUTUBE_DATA_API_KEY") or None,
             openai_api_key=os.getenv("OPENAI_API_KEY") or None,
+            query_deadline=float(os.getenv("QUERY_DEADLINE_S") or 20.0),
+            source_budget=float(os.getenv("SOURCE_BUDGET_S") or 15.0),
+            thumbnails=(os.getenv("THUMBNAILS") or "sync").lower(),
+            thumbnail_deadline=float(os.getenv("THUMBNAIL_DEADLINE_S") or 3.0),
+            enrich_deadline=float(os.getenv("ENRICH_DEADLINE_S") or 0.8),
+            metrics_port=int(os.getenv("METRICS_PORT") or 0) or None,
+            local_first=(os.getenv("LOCAL_FIRST") or "0") != "0",
+            local_max_age=float(os.getenv("LOCAL_MAX_AGE_S") or 6 * 3600.0),
+            warm_top_k=int(os.getenv("WARM_TOP_K") or 50),
+            warm_interval=float(os.getenv("WARM_INTERVAL_S") or 60.0),
+            warm_budget=int(os.getenv("WARM_BUDGET") or 20),
+            warm_max_active=int(os.getenv("WARM_MAX_ACTIVE") or 2),
+            prewarm_connections=(os.getenv("PREWARM_CONNECTIONS") or "0") != "0",
         )
\ No newline at end of file
@@ -0,0 +1,175 @@
+import re
+import unicodedata
+from dataclasses import replace
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from utils.parsing import Kind, Record
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid",
+    "ref", "ref_src", "ref_url", "source", "spm", "_hsenc", "_hsmi", "yclid",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_")
+
+# Kinds whose copies from different sources are the same work, so titles may merge.
+TITLE_MERGE_KINDS = frozenset({Kind.JOURNAL, Kind.PREPRINT, Kind.RESEARCH})
+MIN_TITLE_WORDS = 4     # shorter titles are too generic to merge on
+NEAR_DUP_JACCARD = 0.8
+
+_DOI_RE = re.compile(r"\b(10\.\d{4,9}/[^\s\"'<>]+)", re.I)
+_ARXIV_RE = re.compile(r"arxiv\.org/(?:abs|pdf)/([a-z\-]+(?:\.[A-Z]{2})?/\d{7}|\d{4}\.\d{4,5})(?:v\d+)?", re.I)
+_ARXIV_DOI_RE = re.compile(r"^10\.48550/arxiv\.(.+)$", re.I)
+_PMID_RE = re.compile(r"(?:pubmed\.ncbi\.nlm\.nih\.gov/|ncbi\.nlm\.nih\.gov/pubmed/)(\d+)", re.I)
+_WORD_RE = re.compile(r"\w+")
+
+# MinHash over title words: 20 hashes in 5 bands of 4 rows. Pairs at Jaccard
+# 0.8 land in a shared bucket ~93% of the time; candidates are then verified.
+_BANDS, _ROWS = 5, 4
+_PRIME = (1 << 61) - 1
+_PERMS = [((i * 0x9E3779B97F4A7C15 + 1) % _PRIME | 1, (i * 0xBF58476D1CE4E5B9 + 7) % _PRIME) for i in range(_BANDS * _ROWS)]
+
+
+def canonical_url(url: Optional[str]) -> Optional[str]:
+    """https, lowercase host without www., no fragment, tracking params or trailing slash."""
+    if not url:
+        return None
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip().lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    ]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+def _norm_doi(doi: str) -> str:
+    return doi.strip().rstrip(".,;").lower()
+
+def identifiers(it: Record) -> Set[str]:
+    """Work identifiers in one space: doi:..., arxiv:... (version dropped), pmid:..."""
+    ids: Set[str] = set()
+    extra = it.extra or {}
+    dois = [extra["doi"]] if extra.get("doi") else []
+    url = it.url or ""
+    m = _DOI_RE.search(url) if "doi.org/" in url else None
+    if m:
+        dois.append(m.group(1))
+    for doi in dois:
+        doi = _norm_doi(doi)
+        am = _ARXIV_DOI_RE.match(doi)
+        ids.add(f"arxiv:{am.group(1)}" if am else f"doi:{doi}")
+    m = _ARXIV_RE.search(url)
+    if m:
+        ids.add(f"arxiv:{m.group(1).lower()}")
+    if extra.get("arxiv_id"):
+        ids.add(f"arxiv:{str(extra['arxiv_id']).lower()}")
+    m = _PMID_RE.search(url)
+    if m:
+        ids.add(f"pmid:{m.group(1)}")
+    if extra.get("pmid"):
+        ids.add(f"pmid:{extra['pmid']}")
+    return ids
+
+def title_words(title: str) -> List[str]:
+    # Accents folded, case folded, punctuation dropped.
+    t = unicodedata.normalize("NFKD", title or "")
+    t = "".join(c for c in t if not unicodedata.combining(c)).casefold()
+    return _WORD_RE.findall(t)
+
+def _minhash_bands(words: Set[str]) -> List[tuple]:
+    hs = [hash(w) & _PRIME for w in words]
+    sig = [min((a * h + b) % _PRIME for h in hs) for a, b in _PERMS]
+    return [(band, tuple(sig[band * _ROWS:(band + 1) * _ROWS])) for band in range(_BANDS)]
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Lower index wins so the earliest source stays primary.
+            if rb < ra:
+                ra, rb = rb, ra
+            self.parent[rb] = ra
+
+
+def _merge(group: List[Record]) -> Record:
+    """Fold copies into (a copy of) the first one: kinds, years, citations, images and ids."""
+    primary = replace(group[0])  # merge into a copy: no record in `group` changes (see Record)
+    extra: Dict = dict(primary.extra or {})
+    sources = [primary.source]
+    for other in group[1:]:
+        if other.source not in sources:
+            sources.append(other.source)
+        # Peer-reviewed beats preprint for the same work.
+        if primary.kind == Kind.PREPRINT and other.kind == Kind.JOURNAL:
+            primary.kind = Kind.JOURNAL
+        if other.citations is not None and (primary.citations or 0) < other.citations:
+            primary.citations = other.citations
+        primary.year = primary.year or other.year
+        primary.image = primary.image or other.image
+        if not primary.snippet:
+            primary.snippet = other.snippet
+        for k, v in (other.extra or {}).items():
+            extra.setdefault(k, v)
+    if len(sources) > 1:
+        extra["sources"] = sources
+    primary.extra = extra or None
+    return primary
+
+def dedupe(items: List[Record]) -> List[Record]:
+    """
+    Cluster copies of the same result and merge each cluster into one record.
+    Records join a cluster when they share a canonical URL or a DOI/arXiv/PMID
+    identifier, or (research kinds only) an equal or MinHash-near title.
+    Roughly linear: every key is a dict lookup; only LSH bucket-mates are compared.
+    """
+    n = len(items)
+    uf = _UnionFind(n)
+    owner: Dict[object, int] = {}
+    words: List[Optional[Set[str]]] = [None] * n
+
+    def claim(key, i):
+        j = owner.setdefault(key, i)
+        if j != i:
+            uf.union(i, j)
+
+    for i, it in enumerate(items):
+        url = canonical_url(it.url)
+        claim(("url", url) if url else ("title", (it.title or "").strip().lower()), i)
+        for ident in identifiers(it):
+            claim(ident, i)
+        if it.kind in TITLE_MERGE_KINDS:
+            tw = title_words(it.title)
+            if len(tw) >= MIN_TITLE_WORDS:
+                claim(("title_norm", " ".join(tw)), i)
+                words[i] = set(tw)
+
+    buckets: Dict[tuple, List[int]] = {}
+    for i, ws in enumerate(words):
+        if ws is None:
+            continue
+        for band in _minhash_bands(ws):
+            for j in buckets.setdefault(band, []):
+                if uf.find(i) != uf.find(j) and len(ws & words[j]) / len(ws | words[j]) >= NEAR_DUP_JACCARD:
+                    uf.union(i, j)
+            buckets[band].append(i)
+
+    groups: Dict[int, List[Record]] = {}
+    for i, it in enumerate(items):
+        groups.setdefault(uf.find(i), []).append(it)
+    # Dict order follows each cluster's first member, i.e. input order.
+    return [_merge(g) if len(g) > 1 else g[0] for g in groups.values()]
@@ -0,0 +1,186 @@
+"""
+Cross-source enrichment for research results. The DOIs, PMIDs and arXiv ids
+of a query's results are resolved in bulk (Crossref `filter=doi:..`, PubMed
+esummary / `[doi]` esearch, arXiv `id_list`), so PubMed and arXiv hits get
+Crossref citation counts and Crossref hits get PubMed ids, for a few requests
+per query. What each identifier resolved to is cached on its own.
+"""
+from dataclasses import replace
+from typing import Callable, Dict, Iterable, List, Set
+from utils import feeds, httpclient, metrics
+from utils.cache import get_cache
+from utils.dedup import identifiers
+from utils.fanout import fan_out
+from utils.parsing import Kind, Record
+from sources import arxiv, crossref, pubmed
+
+CROSSREF_BATCH = 40   # DOIs per filter query (URL length)
+PUBMED_BATCH = 200    # ids per esummary call
+ARXIV_BATCH = 50      # ids per id_list query
+ENRICH_KINDS = frozenset({Kind.JOURNAL, Kind.PREPRINT, Kind.RESEARCH})
+
+Meta = Dict[str, object]  # citations / year / doi / pmid / published
+
+def _chunks(ids: List[str], n: int) -> Iterable[List[str]]:
+    for i in range(0, len(ids), n):
+        yield ids[i:i + n]
+
+def _crossref_by_doi(dois: List[str]) -> List[Record]:
+    params = {"filter": ",".join(f"doi:{d}" for d in dois), "rows": len(dois)}
+    r = httpclient.get(crossref.API, params=params, timeout=crossref.TIMEOUT)
+    r.raise_for_status()
+    return crossref._parse(r.json())
+
+def _pubmed_by_pmid(pmids: List[str]) -> List[Record]:
+    summ = httpclient.get(f"{pubmed.BASE}/esummary.fcgi", params=pubmed._esummary_params(pmids), timeout=pubmed.TIMEOUT).json()
+    return [r for r in pubmed._parse(pmids, summ) if r.title != "(untitled)"]
+
+def _pubmed_by_doi(dois: List[str]) -> List[Record]:
+    term = " OR ".join(f"{d}[doi]" for d in dois)
+    es = httpclient.get(f"{pubmed.BASE}/esearch.fcgi", params=pubmed._esearch_params(term, len(dois)), timeout=pubmed.TIMEOUT).json()
+    ids = pubmed._ids(es)
+    return _pubmed_by_pmid(ids) if ids else []
+
+def _arxiv_by_id(ids: List[str]) -> List[Record]:
+    params = {"id_list": ",".join(ids), "max_results": len(ids)}
+    with httpclient.get(arxiv.API, params=params, timeout=arxiv.TIMEOUT, stream=True) as r:
+        r.raise_for_status()
+        return arxiv._parse(r.iter_content(feeds.CHUNK))
+
+def _meta(rec: Record) -> Meta:
+    extra = rec.extra or {}
+    meta: Meta = {}
+    if rec.source == "Crossref" and rec.citations is not None:
+        meta["citations"] = rec.citations
+    if rec.year:
+        meta["year"] = rec.year
+    if extra.get("pmid"):
+        meta["pmid"] = extra["pmid"]
+    if extra.get("doi"):
+        meta["doi"] = extra["doi"]
+        if rec.source == "arXiv":
+            meta["published"] = True  # the authors linked a journal version
+    return meta
+
+def _wanted(items: List[Record]) -> Set[str]:
+    return {i for it in items if it.kind in ENRICH_KINDS for i in identifiers(it)}
+
+def _lookup(ids: Iterable[str]) -> Dict[str, Meta]:
+    cache, out = get_cache(), {}
+    for ident in ids:
+        meta, _ = cache.peek("enrich", ident)
+        if meta is not None:
+            out[ident] = meta
+    return out
+
+def _related(meta: Meta) -> Set[str]:
+    ids = set()
+    if meta.get("doi"):
+        ids |= identifiers(Record(title="", extra={"doi": meta["doi"]}))
+    if meta.get("pmid"):
+        ids.add(f"pmid:{meta['pmid']}")
+    return ids
+
+SERVICES = {"Crossref": "crossref", "PubMed": "pubmed", "arXiv": "arxiv"}
+
+def _describe(recs: Iterable[Record], into: Dict[str, Meta], answered: Dict[str, Set[str]]) -> None:
+    for rec in recs:
+        meta, service = _meta(rec), SERVICES.get(rec.source or "")
+        for ident in identifiers(rec):
+            into.setdefault(ident, {}).update(meta)
+            if service:
+                answered.setdefault(ident, set()).add(service)
+
+def _resolve(ids: Set[str], known: Dict[str, Meta], answered: Dict[str, Set[str]], deadline: float) -> None:
+    """
+    Fetch metadata for `ids` in batches, in parallel, and cache it per id.
+    `known` / `answered` hold what the query's own results already say, so
+    each service is only asked about ids it hasn't described yet.
+    """
+    def pending(kind: str, service: str) -> List[str]:
+        return [i.partition(":")[2] for i in sorted(ids) if i.startswith(kind + ":") and service not in answered.get(i, ())]
+
+    tasks: Dict[str, Callable[[], List[Record]]] = {}
+    for n, batch in enumerate(_chunks(pending("doi", "crossref"), CROSSREF_BATCH)):
+        tasks[f"crossref-{n}"] = lambda b=batch: _crossref_by_doi(b)
+    for n, batch in enumerate(_chunks(pending("doi", "pubmed"), CROSSREF_BATCH)):
+        tasks[f"pubmed-doi-{n}"] = lambda b=batch: _pubmed_by_doi(b)
+    for n, batch in enumerate(_chunks(pending("pmid", "pubmed"), PUBMED_BATCH)):
+        tasks[f"pubmed-{n}"] = lambda b=batch: _pubmed_by_pmid(b)
+    for n, batch in enumerate(_chunks(pending("arxiv", "arxiv"), ARXIV_BATCH)):
+        tasks[f"arxiv-{n}"] = lambda b=batch: _arxiv_by_id(b)
+
+    found: Dict[str, Meta] = {i: dict(known[i]) for i in ids if i in known}
+    complete = True
+    if tasks:
+        with metrics.timer("enrich"):
+            res = fan_out(tasks, deadline=deadline)
+        for recs in res.results.values():
+            _describe(recs, found, answered)
+        for err in res.failed.values():
+            metrics.inc("source_errors_total", source="enrich", error=err.split("(", 1)[0])
+        complete = not res.failed and not res.timed_out
+    cache = get_cache()
+    # Only the ids asked about: one a result merely mentions (e.g. the journal
+    # DOI of an arXiv hit) hasn't been asked of every service yet, and caching
+    # it now would keep resolve()'s second round from asking.
+    for ident in ids:
+        if ident in found:
+            cache.set("enrich", ident, found[ident])
+        elif complete:
+            cache.set("enrich", ident, {"missing": True})  # don't ask again for a while
+
+def _apply(it: Record, metas: Dict[str, Meta]) -> Record:
+    ids = identifiers(it)
+    for ident in list(ids):
+        ids |= _related(metas.get(ident, {}))
+    found = [metas[i] for i in ids if i in metas]
+    if not found:
+        return it
+    it = replace(it, extra=dict(it.extra or {}))  # extra too: the setdefault below must not reach the caller's dict
+    for meta in found:
+        if meta.get("citations") is not None:
+            it.citations = max(it.citations or 0, meta["citations"])
+        it.year = it.year or meta.get("year")
+        for k in ("doi", "pmid"):
+            if meta.get(k):
+                it.extra.setdefault(k, meta[k])
+        if meta.get("published") and it.kind == Kind.PREPRINT:
+            it.kind = Kind.JOURNAL
+    return it
+
+def apply_cached(items: List[Record]) -> List[Record]:
+    """Merge what is already cached into research items; no network."""
+    wanted = _wanted(items)
+    if not wanted:
+        return items
+    metas = _lookup(wanted)
+    metas.update(_lookup(set().union(*map(_related, metas.values())) - metas.keys()))
+    if not metas:
+        return items
+    return [_apply(it, metas) if it.kind in ENRICH_KINDS else it for it in items]
+
+def resolve(items: List[Record], deadline: float = 4.0) -> None:
+    """
+    Resolve and cache the identifiers of research items that aren't cached
+    yet. Two rounds: ids found in the first (e.g. the journal DOI of an arXiv
+    preprint) are resolved in the second. Whatever misses the deadline is
+    left for the next query.
+    """
+    known: Dict[str, Meta] = {}
+    answered: Dict[str, Set[str]] = {}
+    _describe((it for it in items if it.kind in ENRICH_KINDS), known, answered)
+    seen: Set[str] = set()
+    todo = set(known)
+    for _ in range(2):
+        todo -= seen
+        missing = todo - _lookup(todo).keys()
+        seen |= todo
+        if missing:
+            _resolve(missing, known, answered, deadline / 2)
+        todo = set().union(*map(_related, _lookup(todo).values()))
+
+def enrich(items: List[Record], deadline: float = 4.0) -> List[Record]:
+    """resolve() then apply_cached(): citations, years, DOIs and PMIDs merged in."""
+    resolve(items, deadline)
+    return apply_cached(items)
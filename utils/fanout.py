@@ -0,0 +1,77 @@
+import os
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# One shared pool for every query. Calls that blow their budget are abandoned,
+# not joined, so they finish (or hit their own HTTP timeout) in the background
+# without holding up the caller.
+_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FANOUT_WORKERS") or 32),
+    thread_name_prefix="fanout",
+)
+
+@dataclass
+class FanOutResult:
+    results: Dict[str, Any] = field(default_factory=dict)
+    timed_out: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+def _budget_for(name: str, budget: float | Dict[str, float] | None, deadline: float) -> float:
+    if isinstance(budget, dict):
+        b = budget.get(name)
+    else:
+        b = budget
+    return min(deadline, b) if b else deadline
+
+def iter_fan_out(
+    tasks: Dict[str, Callable[[], Any]],
+    deadline: float,
+    budget: float | Dict[str, float] | None = None,
+) -> Iterator[Tuple[str, str, Any]]:
+    """
+    Run every task at once and yield `(name, status, value)` as each settles.
+    status is "ok" (value = result), "failed" (value = the exception) or
+    "timed_out" (value = None). `deadline` bounds the whole call; `budget`
+    (a float, or a per-task dict) bounds each task.
+    """
+    t0 = time.monotonic()
+    # Copy the context so tracing spans opened in tasks nest under the caller's.
+    futures = {_POOL.submit(contextvars.copy_context().run, fn): name for name, fn in tasks.items()}
+    cutoffs = {name: t0 + _budget_for(name, budget, deadline) for name in tasks}
+    pending = set(futures)
+
+    while pending:
+        next_cut = min(cutoffs[futures[f]] for f in pending)
+        done, pending = wait(pending, timeout=max(0.0, next_cut - time.monotonic()), return_when=FIRST_COMPLETED)
+        for f in done:
+            try:
+                yield futures[f], "ok", f.result()
+            except Exception as e:
+                yield futures[f], "failed", e
+        now = time.monotonic()
+        for f in [f for f in pending if now >= cutoffs[futures[f]]]:
+            pending.discard(f)
+            f.cancel()
+            yield futures[f], "timed_out", None
+
+def fan_out(
+    tasks: Dict[str, Callable[[], Any]],
+    deadline: float,
+    budget: float | Dict[str, float] | None = None,
+) -> FanOutResult:
+    """Run every task at once and collect what finishes in time (see iter_fan_out)."""
+    t0 = time.monotonic()
+    res = FanOutResult()
+    for name, status, value in iter_fan_out(tasks, deadline, budget):
+        if status == "ok":
+            res.results[name] = value
+        elif status == "failed":
+            res.failed[name] = repr(value)
+        else:
+            res.timed_out.append(name)
+    res.elapsed = time.monotonic() - t0
+    return res
@@ -0,0 +1,67 @@
+"""
+Streaming Atom feed parsing (arXiv API, YouTube RSS). The body is fed to a
+pull parser chunk by chunk; each <entry> is turned into a small dict of the
+fields we render as soon as it closes, then discarded, so the caller can
+stop reading once it has enough entries.
+"""
+import time
+from typing import Dict, Iterable, Iterator, Optional
+from xml.etree.ElementTree import XMLPullParser
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+CHUNK = 16 * 1024
+TEXT_CHARS = 301  # one past what we show, so callers can tell it was cut
+
+
+class FeedTimeout(TimeoutError):
+    """Reading the feed took longer than its overall timeout."""
+
+
+def _text(elem) -> str:
+    # Feeds wrap titles and abstracts across lines; cap before joining.
+    return " ".join((elem.text or "")[: TEXT_CHARS * 2].split())[:TEXT_CHARS]
+
+def iter_entries(
+    chunks: Iterable[bytes],
+    fields: Dict[str, str],
+    timeout: Optional[float] = None,
+) -> Iterator[Dict[str, str]]:
+    """
+    Yield one dict per Atom <entry>: `fields` maps output names to the tags
+    (Clark notation, any depth inside the entry) whose text to keep. "link"
+    is always filled from the entry's alternate link. `timeout` bounds the
+    whole read, on top of the HTTP client's per-read timeout.
+    """
+    wanted = {tag: name for name, tag in fields.items()}
+    parser = XMLPullParser(events=("start", "end"))
+    deadline = time.monotonic() + timeout if timeout else None
+    root = None
+    entry: Dict[str, str] = {}
+    depth = 0  # > 0 while inside an <entry>
+    for chunk in chunks:
+        if deadline and time.monotonic() > deadline:
+            raise FeedTimeout(f"feed not read within {timeout}s")
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
+                if depth or elem.tag == ATOM + "entry":
+                    depth += 1
+                continue
+            if not depth:
+                continue
+            depth -= 1
+            if depth == 0:
+                yield entry
+                entry = {}
+                root.clear()  # drop the finished entry (and anything before it)
+            elif elem.tag == ATOM + "link":
+                if elem.get("rel", "alternate") == "alternate" and "link" not in entry:
+                    entry["link"] = elem.get("href", "")
+            elif elem.tag in wanted and wanted[elem.tag] not in entry:
+                entry[wanted[elem.tag]] = _text(elem)
+    parser.close()
+
+def snippet(text: str, chars: int = 300) -> str:
+    return text[:chars] + ("..." if len(text) > chars else "")
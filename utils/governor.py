@@ -0,0 +1,294 @@
+"""
+Per-host pacing and circuit breaking for upstream APIs.
+
+Every upstream request (see httpclient) first takes a token from its host's
+bucket, sleeping briefly if the host is busy, and is refused outright if the
+wait would exceed UPSTREAM_MAX_WAIT_S. After BREAKER_FAILURES consecutive
+failures (errors, timeouts, 429/5xx) a host's breaker opens and requests to
+it fail immediately for BREAKER_COOLDOWN_S; then one probe is let through
+(half-open), and its outcome closes the breaker or reopens it for twice as
+long. Open breakers are also written to the result cache, so workers sharing
+a Redis/SQLite backend skip a dead upstream together.
+
+    UPSTREAM_GOVERNOR=0        disable both
+    UPSTREAM_RATES='{"api.crossref.org": [20, 20]}'   requests/s, burst per host
+"""
+import os
+import json
+import time
+import threading
+from typing import Dict, Tuple
+from utils import metrics
+from utils.ratelimit import TokenBuckets
+
+# Host -> (requests per second, burst). Unlisted hosts use DEFAULT_RATE.
+RATES: Dict[str, Tuple[float, float]] = {
+    "eutils.ncbi.nlm.nih.gov": (3.0, 3.0),     # NCBI: 3/s without an API key
+    "api.crossref.org": (10.0, 10.0),          # polite pool
+    "export.arxiv.org": (1.0, 4.0),            # arXiv asks for gentle, bursty-at-most use
+    "serpapi.com": (2.0, 5.0),                 # paid quota
+    "www.googleapis.com": (5.0, 10.0),         # CSE / YouTube Data API quotas
+}
+DEFAULT_RATE = (20.0, 20.0)
+MAX_WAIT = float(os.getenv("UPSTREAM_MAX_WAIT_S") or 2.0)
+FAILURES = int(os.getenv("BREAKER_FAILURES") or 5)
+COOLDOWN = float(os.getenv("BREAKER_COOLDOWN_S") or 30.0)
+MAX_COOLDOWN = 10 * 60.0
+SYNC_EVERY = 2.0  # seconds between reads of the shared breaker state, per host
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """Refused before sending: the host's breaker is open or its bucket is drained."""
+
+    def __init__(self, host: str, reason: str, retry_after: float):
+        super().__init__(f"{host}: {reason}, retry in {retry_after:.1f}s")
+        self.host = host
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Breaker:
+    def __init__(self, host: str):
+        self.host = host
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown = COOLDOWN
+        self.open_until = 0.0   # wall clock, so it can be shared between processes
+        self.probe_at = 0.0
+        self.synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def _set(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            metrics.inc("breaker_transitions_total", host=self.host, state=state)
+
+    def _open(self, now: float) -> None:
+        self.open_until = now + self.cooldown
+        self._set(OPEN)
+        _share(self.host, self.open_until)
+
+    def allow(self) -> float:
+        """0 if a request may go out now, else seconds until the breaker half-opens."""
+        now = time.time()
+        with self._lock:
+            if self.state == CLOSED and now - self.synced_at >= SYNC_EVERY:
+                self.synced_at = now
+                until = _shared(self.host)
+                if until > now:
+                    # Another worker saw this host fail.
+                    self.open_until = until
+                    self._set(OPEN)
+            if self.state == OPEN:
+                if now < self.open_until:
+                    return self.open_until - now
+                self._set(HALF_OPEN)
+                self.probe_at = now
+                return 0.0  # this caller is the probe
+            if self.state == HALF_OPEN:
+                if now - self.probe_at < self.cooldown:
+                    return self.probe_at + self.cooldown - now  # a probe is already out
+                self.probe_at = now  # that probe never reported back; send another
+            return 0.0
+
+    def record(self, ok: bool) -> None:
+        now = time.time()
+        with self._lock:
+            if ok:
+                if self.state != CLOSED:
+                    self.cooldown = COOLDOWN
+                    _share(self.host, 0.0)
+                self.failures = 0
+                self._set(CLOSED)
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.cooldown = min(MAX_COOLDOWN, self.cooldown * 2)
+                self._open(now)
+            elif self.state == CLOSED and self.failures >= FAILURES:
+                self._open(now)
+
+
+def _share(host: str, open_until: float) -> None:
+    # Best effort: a cache outage must not take requests down with it.
+    from utils.cache import get_cache
+    try:
+        cache = get_cache()
+        if open_until:
+            cache.set("breaker", host, open_until, ttl=open_until - time.time())
+        else:
+            cache.delete("breaker", host)
+    except Exception:
+        pass
+
+def _shared(host: str) -> float:
+    from utils.cache import get_cache
+    try:
+        until, _ = get_cache().peek("breaker", host)
+    except Exception:
+        return 0.0
+    return until or 0.0
+
+
+def _rates_from_env() -> Dict[str, Tuple[float, float]]:
+    extra = json.loads(os.getenv("UPSTREAM_RATES") or "{}")
+    return dict(RATES, **{host: (float(r), float(b)) for host, (r, b) in extra.items()})
+
+_enabled = (os.getenv("UPSTREAM_GOVERNOR") or "1") != "0"
+_rates = _rates_from_env()
+_buckets = {host: TokenBuckets(r, b, max_keys=1) for host, (r, b) in _rates.items()}
+_default_buckets = TokenBuckets(*DEFAULT_RATE, max_keys=1000)
+_breakers: Dict[str, Breaker] = {}
+_lock = threading.Lock()
+
+def enabled() -> bool:
+    return _enabled
+
+def set_enabled(on: bool) -> None:
+    global _enabled
+    _enabled = on
+
+def breaker(host: str) -> Breaker:
+    b = _breakers.get(host)
+    if b is None:
+        with _lock:
+            b = _breakers.setdefault(host, Breaker(host))
+    return b
+
+def states() -> Dict[str, str]:
+    """Host -> breaker state, for health endpoints."""
+    return {host: b.state for host, b in list(_breakers.items())}
+
+def _admit(host: str) -> float:
+    """Seconds to sleep before sending; raises UpstreamUnavailable instead of waiting too long."""
+    wait = breaker(host).allow()
+    if wait:
+        metrics.inc("upstream_rejected_total", host=host, reason="open")
+        raise UpstreamUnavailable(host, "circuit open", wait)
+    wait = _buckets.get(host, _default_buckets).reserve(host, MAX_WAIT)
+    if wait > MAX_WAIT:
+        metrics.inc("upstream_rejected_total", host=host, reason="throttled")
+        raise UpstreamUnavailable(host, "rate limited", wait)
+    if wait:
+        metrics.observe("throttle_wait_seconds", wait, host=host)
+    return wait
+
+def acquire(host: str) -> None:
+    """Block until `host` may be called (see _admit)."""
+    if _enabled:
+        wait = _admit(host)
+        if wait:
+            time.sleep(wait)
+
+def try_acquire(host: str) -> bool:
+    """Take a token for `host` only if one is free right now (hedged duplicates never wait)."""
+    if not _enabled:
+        return True
+    return _buckets.get(host, _default_buckets).take(host) == 0.0
+
+def record(self, ok: bool) -> None:
+        now = time.time()
+        with self._lock:
+            if ok:
+                if self.state != CLOSED:
+                    self.cooldown = COOLDOWN
+                    _share(self.host, 0.0)
+                self.failures = 0
+                self._set(CLOSED)
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.cooldown = min(MAX_COOLDOWN, self.cooldown * 2)
+                self._open(now)
+            elif self.state == CLOSED and self.failures >= FAILURES:
+                self._open(now)
+
+
+def _share(host: str, open_until: float) -> None:
+    # Best effort: a cache outage must not take requests down with it.
+    from utils.cache import get_cache
+    try:
+        cache = get_cache()
+        if open_until:
+            cache.set("breaker", host, open_until, ttl=open_until - time.time())
+        else:
+            cache.delete("breaker", host)
+    except Exception:
+        pass
+
+def _shared(host: str) -> float:
+    from utils.cache import get_cache
+    try:
+        until, _ = get_cache().peek("breaker", host)
+    except Exception:
+        return 0.0
+    return until or 0.0
+
+
+def _rates_from_env() -> Dict[str, Tuple[float, float]]:
+    extra = json.loads(os.getenv("UPSTREAM_RATES") or "{}")
+    return dict(RATES, **{host: (float(r), float(b)) for host, (r, b) in extra.items()})
+
+_enabled = (os.getenv("UPSTREAM_GOVERNOR") or "1") != "0"
+_rates = _rates_from_env()
+_buckets = {host: TokenBuckets(r, b, max_keys=1) for host, (r, b) in _rates.items()}
+_default_buckets = TokenBuckets(*DEFAULT_RATE, max_keys=1000)
+_breakers: Dict[str, Breaker] = {}
+_lock = threading.Lock()
+
+def enabled() -> bool:
+    return _enabled
+
+def set_enabled(on: bool) -> None:
+    global _enabled
+    _enabled = on
+
+def breaker(host: str) -> Breaker:
+    b = _breakers.get(host)
+    if b is None:
+        with _lock:
+            b = _breakers.setdefault(host, Breaker(host))
+    return b
+
+def states() -> Dict[str, str]:
+    """Host -> breaker state, for health endpoints."""
+    return {host: b.state for host, b in list(_breakers.items())}
+
+def _admit(host: str) -> float:
+    """Seconds to sleep before sending; raises UpstreamUnavailable instead of waiting too long."""
+    wait = breaker(host).allow()
+    if wait:
+        metrics.inc("upstream_rejected_total", host=host, reason="open")
+        raise UpstreamUnavailable(host, "circuit open", wait)
+    wait = _buckets.get(host, _default_buckets).reserve(host, MAX_WAIT)
+    if wait > MAX_WAIT:
+        metrics.inc("upstream_rejected_total", host=host, reason="throttled")
+        raise UpstreamUnavailable(host, "rate limited", wait)
+    if wait:
+        metrics.observe("throttle_wait_seconds", wait, host=host)
+    return wait
+
+def acquire(host: str) -> None:
+    """Block until `host` may be called (see _admit)."""
+    if _enabled:
+        wait = _admit(host)
+        if wait:
+            time.sleep(wait)
+
+def try_acquire(host: str) -> bool:
+    """Take a token for `host` only if one is free right now (hedged duplicates never wait)."""
+    if not _enabled:
+        return True
+    return _buckets.get(host, _default_buckets).take(host) == 0.0
+
+async def aacquire(host: str) -> None:
+    if _enabled:
+        wait = _admit(host)
+        if wait:
+            await asyncio.sleep(wait)
+
+def record(host: str, ok: bool) -> None:
+    if _enabled:
+        breaker(host).record(ok)
@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+from utils import governor, latency, metrics
+
+if TYPE_CHECKING:
+    import requests  # imported for real in _build_session, off the import path
+
+USER_AGENT = "TrustworthyStudySearch/1.0 (https://github.com/; contact: example@example.com)"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+@dataclass
+class HttpConfig:
+    timeout: float = 10.0       # default per-request timeout (seconds)
+    pool_connections: int = 16  # number of per-host pools kept alive
+    pool_maxsize: int = 32      # keep-alive connections per host
+    retries: int = 2
+    backoff: float = 0.3        # 0.3s, 0.6s, 1.2s ...
+    adaptive: bool = True       # timeouts and hedging from observed latency (utils.latency)
+
+    @classmethod
+    def from_env(cls) -> "HttpConfig":
+        return cls(
+            timeout=float(os.getenv("HTTP_TIMEOUT_S") or 10.0),
+            pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS") or 16),
+            pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE") or 32),
+            retries=int(os.getenv("HTTP_RETRIES") or 2),
+            backoff=float(os.getenv("HTTP_BACKOFF_S") or 0.3),
+            adaptive=(os.getenv("HTTP_ADAPTIVE") or "1") != "0",
+        )
+
+config = HttpConfig.from_env()
+
+# Origin -> replacement base, e.g. {"https://api.crossref.org": "http://127.0.0.1:8765/crossref"}.
+# "*" catches every other origin (prefix + "/" + host + path). Used to replay
+# recorded fixtures in benchmarks; empty in normal runs.
+_overrides: Dict[str, str] = json.loads(os.getenv("HTTP_UPSTREAM_OVERRIDES") or "{}")
+
+def set_upstream_overrides(overrides: Dict[str, str]) -> None:
+    global _overrides
+    _overrides = dict(overrides)
+
+def resolve(url: str) -> str:
+    if not _overrides:
+        return url
+    for origin, base in _overrides.items():
+        if origin != "*" and url.startswith(origin):
+            return base + url[len(origin):]
+    if "*" in _overrides:
+        return _overrides["*"] + "/" + url.split("://", 1)[-1]
+    return url
+
+_lock = threading.Lock()
+_session: "Optional[requests.Session]" = None
+
+def _build_session() -> "requests.Session":
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=config.retries,
+        # A read timeout or a dropped response is not retried: the request may
+        # have reached the host, and retrying multiplies the call's timeout.
+        read=False,
+        backoff_factor=config.backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config.pool_connections,
+        pool_maxsize=config.pool_maxsize,
+        max_retries=retry,
+    )
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers["User-Agent"] = USER_AGENT
+    return s
+
+def session() -> "requests.Session":
+    """The process-wide pooled session (keep-alive, retries, per-host pools)."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+def _key(url: str, label: Optional[str]) -> str:
+    # `label` keeps arbitrary hosts (e.g. og:image pages) out of the label set.
+    return label or urlsplit(url).hostname or "unknown"
+
+def _record(url: str, label: Optional[str], t0: float, outcome: "requests.Response | BaseException") -> None:
+    host = _key(url, label)
+    elapsed = time.perf_counter() - t0
+    failed = isinstance(outcome, BaseException)
+    metrics.observe("http_request_seconds", elapsed, host=host)
+    metrics.inc("http_requests_total", host=host, status=type(outcome).__name__ if failed else outcome.status_code)
+    # Answers and timeouts only (however wrapped): a refused connection says
+    # nothing about how long the host takes.
+    if not failed or metrics.timed_out(outcome):
+        latency.observe(host, elapsed)
+
+def _timeout(url: str, label: Optional[str], timeout: Optional[float]) -> float:
+    """The call site's timeout (or the default) is the ceiling; below it, what the host's p99 warrants."""
+    ceiling = timeout or config.timeout
+    return latency.timeout(_key(url, label), ceiling) if config.adaptive else ceiling
+
+def _hedge_delay(host: Optional[str]) -> Optional[float]:
+    # Upstream APIs only: duplicating an arbitrary page fetch buys little.
+    return latency.hedge_delay(host) if host and config.adaptive else None
+
+def _may_hedge(host: str) -> bool:
+    """Within the host's hedge ratio and rate limit right now (a hedge never waits for a token)."""
+    if not latency.hedge_allowed(host):
+        metrics.inc("hedge_total", host=host, outcome="capped")
+        return False
+    if not governor.try_acquire(host):
+        metrics.inc("hedge_total", host=host, outcome="throttled")
+        return False
+    latency.hedged(host)
+    metrics.inc("hedge_total", host=host, outcome="sent")
+    return True
+
+def _governed(url: str, label: Optional[str]) -> Optional[str]:
+    # Upstream APIs only; labelled requests (arbitrary pages) aren't paced.
+    return None if label else urlsplit(url).hostname
+
+# Runs hedged requests and the primaries they race. When every slot is
+# taken, requests go out unhedged on the caller's thread instead of queueing.
+HEDGE_WORKERS = 32
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+_hedge_slots = threading.BoundedSemaphore(HEDGE_WORKERS)
+
+def _spawn(fn: Callable[[], Any]) -> Optional[Future]:
+    if not _hedge_slots.acquire(blocking=False):
+        return None
+    fut = _hedge_pool.submit(fn)
+    fut.add_done_callback(lambda _: _hedge_slots.release())
+    return fut
+
+def _discard(fut: Future) -> None:
+    # The losing response still holds a pooled connection (stream=True) until closed.
+    if not fut.cancelled() and fut.exception() is None:
+        fut.result().close()
+
+def _hedged(host: str, send: Callable[[], Any], delay: float) -> Any:
+    """
+    `send()`, plus one duplicate if no answer came within `delay`; the
+    first response wins. A failed copy only counts if both fail.
+    """
+    primary = _spawn(send)
+    if primary is None:
+        return send()
+    try:
+        return primary.result(timeout=delay)
+    except FutureTimeout:
+        pass
+    hedge = _spawn(send) if _may_hedge(host) else None
+    if hedge is None:
+        return primary.result()
+    done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+    winner = next((f for f in (hedge, primary) if f in done and f.exception() is None), None)
+    if winner is None:
+        # The first to finish failed: whatever the other one does is the answer.
+        other = hedge if primary in done else primary
+        return other.result()
+    (primary if winner is hedge else hedge).add_done_callback(_discard)
+    metrics.inc("hedge_total", host=host, outcome="won" if winner is hedge else "lost")
+    return winner.result()
+
+def get(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    stream: bool = False,
+    label: Optional[str] = None,
+) -> "requests.Response":
+    """
+    GET through the shared session. Upstream API hosts are paced and guarded
+    by a circuit breaker (see governor); raises governor.UpstreamUnavailable
+    without sending when the host is being skipped. `timeout` is a ceiling:
+    hosts with enough history get one derived from their p99, and slow
+    requests to them are hedged (see utils.latency).
+    """
+    host = _governed(url, label)
+    if host:
+        governor.acquire(host)
+    limit = _timeout(url, label, timeout)
+
+    def send() -> "requests.Response":
+        t0 = time.perf_counter()
+        try:
+            r = session().get(resolve(url), params=params, headers=headers, timeout=limit, stream=stream)
+        except Exception as e:
+            _record(url, label, t0, e)
+            raise
+        _record(url, label, t0, r)
+        return r
+
+    delay = _hedge_delay(host)
+    try:
+        r = _hedged(host, send, delay) if delay is not None else send()
+    except Exception:
+        if host:
+            governor.record(host, ok=False)
+        raise
+    if host:
+        governor.record(host, ok=r.status_code not in RETRY_STATUSES)
+    return r
+
+def prewarm(urls: Iterable[str], timeout: float = 3.0) -> None:
+    """
+    Open a keep-alive connection to each upstream origin (HEAD /, in
+    parallel) so the first searches skip DNS, TCP and TLS setup. Errors are
+    ignored; this is only a head start.
+    """
+    def one(url: str) -> None:
+        parts = urlsplit(resolve(url))
+        try:
+            session().head(f"{parts.scheme}://{parts.netloc}/", timeout=timeout).close()
+        except Exception:
+            pass
+
+    origins = {f"{p.scheme}://{p.netloc}" for p in map(urlsplit, urls)}
+    if origins:
+        with ThreadPoolExecutor(max_workers=min(8, len(origins)), thread_name_prefix="prewarm") as pool:
+            list(pool.map(one, origins))
+
+def close() -> None:
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
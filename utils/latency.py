@@ -0,0 +1,147 @@
+"""
+Rolling per-host latency histograms, and the timeouts and hedging delays
+derived from them (see httpclient).
+
+Each host keeps log-spaced bucket counts over the last WINDOW seconds, in
+SLOTS rotating slices. Once a host has MIN_SAMPLES responses in the window:
+
+- its timeout is p99 x TIMEOUT_MARGIN, never below MIN_TIMEOUT nor above the
+  call site's own timeout, which stays the ceiling;
+- a request still unanswered at its p95 may send one hedged duplicate, as
+  long as hedges stay under HEDGE_MAX_RATIO of the host's requests in the
+  window.
+
+Timeouts are recorded at the time they fired, so a timeout that is too tight
+pushes p99, and with it the next timeout, back up.
+
+    LATENCY_WINDOW_S       default 300
+    HEDGE_MAX_RATIO        default 0.05 (0 turns hedging off)
+"""
+import os
+import math
+import time
+import threading
+from typing import Dict, List, Optional
+
+WINDOW = float(os.getenv("LATENCY_WINDOW_S") or 300.0)
+SLOTS = 6
+MIN_SAMPLES = 50
+TIMEOUT_MARGIN = 2.0
+MIN_TIMEOUT = 1.0
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO") or 0.05)
+
+# Bucket upper bounds: 10 ms growing by 25% up to ~78 s, then overflow.
+BOUNDS: List[float] = [0.01 * 1.25 ** i for i in range(41)]
+_LOG_GROWTH = math.log(1.25)
+
+
+def _bucket(seconds: float) -> int:
+    if seconds <= BOUNDS[0]:
+        return 0
+    return min(len(BOUNDS), math.ceil(math.log(seconds / BOUNDS[0]) / _LOG_GROWTH - 1e-9))
+
+
+class Histogram:
+    """Latencies of one host over the last `window` seconds."""
+
+    def __init__(self, window: float = WINDOW, slots: int = SLOTS):
+        self.span = window / slots
+        self._counts = [[0] * (len(BOUNDS) + 1) for _ in range(slots)]
+        self._hedges = [0] * slots
+        self._epochs = [-1] * slots  # which slice of time each slot currently holds
+        self._lock = threading.Lock()
+
+    def _slot(self, now: float) -> int:
+        epoch = int(now // self.span)
+        i = epoch % len(self._epochs)
+        if self._epochs[i] != epoch:
+            self._epochs[i] = epoch
+            self._counts[i] = [0] * (len(BOUNDS) + 1)
+            self._hedges[i] = 0
+        return i
+
+    def _live(self, now: float) -> List[int]:
+        oldest = int(now // self.span) - len(self._epochs) + 1
+        return [i for i, e in enumerate(self._epochs) if e >= oldest]
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._counts[self._slot(time.time())][_bucket(seconds)] += 1
+
+    def hedged(self) -> None:
+        with self._lock:
+            self._hedges[self._slot(time.time())] += 1
+
+    def merged(self) -> List[int]:
+        now = time.time()
+        with self._lock:
+            live = self._live(now)
+            return [sum(self._counts[i][b] for i in live) for b in range(len(BOUNDS) + 1)]
+
+    def hedges(self) -> int:
+        now = time.time()
+        with self._lock:
+            return sum(self._hedges[i] for i in self._live(now))
+
+    def quantile(self, q: float, counts: Optional[List[int]] = None) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile, or None without MIN_SAMPLES samples."""
+        counts = counts if counts is not None else self.merged()
+        n = sum(counts)
+        if n < MIN_SAMPLES:
+            return None
+        rank = q * n
+        seen = 0
+        for b, c in enumerate(counts):
+            seen += c
+            if seen >= rank:
+                return BOUNDS[b] if b < len(BOUNDS) else float("inf")
+        return float("inf")
+
+
+_hists: Dict[str, Histogram] = {}
+_lock = threading.Lock()
+
+def histogram(host: str) -> Histogram:
+    h = _hists.get(host)
+    if h is None:
+        with _lock:
+            h = _hists.setdefault(host, Histogram())
+    return h
+
+def observe(host: str, seconds: float) -> None:
+    histogram(host).observe(seconds)
+
+def timeout(host: str, ceiling: float) -> float:
+    """The timeout for the next request to `host`: p99 x TIMEOUT_MARGIN, within [MIN_TIMEOUT, ceiling]."""
+    p99 = histogram(host).quantile(0.99)
+    if p99 is None:
+        return ceiling
+    return min(ceiling, max(MIN_TIMEOUT, p99 * TIMEOUT_MARGIN))
+
+def hedge_delay(host: str) -> Optional[float]:
+    """Seconds after which a request to `host` is worth hedging (its p95), or None when hedging is off or unknown."""
+    if HEDGE_MAX_RATIO <= 0:
+        return None
+    p95 = histogram(host).quantile(0.95)
+    return p95 if p95 is not None and p95 != float("inf") else None
+
+def hedge_allowed(host: str) -> bool:
+    """Whether one more hedge keeps `host` within HEDGE_MAX_RATIO of its requests in the window."""
+    h = histogram(host)
+    return h.hedges() + 1 <= HEDGE_MAX_RATIO * sum(h.merged())
+
+def hedged(host: str) -> None:
+    histogram(host).hedged()
+
+def snapshot() -> Dict[str, Dict[str, object]]:
+    """Per host: samples in the window, p50/p95/p99 (None until MIN_SAMPLES), hedges sent and non-empty buckets."""
+    out: Dict[str, Dict[str, object]] = {}
+    for host, h in list(_hists.items()):
+        counts = h.merged()
+        out[host] = {
+            "samples": sum(counts),
+            **{f"p{int(q * 100)}": h.quantile(q, counts) for q in (0.5, 0.95, 0.99)},
+            "hedges": h.hedges(),
+            "buckets": {f"{b:.3g}": c for b, c in zip(BOUNDS + [float("inf")], counts) if c},
+        }
+    return out
@@ -0,0 +1,173 @@
+"""
+Local full-text index (SQLite FTS5) of every record the sources return, so a
+popular topic can be answered without going upstream ("local-first" mode in
+search.py) and searches still return something while an upstream is down.
+
+Records are upserted by canonical URL on a background thread. `seen_at` is
+the last time a source returned the record; old and surplus rows are
+compacted away every COMPACT_EVERY ingests.
+
+    LOCAL_INDEX=0                     don't index or search locally
+    LOCAL_INDEX_PATH                  default .cache/index.sqlite
+    LOCAL_INDEX_MAX_DOCS              default 200000
+    LOCAL_INDEX_RETAIN_S              drop records unseen for this long (default 30 days)
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Set, Tuple
+from utils.dedup import canonical_url
+from utils.parsing import Kind, Record, normalize_query
+
+PATH = os.getenv("LOCAL_INDEX_PATH") or ".cache/index.sqlite"
+MAX_DOCS = int(os.getenv("LOCAL_INDEX_MAX_DOCS") or 200_000)
+RETAIN = float(os.getenv("LOCAL_INDEX_RETAIN_S") or 30 * 24 * 3600)
+COMPACT_EVERY = 500  # ingest batches between compactions
+# bm25 column weights: a title match counts for more than a snippet match.
+TITLE_WEIGHT, SNIPPET_WEIGHT = 3.0, 1.0
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS docs ("
+    " id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, title TEXT NOT NULL, url TEXT, snippet TEXT,"
+    " source TEXT, kind TEXT, year INTEGER, citations INTEGER, image TEXT, extra TEXT,"
+    " seen_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS docs_seen ON docs (seen_at)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5("
+    " title, snippet, content='docs', content_rowid='id', tokenize='porter unicode61')",
+    # Keep the external-content FTS table in step with docs.
+    "CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN"
+    " INSERT INTO docs_fts(rowid, title, snippet) VALUES (new.id, new.title, new.snippet); END",
+    "CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN"
+    " INSERT INTO docs_fts(docs_fts, rowid, title, snippet) VALUES ('delete', old.id, old.title, old.snippet); END",
+    "CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE OF title, snippet ON docs BEGIN"
+    " INSERT INTO docs_fts(docs_fts, rowid, title, snippet) VALUES ('delete', old.id, old.title, old.snippet);"
+    " INSERT INTO docs_fts(rowid, title, snippet) VALUES (new.id, new.title, new.snippet); END",
+]
+
+UPSERT = (
+    "INSERT INTO docs (key, title, url, snippet, source, kind, year, citations, image, extra, seen_at)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    " ON CONFLICT(key) DO UPDATE SET title = excluded.title, url = excluded.url, snippet = excluded.snippet,"
+    " source = excluded.source, kind = excluded.kind, year = excluded.year,"
+    " citations = COALESCE(excluded.citations, docs.citations), image = COALESCE(excluded.image, docs.image),"
+    " extra = excluded.extra, seen_at = excluded.seen_at"
+)
+
+Row = Tuple
+
+
+class LocalIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._batches = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-index")
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        c = self._conn()
+        for stmt in SCHEMA:
+            c.execute(stmt)  # raises sqlite3.OperationalError if FTS5 is missing
+
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = c
+        return c
+
+    @staticmethod
+    def _row(it: Record, now: float) -> Optional[Row]:
+        if not it.title:
+            return None
+        key = canonical_url(it.url) or f"{it.source}:{it.title.casefold()}"
+        return (
+            key, it.title, it.url, it.snippet, it.source, it.kind.value if it.kind else None,
+            it.year, it.citations, it.image, json.dumps(it.extra) if it.extra else None, now,
+        )
+
+    def ingest(self, items: Iterable[Record]) -> None:
+        """Queue records for upsert. Rows are built now, so later mutation of `items` is harmless."""
+        now = time.time()
+        rows = [r for r in (self._row(it, now) for it in items) if r]
+        if rows:
+            self._writer.submit(self._write, rows)
+
+    def _write(self, rows: List[Row]) -> None:
+        c = self._conn()
+        with c:
+            c.execute("BEGIN")
+            c.executemany(UPSERT, rows)
+        self._batches += 1
+        if self._batches % COMPACT_EVERY == 0:
+            self.compact()
+
+    def compact(self) -> None:
+        """Drop records unseen for RETAIN seconds and the oldest past MAX_DOCS, then merge FTS segments."""
+        c = self._conn()
+        with c:
+            c.execute("BEGIN")
+            c.execute("DELETE FROM docs WHERE seen_at < ?", (time.time() - RETAIN,))
+            (n,) = c.execute("SELECT COUNT(*) FROM docs").fetchone()
+            if n > MAX_DOCS:
+                c.execute("DELETE FROM docs WHERE id IN (SELECT id FROM docs ORDER BY seen_at LIMIT ?)", (n - MAX_DOCS,))
+        c.execute("INSERT INTO docs_fts(docs_fts) VALUES ('optimize')")
+
+    def flush(self) -> None:
+        """Wait for queued ingests (tests, benchmarks, shutdown)."""
+        self._writer.submit(lambda: None).result()
+
+    def search(self, query: str, kinds: Set[Kind], limit: int) -> Tuple[List[Record], float]:
+        """
+        Best `limit` matches of every query term among records of `kinds`, by
+        bm25, and the newest `seen_at` among them (0 when nothing matched).
+        """
+        terms = re.findall(r"\w+", normalize_query(query))
+        if not terms or not kinds:
+            return [], 0.0
+        match = " ".join(f'"{t}"' for t in terms)
+        kind_values = [k.value for k in kinds]
+        rows = self._conn().execute(
+            "SELECT d.title, d.url, d.snippet, d.source, d.kind, d.year, d.citations, d.image, d.extra, d.seen_at"
+            " FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid"
+            f" WHERE docs_fts MATCH ? AND d.kind IN ({','.join('?' * len(kind_values))})"
+            " ORDER BY bm25(docs_fts, ?, ?) LIMIT ?",
+            (match, *kind_values, TITLE_WEIGHT, SNIPPET_WEIGHT, limit),
+        ).fetchall()
+        records = [
+            Record(
+                title=t, url=u, snippet=sn, source=src, kind=Kind(k) if k else None,
+                year=y, citations=cit, image=img, extra=json.loads(ex) if ex else None,
+            )
+            for t, u, sn, src, k, y, cit, img, ex, _ in rows
+        ]
+        return records, max((r[-1] for r in rows), default=0.0)
+
+
+_index: Optional[LocalIndex] = None
+_index_lock = threading.Lock()
+_disabled = (os.getenv("LOCAL_INDEX") or "1") == "0"
+
+def get_index() -> Optional[LocalIndex]:
+    """The process-wide index, or None when disabled or FTS5 isn't compiled into sqlite3."""
+    global _index, _disabled
+    if _index is None and not _disabled:
+        with _index_lock:
+            if _index is None and not _disabled:
+                try:
+                    _index = LocalIndex(PATH)
+                except sqlite3.OperationalError:
+                    _disabled = True
+    return _index
+
+def set_index(index: Optional[LocalIndex]) -> None:
+    """Swap the process-wide index (tests, benchmarks); None disables it."""
+    global _index, _disabled
+    _index = index
+    _disabled = index is None
@@ -0,0 +1,247 @@
+"""
+Process-wide counters and latency histograms, exported in the Prometheus
+text format, plus optional OpenTelemetry spans around the same timers.
+
+    METRICS=0           no-op: every call returns immediately
+    METRICS_PORT=9464   serve GET /metrics from a background thread
+    TRACING=otel        also open an OTel span per timer (needs opentelemetry-api)
+"""
+import os
+import time
+import inspect
+import threading
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Tuple
+
+PREFIX = "tss_"
+# Seconds; upstreams range from ~50 ms to the 15 s budget.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+HELP = {
+    "stage_seconds": "Wall time per pipeline stage (source, normalize, score, render, ...).",
+    "http_request_seconds": "Time to response headers per upstream host.",
+    "http_requests_total": "Upstream HTTP requests by host and status.",
+    "source_calls_total": "Upstream source calls by outcome: ok, empty, error, timeout.",
+    "fanout_timeouts_total": "Sources abandoned by the query deadline or their budget.",
+    "source_errors_total": "Exceptions raised inside sources, including ones a fallback recovered from.",
+    "cache_requests_total": "Cache lookups by namespace and result: hit, stale, miss.",
+    "cache_errors_total": "Cache backend operations that failed (read as a miss, or not stored).",
+    "api_requests_total": "HTTP API requests by endpoint and outcome: ok, degraded, shed, rate_limited.",
+    "breaker_transitions_total": "Upstream circuit breaker state changes per host.",
+    "upstream_rejected_total": "Upstream requests refused before sending: circuit open or rate limited.",
+    "throttle_wait_seconds": "Time upstream requests waited for their host's rate limit.",
+    "hedge_total": "Hedged upstream requests: sent, won, lost, or not sent (capped, throttled).",
+    "warm_total": "Upstream fetches made by the background cache warmer: refresh, suggest, prefetch.",
+    "singleflight_total": "Coalescing group calls and coalesced followers.",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_enabled = (os.getenv("METRICS") or "1") != "0"
+_lock = threading.Lock()
+_counters: Dict[str, Dict[Labels, float]] = {}
+_histograms: Dict[str, Dict[Labels, List[float]]] = {}  # labels -> bucket counts + [sum, count]
+_tracer = None
+
+def _init_tracer():
+    global _tracer
+    if (os.getenv("TRACING") or "").lower() != "otel":
+        return
+    try:
+        from opentelemetry import trace  # optional dependency
+    except ImportError:
+        return
+    _tracer = trace.get_tracer("trustworthy-study-search")
+
+_init_tracer()
+
+def enabled() -> bool:
+    return _enabled
+
+def set_enabled(on: bool) -> None:
+    global _enabled
+    _enabled = on
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def inc(name: str, amount: float = 1.0, **labels) -> None:
+    if not _enabled:
+        return
+    key = _labels(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0.0) + amount
+
+def observe(name: str, seconds: float, **labels) -> None:
+    if not _enabled:
+        return
+    key = _labels(labels)
+    with _lock:
+        h = _histograms.setdefault(name, {}).get(key)
+        if h is None:
+            h = _histograms[name][key] = [0.0] * (len(BUCKETS) + 2)
+        for i, upper in enumerate(BUCKETS):
+            if seconds <= upper:
+                h[i] += 1
+                break
+        h[-2] += seconds
+        h[-1] += 1
+
+@contextmanager
+def _timed(stage: str, labels: Dict[str, object]) -> Iterator[None]:
+    span = _tracer.start_as_current_span(stage, attributes={k: str(v) for k, v in labels.items()}) if _tracer else nullcontext()
+    t0 = time.perf_counter()
+    with span:
+        try:
+            yield
+        finally:
+            observe("stage_seconds", time.perf_counter() - t0, stage=stage, **labels)
+
+_NOOP = nullcontext()
+
+def timer(stage: str, **labels):
+    """`with metrics.timer("score"): ...` records stage_seconds{stage=...} (and a span)."""
+    if not _enabled:
+        return _NOOP
+    return _timed(stage, labels)
+
+def timed_out(error: BaseException) -> bool:
+    """
+    Whether `error` is, or wraps, a timeout. requests reports some timeouts as
+    ConnectionError(MaxRetryError(ReadTimeoutError)), so the chain is walked
+    through `reason`, `__cause__` and `__context__`.
+    """
+    seen = set()
+    e = error
+    while isinstance(e, BaseException) and id(e) not in seen:
+        seen.add(id(e))
+        # requests/urllib3/socket/asyncio timeouts all carry "Timeout" in the class name.
+        if "timeout" in type(e).__name__.lower():
+            return True
+        e = getattr(e, "reason", None) or e.__cause__ or e.__context__
+    return False
+
+def _outcome(error: BaseException) -> str:
+    if type(error).__name__ == "UpstreamUnavailable":  # utils.governor; not imported here to avoid a cycle
+        return "skipped"
+    return "timeout" if timed_out(error) else "error"
+
+def source_error(source: str, error: BaseException) -> None:
+    """Count an exception a source swallowed (e.g. before falling back)."""
+    inc("source_errors_total", source=source, error=type(error).__name__)
+
+def _record_source(source: str, items, error: BaseException | None) -> None:
+    if error is not None:
+        source_error(source, error)
+        inc("source_calls_total", source=source, outcome=_outcome(error))
+    else:
+        inc("source_calls_total", source=source, outcome="ok" if items else "empty")
+
+def instrument_source(source: str):
+    """
+    Time a `search_*` upstream call and count its outcome (ok / empty / error
+    / timeout / skipped). Exceptions are counted and turned into an empty
+    result, so sources don't need their own catch-all. A skipped upstream
+    (governor) is re-raised instead, so the cache keeps what it holds rather
+    than storing an empty result. Works on sync and async functions.
+    """
+    def wrapper(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def ainner(*args, **kwargs):
+                try:
+                    with timer("source", source=source):
+                        items = await func(*args, **kwargs)
+                except Exception as e:
+                    _record_source(source, None, e)
+                    if _outcome(e) == "skipped":
+                        raise
+                    return []
+                _record_source(source, items, None)
+                return items
+            return ainner
+
+        @wraps(func)
+        def inner(*args, **kwargs):
+            try:
+                with timer("source", source=source):
+                    items = func(*args, **kwargs)
+            except Exception as e:
+                _record_source(source, None, e)
+                if _outcome(e) == "skipped":
+                    raise
+                return []
+            _record_source(source, items, None)
+            return items
+        return inner
+    return wrapper
+
+
+def _fmt_labels(key: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs)
+    return "{" + body + "}"
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    from utils import singleflight
+    for group, s in singleflight.stats().items():
+        # Gauged from the groups' own counters at scrape time.
+        with _lock:
+            series = _counters.setdefault("singleflight_total", {})
+            series[_labels({"group": group, "result": "call"})] = float(s["calls"])
+            series[_labels({"group": group, "result": "coalesced"})] = float(s["coalesced"])
+    lines: List[str] = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            full = PREFIX + name
+            lines.append(f"# HELP {full} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {full} counter")
+            for key, v in sorted(series.items()):
+                lines.append(f"{full}{_fmt_labels(key)} {v:g}")
+        for name, series in sorted(_histograms.items()):
+            full = PREFIX + name
+            lines.append(f"# HELP {full} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {full} histogram")
+            for key, h in sorted(series.items()):
+                cum = 0.0
+                for upper, n in zip(BUCKETS, h):
+                    cum += n
+                    lines.append(f"{full}_bucket{_fmt_labels(key, (('le', f'{upper:g}'),))} {cum:g}")
+                lines.append(f"{full}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {h[-1]:g}")
+                lines.append(f"{full}_sum{_fmt_labels(key)} {h[-2]:.6f}")
+                lines.append(f"{full}_count{_fmt_labels(key)} {h[-1]:g}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Expose GET /metrics on a daemon thread."""
+    srv = ThreadingHTTPServer((host, port), _Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, name="metrics", daemon=True).start()
+    return srv
@@ -1,23 +1,102 @@
-from pydantic import BaseModel, Field
+import sys
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
 from typing import Optional, Dict, Any, List
 
-class ResultItem(BaseModel):
+class Kind(str, Enum):
+    """What a hit is; decides its section. Members are singletons, so kinds cost nothing per item."""
+    VIDEO = "video"
+    LECTURE = "lecture"
+    ENCYCLOPEDIA = "encyclopedia"
+    REFERENCE = "reference"
+    JOURNAL = "journal"
+    PREPRINT = "preprint"
+    RESEARCH = "research"
+    ARTICLE = "article"
+    NEWS = "news"
+    BLOG = "blog"
+
+@dataclass(slots=True)
+class Record:
+    """
+    Internal result record used from the sources through scoring and rendering.
+    Only the API boundary converts to the validated ResultItem model.
+
+    One Record can be held by several searches at once: coalesced source
+    fetches and coalesced searches (utils.singleflight) hand the same objects
+    to every caller. Stages that change a record (merging, enrichment) do so
+    on a copy (dataclasses.replace), never on the record they were given.
+    """
     title: str
     url: Optional[str] = None
     snippet: Optional[str] = None
     source: Optional[str] = None
-    meta: Dict[str, Any] = Field(default_factory=dict)
+    kind: Optional[Kind] = None
+    year: Optional[int] = None
+    citations: Optional[int] = None
     score: Optional[float] = None
-    image: Optional[str] = None  # NEW: preview/thumbnail URL
-
-def normalize_items(items: List["ResultItem"]) -> List["ResultItem"]:
-    # Basic de-dup by URL/title
-    seen = set()
-    out = []
-    for it in items:
-        key = (it.url or it.title).strip().lower()
-        if key in seen:
-            continue
-        seen.add(key)
-        out.append(it)
-    return out
+    image: Optional[str] = None
+    extra: Optional[Dict[str, Any]] = None  # rare per-source fields (e.g. video_id)
+
+    def __post_init__(self):
+        # Sources see the same few source names over and over.
+        if self.source is not None:
+            self.source = sys.intern(self.source)
+
+    def to_item(self) -> "ResultItem":
+        meta: Dict[str, Any] = dict(self.extra or {})
+        if self.kind is not None:
+            meta["kind"] = self.kind.value
+        if self.year is not None:
+            meta["year"] = self.year
+        if self.citations is not None:
+            meta["citations"] = self.citations
+        return _result_item_model()(
+            title=self.title, url=self.url, snippet=self.snippet, source=self.source,
+            meta=meta, score=self.score, image=self.image,
+        )
+
+    @classmethod
+    def from_item(cls, item: "ResultItem") -> "Record":
+        meta = dict(item.meta)
+        kind = meta.pop("kind", None)
+        return cls(
+            title=item.title, url=item.url, snippet=item.snippet, source=item.source,
+            kind=Kind(kind) if kind else None, year=meta.pop("year", None),
+            citations=meta.pop("citations", None), score=item.score, image=item.image,
+            extra=meta or None,
+        )
+
+@lru_cache(maxsize=None)
+def _result_item_model():
+    # pydantic is only needed at the API boundary, so the model is built on
+    # first use rather than at import.
+    from pydantic import BaseModel, Field
+
+    class ResultItem(BaseModel):
+        title: str
+        url: Optional[str] = None
+        snippet: Optional[str] = None
+        source: Optional[str] = None
+        meta: Dict[str, Any] = Field(default_factory=dict)
+        score: Optional[float] = None
+        image: Optional[str] = None  # NEW: preview/thumbnail URL
+
+    globals()["ResultItem"] = ResultItem
+    return ResultItem
+
+def __getattr__(name: str):
+    # `from utils.parsing import ResultItem` still works.
+    if name == "ResultItem":
+        return _result_item_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: trimmed, case-folded, single-spaced."""
+    return " ".join((query or "").split()).casefold()
+
+def normalize_items(items: List[Record]) -> List[Record]:
+    # De-dup across sources: canonical URLs, DOI/arXiv/PMID ids and near-equal titles.
+    from utils.dedup import dedupe
+    return dedupe(items)
@@ -1,24 +1,109 @@
-import requests
-from bs4 import BeautifulSoup
-from functools import lru_cache
+import os
+import re
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from html import unescape
+from typing import Dict, List
+from utils import httpclient, metrics
+from utils.cache import get_cache
+from utils.parsing import Record
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; StudySearchBot/1.0; +https://example.org/bot)"
 }
+TIMEOUT = 6
+MAX_HEAD_BYTES = 64 * 1024  # give up on pages whose <head> is bigger than this
+CHUNK = 4096
 
-@lru_cache(maxsize=256)
-def fetch_og_image(url: str) -> str | None:
-    """Fetch a page and try to extract og:image (quick, best-effort)."""
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=6)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-        # Common OG tags
-        tag = soup.find("meta", property="og:image") or soup.find("meta", attrs={"name":"twitter:image"})
-        if tag:
-            content = tag.get("content")
-            if content and content.startswith(("http://", "https://")):
+THUMB_WORKERS = int(os.getenv("THUMB_WORKERS") or 8)
+_POOL = ThreadPoolExecutor(max_workers=THUMB_WORKERS, thread_name_prefix="thumbs")
+
+_META_RE = re.compile(rb"<meta\b[^>]*>", re.I)
+_ATTR_RE = re.compile(rb"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+_HEAD_END = b"</head"
+# Common OG tags, in order of preference
+_IMAGE_KEYS = (b"og:image", b"og:image:url", b"og:image:secure_url", b"twitter:image", b"twitter:image:src")
+
+def _extract_og(head: bytes) -> str | None:
+    """Scan <meta> tags in a (partial) page head; no full HTML parse."""
+    found: Dict[bytes, bytes] = {}
+    for tag in _META_RE.finditer(head):
+        attrs = {m.group(1).lower(): (m.group(2) or m.group(3) or m.group(4) or b"") for m in _ATTR_RE.finditer(tag.group(0))}
+        key = (attrs.get(b"property") or attrs.get(b"name") or b"").lower()
+        if key in _IMAGE_KEYS and attrs.get(b"content"):
+            found.setdefault(key, attrs[b"content"])
+    for key in _IMAGE_KEYS:
+        if key in found:
+            content = unescape(found[key].decode("utf-8", "replace")).strip()
+            if content.startswith(("http://", "https://")):
                 return content
-    except Exception:
-        pass
     return None
+
+def _read_head(chunks) -> bytes:
+    buf = b""
+    for chunk in chunks:
+        buf += chunk
+        # Only look near the tail for the closing tag; it may straddle chunks.
+        if _HEAD_END in buf[-(len(chunk) + len(_HEAD_END)):].lower() or len(buf) >= MAX_HEAD_BYTES:
+            break
+    return buf
+
+def fetch_og_image(url: str) -> str | None:
+    """Stream a page's <head> and try to extract og:image (quick, best-effort)."""
+    return get_cache().get_or_compute("og_image", url, lambda: _fetch_og_image(url))
+
+def _fetch_og_image(url: str) -> str | None:
+    try:
+        with metrics.timer("og_image"), httpclient.get(url, headers=HEADERS, timeout=TIMEOUT, stream=True, label="page") as r:
+            r.raise_for_status()
+            return _extract_og(_read_head(r.iter_content(CHUNK)))
+    except Exception as e:
+        metrics.source_error("og_image", e)
+        return None
+
+def _missing(items: List[Record]) -> Dict[str, List[Record]]:
+    by_url: Dict[str, List[Record]] = {}
+    for it in items:
+        if it.url and not it.image:
+            by_url.setdefault(it.url, []).append(it)
+    return by_url
+
+def start_thumbnails(items: List[Record]) -> Dict[Future, List[Record]]:
+    """
+    Start og:image fetches for items that have no image, at most
+    THUMB_WORKERS pages at once. Images land on the items as fetches complete;
+    pass the result to wait_thumbnails to know when.
+    """
+    def apply(fut, targets):
+        try:
+            img = fut.result()
+        except Exception:
+            return
+        for it in targets:
+            it.image = it.image or img
+
+    futures: Dict[Future, List[Record]] = {}
+    for url, targets in _missing(items).items():
+        fut = _POOL.submit(fetch_og_image, url)
+        fut.add_done_callback(lambda f, targets=targets: apply(f, targets))
+        futures[fut] = targets
+    return futures
+
+def wait_thumbnails(futures: Dict[Future, List[Record]], deadline: float = 3.0) -> None:
+    """Wait up to `deadline` seconds for fetches from start_thumbnails."""
+    if not futures:
+        return
+    with metrics.timer("thumbnails"):
+        done, _ = wait(futures, timeout=deadline)
+    # Callbacks may still be running after wait() returns; apply here too.
+    for fut in done:
+        try:
+            img = fut.result()
+        except Exception:
+            continue
+        for it in futures[fut]:
+            it.image = it.image or img
+
+def enrich_thumbnails(items: List[Record], deadline: float = 3.0) -> List[Record]:
+    """Fill `image` for items that have none, waiting up to `deadline` seconds."""
+    wait_thumbnails(start_thumbnails(items), deadline)
+    return items
@@ -0,0 +1,53 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Hashable
+
+class TokenBuckets:
+    """
+    One token bucket per key (client, host, ...): `rate` tokens per second,
+    holding at most `burst`. Idle keys are forgotten LRU-first past `max_keys`.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def _refill(self, key: Hashable, now: float) -> list:
+        b = self._buckets.get(key)
+        if b is None:
+            b = self._buckets[key] = [self.burst, now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate)
+            b[1] = now
+            self._buckets.move_to_end(key)
+        return b
+
+    def take(self, key: Hashable, tokens: float = 1.0) -> float:
+        """Take `tokens` now if available and return 0; else return seconds until they would be."""
+        now = time.monotonic()
+        with self._lock:
+            b = self._refill(key, now)
+            if b[0] >= tokens:
+                b[0] -= tokens
+                return 0.0
+            return (tokens - b[0]) / self.rate if self.rate > 0 else float("inf")
+
+    def reserve(self, key: Hashable, max_wait: float, tokens: float = 1.0) -> float:
+        """
+        Book `tokens` if they will be available within `max_wait` seconds and
+        return the wait (the bucket goes into debt, so later callers queue
+        behind this one); otherwise book nothing and return the full wait.
+        """
+        now = time.monotonic()
+        with self._lock:
+            b = self._refill(key, now)
+            wait = max(0.0, (tokens - b[0]) / self.rate) if self.rate > 0 else (0.0 if b[0] >= tokens else float("inf"))
+            if wait <= max_wait:
+                b[0] -= tokens
+            return wait
@@ -0,0 +1,83 @@
+"""
+Result rendering. Each card's HTML is built once per distinct content and
+reused from an LRU cache, the stylesheet goes out once per page, and every
+text field is escaped. `sections_json` is the compact alternative for
+clients that paint cards themselves.
+"""
+import json
+from functools import lru_cache
+from html import escape
+from typing import Dict, Iterable, List, Optional
+from utils.parsing import Record
+
+CARD_CACHE_SIZE = 8192
+SNIPPET_CHARS = 220
+SAFE_SCHEMES = ("http://", "https://")
+
+STYLE = """<style>
+  .grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(260px, 1fr)); gap: 16px; }
+  .card { background:#111; border:1px solid #2a2a2a; border-radius:14px; padding:12px; overflow:hidden; }
+  .card img { width:100%; height:150px; object-fit:cover; border-radius:10px; }
+  .title a { color:#c9d1d9; text-decoration:none; }
+  .meta { color:#9aa4b2; font-size:12px; margin-top:6px; }
+  .snippet { color:#d1d5db; font-size:13px; margin-top:6px; }
+  .score { font-weight:700; }
+</style>"""
+
+def _safe_url(url: Optional[str]) -> str:
+    # No javascript:/data: links from upstream content.
+    return url if url and url.lower().startswith(SAFE_SCHEMES) else ""
+
+def _score_text(score) -> str:
+    return f"{score:.0f}/100" if isinstance(score, (int, float)) else ""
+
+@lru_cache(maxsize=CARD_CACHE_SIZE)
+def _card(title: str, url: str, score: str, source: str, year: Optional[int], image: str, snippet: str) -> str:
+    # Keyed on exactly what is shown, so equal content shares one fragment.
+    img = f'<img src="{escape(image)}" alt="preview" loading="lazy" />' if image else ""
+    year_str = f" · {year}" if year else ""
+    return (
+        f'<div class="card">{img}'
+        f'<div class="title"><a href="{escape(url or "#")}" target="_blank" rel="noopener">{escape(title)}</a></div>'
+        f'<div class="meta"><span class="score">{score}</span> · {escape(source)}{year_str}</div>'
+        f'<div class="snippet">{escape(snippet)}</div></div>'
+    )
+
+def card_html(it: Record) -> str:
+    return _card(
+        it.title or "(untitled)", _safe_url(it.url), _score_text(it.score), it.source or "",
+        it.year, _safe_url(it.image), (it.snippet or "")[:SNIPPET_CHARS],
+    )
+
+def section_html(section: str, items: List[Record], loading: bool = False) -> str:
+    """One section; expects STYLE to be on the page already (see page_html)."""
+    if not items:
+        note = "Loading…" if loading else "No results."
+        return f"<h3>{escape(section)}</h3><p><em>{note}</em></p>"
+    return f'<h3>{escape(section)}</h3><div class="grid">' + "".join(map(card_html, items)) + "</div>"
+
+def page_html(header: str, sections: Iterable[str]) -> str:
+    return STYLE + header + "\n".join(sections)
+
+def _card_dict(it: Record) -> Dict:
+    d = {"t": it.title or "(untitled)", "u": _safe_url(it.url), "s": it.source or ""}
+    # Optional fields only when present, to keep the payload small.
+    if it.score is not None:
+        d["sc"] = round(it.score, 1)
+    if it.year:
+        d["y"] = it.year
+    if it.image:
+        d["i"] = _safe_url(it.image)
+    if it.snippet:
+        d["sn"] = it.snippet[:SNIPPET_CHARS]
+    if it.kind is not None:
+        d["k"] = it.kind.value
+    return d
+
+def sections_json(sections: Dict[str, List[Record]], **fields) -> str:
+    """
+    Compact JSON: {"sections": {title: [card, ...]}, **fields}. Card keys:
+    t title, u url, s source, sc score, y year, i image, sn snippet, k kind.
+    """
+    body = {"sections": {title: [_card_dict(it) for it in items] for title, items in sections.items()}, **fields}
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,108 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterator, List
+
+
+class _Call:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.values: List[Any] = []  # every value produced so far (one for do())
+        self.error: BaseException | None = None
+        self.finished = False
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one execution.
+    Callers that arrive while a call is in flight wait for it and share its
+    result (or exception). Nothing is kept once the call returns.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key: Hashable):
+        with self._lock:
+            self.calls += 1
+            call = self._inflight.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return call, False
+            call = self._inflight[key] = _Call()
+            return call, True
+
+    def _finish(self, key: Hashable, call: _Call, error: BaseException | None = None):
+        with self._lock:
+            self._inflight.pop(key, None)
+        with call.cond:
+            call.error = error
+            call.finished = True
+            call.cond.notify_all()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        call, leader = self._join(key)
+        if leader:
+            try:
+                value = fn()
+            except BaseException as e:
+                self._finish(key, call, e)
+                raise
+            call.values.append(value)
+            self._finish(key, call)
+            return value
+        with call.cond:
+            call.cond.wait_for(lambda: call.finished)
+        if call.error is not None:
+            raise call.error
+        return call.values[0]
+
+    def do_iter(self, key: Hashable, fn: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """
+        Like do(), for generators. The generator runs on its own thread so a
+        caller that stops reading early doesn't cut the stream short for the
+        others; every caller replays what was yielded so far, then follows live.
+        """
+        call, leader = self._join(key)
+        if leader:
+            def pump():
+                try:
+                    for value in fn():
+                        with call.cond:
+                            call.values.append(value)
+                            call.cond.notify_all()
+                except BaseException as e:
+                    self._finish(key, call, e)
+                    return
+                self._finish(key, call)
+            threading.Thread(target=pump, name="singleflight", daemon=True).start()
+
+        i = 0
+        while True:
+            with call.cond:
+                call.cond.wait_for(lambda: i < len(call.values) or call.finished)
+                batch = call.values[i:]
+                finished = call.finished
+            yield from batch
+            i += len(batch)
+            if finished and i >= len(call.values):
+                break
+        if call.error is not None:
+            raise call.error
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+def group(name: str) -> SingleFlight:
+    """The process-wide SingleFlight for `name` (a source namespace, "aggregate", ...)."""
+    g = _groups.get(name)
+    if g is None:
+        with _groups_lock:
+            g = _groups.setdefault(name, SingleFlight())
+    return g
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Calls and coalesced calls per group."""
+    return {name: {"calls": g.calls, "coalesced": g.coalesced} for name, g in list(_groups.items())}
@@ -0,0 +1,87 @@
+"""
+Cold start helpers: background warm-up and startup timing.
+
+Heavy modules (numpy, pydantic, requests) are imported inside the functions
+that need them, so they load on first use or in `in_background` right after
+the app is up, and a replica can take traffic before they finish loading.
+
+    python -m utils.startup [module ...]    import-time breakdown per package
+                                            (default: app api search)
+"""
+import sys
+import time
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+T0 = time.perf_counter()  # app.py / api.py import this first
+_phases: Dict[str, float] = {}
+_lock = threading.Lock()
+
+def mark(name: str) -> None:
+    """Record seconds since startup under `name` (e.g. "ready")."""
+    with _lock:
+        _phases[name] = round(time.perf_counter() - T0, 4)
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _phases[name] = round(time.perf_counter() - t0, 4)
+
+def phases() -> Dict[str, float]:
+    """Startup timings in seconds: marks since process start, phases as durations."""
+    with _lock:
+        return dict(_phases)
+
+def in_background(tasks: Dict[str, Callable[[], object]]) -> threading.Thread:
+    """Run warm-up tasks one after another on a daemon thread, timing each as phase "warm:<name>"."""
+    def run():
+        for name, fn in tasks.items():
+            with phase(f"warm:{name}"):
+                try:
+                    fn()
+                except Exception:
+                    pass  # warm-up is best effort; the request path retries for real
+        mark("warm")
+
+    t = threading.Thread(target=run, name="warm-start", daemon=True)
+    t.start()
+    return t
+
+def import_report(modules: List[str]) -> List[Tuple[str, float]]:
+    """
+    Import `modules` in a fresh interpreter under `-X importtime` and return
+    (top-level package, seconds spent in its own modules), slowest first.
+    """
+    code = "; ".join(f"import {m}" for m in modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    totals: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # the header
+        # Self times, so numpy pulled in by utils.scoring counts as numpy.
+        pkg = name.strip().split(".")[0]
+        totals[pkg] = totals.get(pkg, 0.0) + int(self_us) / 1e6
+    if proc.returncode:
+        sys.stderr.write(proc.stderr.splitlines()[-1] + "\n")
+    return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+
+def main(argv=None) -> int:
+    modules = (argv if argv is not None else sys.argv[1:]) or ["app", "api", "search"]
+    report = import_report(modules)
+    total = sum(s for _, s in report)
+    print(f"import {' '.join(modules)}: {total * 1000:.0f} ms")
+    for pkg, seconds in report[:25]:
+        print(f"  {pkg:<28} {seconds * 1000:8.1f} ms  {seconds / total * 100 if total else 0:5.1f}%")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
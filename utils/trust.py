@@ -0,0 +1,208 @@
+"""
+Domain trust classification. Rules live in a suffix trie keyed on reversed
+host labels ("en.wikipedia.org" -> org, wikipedia, en), so a lookup costs one
+dict step per label however long the allow list gets, and only matches on
+label boundaries ("x.edu.evil.com" is not .edu).
+
+Rules are one per line: `domain[/path]  tier[,tier...]  [kind]`, e.g.
+
+    nih.gov         allowed,trusted
+    britannica.com  allowed,trusted  encyclopedia
+    ibm.com/docs    allowed
+
+Extra rules come from the file at TRUST_ALLOWLIST and from TRUST_DOMAINS
+(comma-separated domains, added as allowed + trusted).
+"""
+import os
+import threading
+from dataclasses import dataclass
+from enum import IntFlag
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from utils.parsing import Kind
+
+class Tier(IntFlag):
+    NONE = 0
+    ALLOWED = 1        # passes the web-result filter
+    TRUSTED = 2        # known reputable site (score bonus)
+    INSTITUTIONAL = 4  # academic / government suffix (score bonus)
+
+DEFAULT_RULES = """
+# Academic and government suffixes
+edu             allowed,institutional
+gov             allowed,institutional
+ac.uk           allowed,institutional
+gov.uk          allowed,institutional
+edu.au          allowed,institutional
+gov.au          allowed,institutional
+ac.jp           allowed,institutional
+edu.cn          allowed,institutional
+who.int         allowed,trusted
+
+# Reference
+wikipedia.org   allowed,trusted  encyclopedia
+britannica.com  allowed,trusted  encyclopedia
+
+# Research and publishers
+stanford.edu    allowed,trusted
+harvard.edu     allowed,trusted
+mit.edu         allowed,trusted
+ox.ac.uk        allowed,trusted
+cam.ac.uk       allowed,trusted
+nih.gov         allowed,trusted
+nasa.gov        allowed,trusted
+nature.com      allowed,trusted
+science.org     allowed,trusted
+sciencedirect.com allowed,trusted
+springer.com    allowed,trusted
+arxiv.org       allowed,trusted
+acm.org         allowed,trusted
+ieee.org        allowed,trusted
+
+# News
+reuters.com     allowed
+apnews.com      allowed
+
+# Docs and learning
+developer.mozilla.org allowed
+docs.python.org allowed
+nodejs.org      allowed
+go.dev          allowed
+rust-lang.org   allowed
+kubernetes.io   allowed
+docker.com      allowed
+react.dev       allowed
+vuejs.org       allowed
+angular.io      allowed
+pytorch.org     allowed
+tensorflow.org  allowed
+scikit-learn.org allowed
+numpy.org       allowed
+pandas.pydata.org allowed
+cloud.google.com allowed
+aws.amazon.com  allowed
+azure.microsoft.com allowed
+learn.microsoft.com allowed
+oracle.com      allowed
+ibm.com/docs    allowed
+vercel.com/docs allowed
+postgresql.org  allowed
+mysql.com       allowed
+mariadb.org     allowed
+khanacademy.org allowed
+freecodecamp.org allowed
+digitalocean.com allowed
+"""
+HOST_CACHE_SIZE = 16384
+
+@dataclass(frozen=True)
+class Verdict:
+    tier: Tier = Tier.NONE
+    kind: Optional[Kind] = None
+
+    @property
+    def allowed(self) -> bool:
+        return bool(self.tier & Tier.ALLOWED)
+
+_UNKNOWN = Verdict()
+
+class _Node:
+    __slots__ = ("children", "verdict", "paths")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.verdict: Optional[Verdict] = None
+        self.paths: List[Tuple[str, Verdict]] = []  # path-prefix rules for this domain
+
+def _labels(host: str) -> List[str]:
+    return host.lower().strip(".").split(".")[::-1]
+
+class TrustIndex:
+    def __init__(self):
+        self._root = _Node()
+        self._lookup_host = lru_cache(maxsize=HOST_CACHE_SIZE)(self._walk)
+
+    def add(self, domain: str, tier: Tier, kind: Optional[Kind] = None) -> None:
+        host, _, path = domain.strip().lstrip(".").partition("/")
+        node = self._root
+        for label in _labels(host):
+            node = node.children.setdefault(label, _Node())
+        verdict = Verdict(tier, kind)
+        if path:
+            node.paths.append(("/" + path.rstrip("/"), verdict))
+        else:
+            node.verdict = verdict
+        self._lookup_host.cache_clear()
+
+    def load(self, text: str) -> "TrustIndex":
+        for line in text.splitlines():
+            parts = line.split("#", 1)[0].split()
+            if not parts:
+                continue
+            tier = Tier.NONE
+            for name in (parts[1] if len(parts) > 1 else "allowed").split(","):
+                tier |= Tier[name.strip().upper()]
+            self.add(parts[0], tier, Kind(parts[2]) if len(parts) > 2 else None)
+        return self
+
+    def _walk(self, host: str) -> Tuple[Verdict, Tuple[Tuple[str, Verdict], ...]]:
+        # Tiers from every matching suffix combine; the most specific kind wins.
+        tier, kind, paths = Tier.NONE, None, []
+        node = self._root
+        for label in _labels(host):
+            node = node.children.get(label)
+            if node is None:
+                break
+            if node.verdict is not None:
+                tier |= node.verdict.tier
+                kind = node.verdict.kind or kind
+            paths += node.paths
+        return (Verdict(tier, kind) if tier else _UNKNOWN), tuple(paths)
+
+    def classify_host(self, host: str, path: str = "") -> Verdict:
+        verdict, paths = self._lookup_host(host)
+        for prefix, v in paths:
+            if path == prefix or path.startswith(prefix + "/"):
+                return Verdict(verdict.tier | v.tier, v.kind or verdict.kind)
+        return verdict
+
+    def classify(self, url: Optional[str]) -> Verdict:
+        if not url:
+            return _UNKNOWN
+        try:
+            parts = urlsplit(url)
+        except ValueError:
+            return _UNKNOWN
+        if not parts.hostname:
+            return _UNKNOWN
+        return self.classify_host(parts.hostname, parts.path)
+
+def _index_from_env() -> TrustIndex:
+    index = TrustIndex().load(DEFAULT_RULES)
+    path = os.getenv("TRUST_ALLOWLIST")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            index.load(f.read())
+    for domain in filter(None, (d.strip() for d in (os.getenv("TRUST_DOMAINS") or "").split(","))):
+        index.add(domain, Tier.ALLOWED | Tier.TRUSTED)
+    return index
+
+_index: Optional[TrustIndex] = None
+_index_lock = threading.Lock()
+
+def get_index() -> TrustIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = _index_from_env()
+    return _index
+
+def set_index(index: TrustIndex) -> None:
+    global _index
+    _index = index
+
+def classify(url: Optional[str]) -> Verdict:
+    """Trust tier and kind hint for a URL, from one trie walk (memoized per host)."""
+    return get_index().classify(url)
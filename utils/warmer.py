@@ -0,0 +1,136 @@
+"""
+Background cache warming. Searches are counted per normalized query with
+exponential decay; every `interval` seconds the most popular ones are
+re-fetched shortly before their cache entries go stale, and a few likely
+follow-ups (e.g. Wikipedia completions) are fetched ahead of time. A tick
+stops as soon as the app is busy, and at most `budget` upstream fetches go
+out per tick. The fetches themselves go through the normal sources, so the
+governor's rate limits and breakers apply to them too.
+"""
+import math
+import time
+import threading
+from typing import Callable, Dict, Hashable, List, Tuple
+from utils import metrics
+
+HALF_LIFE = 3600.0  # seconds for a query's popularity to halve
+
+
+class Popularity:
+    """Decayed hit counts per key, bounded to roughly `max_keys` keys."""
+
+    def __init__(self, half_life: float = HALF_LIFE, max_keys: int = 5000):
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self._counts: Dict[Hashable, List] = {}  # key -> [count, updated_at, params]
+        self._lock = threading.Lock()
+
+    def _decayed(self, entry: List, now: float) -> float:
+        return entry[0] * math.pow(0.5, (now - entry[1]) / self.half_life)
+
+    def hit(self, key: Hashable, params: Tuple = ()) -> None:
+        now = time.time()
+        with self._lock:
+            e = self._counts.get(key)
+            if e is None:
+                self._counts[key] = [1.0, now, params]
+                if len(self._counts) > self.max_keys * 1.25:
+                    self._prune(now)
+            else:
+                e[0] = self._decayed(e, now) + 1.0
+                e[1] = now
+                e[2] = params  # warm with the options most recently asked for
+
+    def _prune(self, now: float) -> None:
+        keep = sorted(self._counts.items(), key=lambda kv: self._decayed(kv[1], now), reverse=True)[: self.max_keys]
+        self._counts = dict(keep)
+
+    def top(self, k: int, min_count: float = 2.0) -> List[Tuple[Hashable, Tuple]]:
+        """The `k` most popular keys (with their params) seen at least `min_count` times, decayed."""
+        now = time.time()
+        with self._lock:
+            scored = [(self._decayed(e, now), key, e[2]) for key, e in self._counts.items()]
+        scored = [s for s in scored if s[0] >= min_count]
+        scored.sort(key=lambda s: s[0], reverse=True)
+        return [(key, params) for _, key, params in scored[:k]]
+
+
+class Warmer:
+    """
+    `warm(query, params)` refreshes whatever is due for one query and returns
+    the number of upstream fetches it made; `followups(query)` returns the
+    queries likely to come next and the fetches finding them took; `busy()`
+    says the app needs the capacity itself.
+    """
+
+    def __init__(
+        self,
+        warm: Callable[[str, Tuple], int],
+        followups: Callable[[str], Tuple[List[str], int]],
+        busy: Callable[[], bool],
+        top_k: int = 50,
+        interval: float = 60.0,
+        budget: int = 20,
+        followups_per_query: int = 2,
+    ):
+        self.warm = warm
+        self.followups = followups
+        self.busy = busy
+        self.top_k = top_k
+        self.interval = interval
+        self.budget = budget
+        self.followups_per_query = followups_per_query
+        self.popularity = Popularity()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def record(self, query: str, params: Tuple = ()) -> None:
+        """Count a search (normalized query) and start the background thread on first use."""
+        self.popularity.hit(query, params)
+        if self._thread is None and self.top_k > 0:
+            self.start()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._lock:
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                metrics.inc("warm_total", kind="error", error=type(e).__name__)
+
+    def tick(self) -> int:
+        """One warming pass: refresh popular queries, then prefetch follow-ups. Returns fetches made."""
+        spent = 0
+        top = self.popularity.top(self.top_k)
+        for query, params in top:
+            if spent >= self.budget or self.busy():
+                return spent
+            n = self.warm(query, params)
+            spent += n
+            metrics.inc("warm_total", n, kind="refresh")
+        # Only with budget left over: guesses are worth less than known-popular queries.
+        for query, params in top:
+            if spent >= self.budget or self.busy():
+                return spent
+            follows, n = self.followups(query)
+            spent += n
+            metrics.inc("warm_total", n, kind="suggest")
+            for follow in follows[: self.followups_per_query]:
+                if spent >= self.budget or self.busy():
+                    return spent
+                n = self.warm(follow, params)
+                spent += n
+                metrics.inc("warm_total", n, kind="prefetch")
+        return spent